@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils import timezone
+from imaging.storage import media_storage
 
 class CustomUserManager(BaseUserManager):
     """
@@ -43,7 +44,11 @@ class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True, max_length=255)
     first_name = models.CharField(max_length=150, blank=True)
     last_name = models.CharField(max_length=150, blank=True)
-    profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+    profile_picture = models.ImageField(upload_to='profile_pics/', storage=media_storage, null=True, blank=True)
+    # Filled in by the imaging app after upload (see imaging/derivatives.py)
+    profile_picture_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    profile_picture_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    profile_picture_renditions = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(max_length=500, blank=True)
     
     # Your custom field from the frontend checkbox
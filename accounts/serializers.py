@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from rest_framework.validators import UniqueValidator
 from dj_rest_auth.registration.serializers import RegisterSerializer as BaseRegisterSerializer
+from imaging.serializers import NormalizedImageField, SrcsetField
 
 User = get_user_model()
 
@@ -21,16 +22,18 @@ class UserSerializer(serializers.ModelSerializer):
     Serializer for User model - used for displaying user info
     """
     remove_profile_picture = serializers.BooleanField(write_only=True, required=False, default=False)
+    profile_picture = NormalizedImageField(required=False, allow_null=True)
+    profile_picture_srcset = SrcsetField('profile_picture')
 
     class Meta:
         model = User
-        fields = ('id', 'email', 'first_name', 'last_name', 'is_from_nepal', 'profile_picture', 'bio', 'date_joined', 'remove_profile_picture')
-        read_only_fields = ('id', 'date_joined', 'email') # Email usually read-only unless we want to handle verification again
+        fields = ('id', 'email', 'first_name', 'last_name', 'is_from_nepal', 'profile_picture', 'profile_picture_width', 'profile_picture_height', 'profile_picture_srcset', 'bio', 'date_joined', 'remove_profile_picture')
+        read_only_fields = ('id', 'date_joined', 'email', 'profile_picture_width', 'profile_picture_height') # Email usually read-only unless we want to handle verification again
 
     def update(self, instance, validated_data):
         remove_pic = validated_data.pop('remove_profile_picture', False)
         if remove_pic:
-            instance.profile_picture.delete(save=False)
+            # The file itself is released once the change is saved (imaging/signals.py)
             instance.profile_picture = None
         
         return super().update(instance, validated_data)
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Load models and fill caches before /ready/ lets traffic in
+from backend.warmup import start_warmup  # noqa: E402
+start_warmup()
@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     'sherpa',
     'travelKit',
     'photo_gallery',
+    'imaging',
     'notifications',
     'friends',
     
@@ -253,6 +254,37 @@ REST_AUTH = {
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# '' (stream from Django), 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache)
+MEDIA_SENDFILE = config('MEDIA_SENDFILE', default='')
+# nginx `internal` location that aliases MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+
+# Response cache of the public photo feeds (photo_gallery/cache.py):
+# 'locmem' (per process), 'file' (shared by the workers of a host) or the
+# dotted path of any other cache backend
+PHOTO_FEED_CACHE = config('PHOTO_FEED_CACHE', default='locmem')
+PHOTO_FEED_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHES = {
+    # Per process. Chat idempotency replays (chatbot/concurrency.py) are
+    # stored here and chat turns are serialized with in-process locks, like
+    # the conversation state itself (the graph's MemorySaver), so a chat
+    # thread's requests must keep reaching the same worker (sticky sessions)
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'photo_feeds': {
+        'BACKEND': PHOTO_FEED_CACHE_BACKENDS.get(PHOTO_FEED_CACHE, PHOTO_FEED_CACHE),
+        'LOCATION': config(
+            'PHOTO_FEED_CACHE_LOCATION',
+            default=str(BASE_DIR / 'cache' / 'photo_feeds') if PHOTO_FEED_CACHE == 'file' else 'photo_feeds'
+        ),
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
 
 import warnings
 
@@ -0,0 +1,80 @@
+"""
+Test cases for worker warm-up and the readiness probe
+Run with: python manage.py test backend
+"""
+
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from django.test import TestCase
+
+from . import warmup as warmup_module
+from .warmup import Warmup
+
+
+class ReadinessTests(TestCase):
+    """Test cases for /ready/ and the warm-up it reports on"""
+
+    def setUp(self):
+        self.process_warmup = warmup_module.warmup
+        self.steps = []
+        self.warmup = Warmup()
+        for target, value in [('_steps', self.steps), ('warmup', self.warmup)]:
+            patcher = mock.patch.object(warmup_module, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(warmup_module, 'autodiscover_modules')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unready_until_required_steps_finish(self):
+        release = threading.Event()
+        self.steps.append(('slow', lambda: release.wait(5), True))
+
+        response = self.client.get('/ready/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'running')
+
+        release.set()
+        for _ in range(50):
+            if self.warmup.ready:
+                break
+            time.sleep(0.1)
+        response = self.client.get('/ready/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['steps']['slow']['status'], 'done')
+
+    def test_failed_required_step_keeps_worker_unready(self):
+        self.steps.append(('broken', mock.Mock(side_effect=RuntimeError('no index')), True))
+        self.steps.append(('optional', mock.Mock(side_effect=RuntimeError('offline')), False))
+        self.warmup.start(background=False)
+
+        response = self.client.get('/ready/')
+        self.assertEqual(response.status_code, 503)
+        body = response.json()
+        self.assertEqual(body['status'], 'failed')
+        self.assertEqual(body['steps']['broken']['error'], 'no index')
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork')
+    def test_forked_worker_starts_from_scratch(self):
+        # gunicorn --preload: the master started a run whose thread the
+        # fork doesn't copy
+        status = self.process_warmup.status
+        self.addCleanup(setattr, self.process_warmup, 'status', status)
+        self.process_warmup.status = 'running'
+
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, self.process_warmup.status.encode())
+            os._exit(0)
+        os.close(write)
+        child_status = os.read(read, 100).decode()
+        os.close(read)
+        os.waitpid(pid, 0)
+
+        self.assertEqual(child_status, 'pending')
+        self.assertEqual(self.process_warmup.status, 'running')
@@ -1,12 +1,18 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from notifications import urls as notification_urls
 from friends import urls as friend_urls
+from backend.warmup import readiness
+from imaging.views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+
+    # Load balancer readiness probe
+    path('ready/', readiness, name='readiness'),
     
     # Our custom auth endpoints (for email/password login)
     path('api/auth/', include('accounts.urls')),
@@ -21,4 +27,7 @@ urlpatterns = [
     path('travelkit/',include('travelKit.urls')),
     path('notifications/', include(notification_urls)),
     path('friends/', include(friend_urls)),
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+
+    # Uploaded media, handed to the proxy when MEDIA_SENDFILE is set (imaging/views.py)
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', serve_media, name='media'),
+]
\ No newline at end of file
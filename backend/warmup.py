@@ -0,0 +1,113 @@
+"""
+Warm-up and readiness for web workers.
+
+Apps register warm-up steps in a `warmup` module (e.g. chatbot/warmup.py)
+with the @warm_step decorator. Each worker runs them once in a background
+thread when it starts (see wsgi.py); GET /ready/ answers 503 until every
+required step has finished, so the load balancer only routes traffic to
+warm workers.
+
+Under gunicorn --preload wsgi.py is imported, and the warm-up started, in
+the master. Forked workers don't inherit the thread, so their state is
+reset after the fork and the first readiness probe starts their own run.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from django.http import JsonResponse
+from django.utils.module_loading import autodiscover_modules
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a failed warm-up is retried by the next readiness probe
+RETRY_AFTER = 30
+
+_steps = []   # [(name, function, required)] in registration order
+
+
+def warm_step(name, required=True):
+    """
+    Register a warm-up step. A failing required step keeps the worker
+    unready; an optional one is only logged.
+    """
+    def register(function):
+        _steps.append((name, function, required))
+        return function
+    return register
+
+
+class Warmup:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.status = "pending"   # pending, running, ready or failed
+        self.steps = {}
+        self.finished_at = None
+        self._lock = threading.Lock()   # a new one: a fork may copy it held
+
+    @property
+    def ready(self):
+        return self.status == "ready"
+
+    def start(self, background=True):
+        """Run the warm-up unless it is running, done, or failed only moments ago."""
+        with self._lock:
+            if self.status in ("running", "ready"):
+                return
+            if self.status == "failed" and time.monotonic() - self.finished_at < RETRY_AFTER:
+                return
+            self.status = "running"
+        if background:
+            threading.Thread(target=self.run, name="warmup", daemon=True).start()
+        else:
+            self.run()
+
+    def run(self):
+        autodiscover_modules("warmup")
+        failed = False
+        for name, function, required in list(_steps):
+            started = time.monotonic()
+            try:
+                function()
+            except Exception as e:
+                if required:
+                    logger.exception("Warm-up step %r failed", name)
+                    failed = True
+                else:
+                    logger.warning("Optional warm-up step %r failed: %s", name, e)
+                result = {"status": "failed", "error": str(e)}
+            else:
+                result = {"status": "done"}
+            result["seconds"] = round(time.monotonic() - started, 3)
+            self.steps[name] = result
+
+        with self._lock:
+            self.status = "failed" if failed else "ready"
+            self.finished_at = time.monotonic()
+        logger.info("Warm-up %s", self.status)
+
+
+warmup = Warmup()
+
+if hasattr(os, "register_at_fork"):   # not on Windows
+    os.register_at_fork(after_in_child=warmup.reset)
+
+
+def start_warmup(background=True):
+    warmup.start(background)
+
+
+def readiness(request):
+    """
+    GET /ready/
+    200 once this worker is warm, 503 (with per-step progress) until then.
+    """
+    warmup.start()
+    return JsonResponse(
+        {"ready": warmup.ready, "status": warmup.status, "steps": warmup.steps},
+        status=200 if warmup.ready else 503
+    )
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Load models and fill caches before /ready/ lets traffic in
+from backend.warmup import start_warmup  # noqa: E402
+start_warmup()
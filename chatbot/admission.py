@@ -0,0 +1,116 @@
+import contextvars
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from rest_framework.exceptions import Throttled
+
+
+# The user an LLM call is made for; views set it around graph invocations
+current_user_id = contextvars.ContextVar("llm_user_id", default=None)
+
+
+@contextmanager
+def llm_user(user_id):
+    """Attribute LLM calls made inside the block to this user."""
+    token = current_user_id.set(user_id)
+    try:
+        yield
+    finally:
+        current_user_id.reset(token)
+
+
+class LLMOverloaded(Throttled):
+    """Raised when no LLM slot frees up in time; DRF turns it into a 429 with Retry-After."""
+    default_detail = "The assistant is busy right now. Please try again shortly."
+
+
+class AdmissionController:
+    """
+    Caps the number of concurrent LLM calls in this process.
+
+    Callers beyond the cap wait in a per-user queue until their deadline.
+    Free slots go to the users' queues in round-robin order, so one chatty
+    user waits behind their own messages, not in front of everyone else's.
+    When the queue (overall or for that user) is full, callers are turned
+    away immediately.
+    """
+
+    def __init__(self, max_concurrent, max_queue, max_queued_per_user, timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queued_per_user = max_queued_per_user
+        self.timeout = timeout
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._queues = OrderedDict()   # user -> deque of waiting tickets
+        self._avg_seconds = 1.0        # moving average of call duration
+
+    def retry_after(self):
+        """Seconds until the current queue has probably drained."""
+        backlog = (self._waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(backlog * self._avg_seconds))
+
+    def _turn(self):
+        """The ticket at the head of the longest-unserved user's queue."""
+        for queue in self._queues.values():
+            return queue[0]
+        return None
+
+    def acquire(self, user=None, wait=True):
+        with self._cond:
+            if self._active < self.max_concurrent and not self._waiting:
+                self._active += 1
+                return
+            if not wait:
+                raise LLMOverloaded(wait=self.retry_after())
+
+            queue = self._queues.get(user)
+            if self._waiting >= self.max_queue or (
+                queue is not None and len(queue) >= self.max_queued_per_user
+            ):
+                raise LLMOverloaded(wait=self.retry_after())
+
+            ticket = object()
+            self._queues.setdefault(user, deque()).append(ticket)
+            self._waiting += 1
+            deadline = time.monotonic() + self.timeout
+            served = False
+            try:
+                while not (self._active < self.max_concurrent and self._turn() is ticket):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMOverloaded(wait=self.retry_after())
+                    self._cond.wait(remaining)
+                self._active += 1
+                served = True
+            finally:
+                queue = self._queues[user]
+                queue.remove(ticket)
+                if served or not queue:
+                    # Served users go to the back of the line
+                    del self._queues[user]
+                    if queue:
+                        self._queues[user] = queue
+                self._waiting -= 1
+                self._cond.notify_all()
+
+    def release(self, seconds=None):
+        with self._cond:
+            self._active -= 1
+            if seconds is not None:
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * seconds
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, user=None, wait=True):
+        self.acquire(user, wait)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
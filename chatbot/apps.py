@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ChatbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chatbot'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Lets ops swap in a rebuilt RAG index with `kill -USR2 <worker pid>`
+        from .rag import install_reload_signal
+        install_reload_signal()
@@ -0,0 +1,59 @@
+import threading
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+
+class ThreadLocks:
+    """
+    One lock per chat thread_id, so turns on the same conversation run one
+    at a time. A lock is dropped once nobody holds or waits for it.
+
+    The graph checkpointer keeps conversation state in process memory, so a
+    process-local lock covers every writer of that state.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def hold(self, name):
+        with self._guard:
+            entry = self._locks.setdefault(name, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[name]
+
+
+thread_locks = ThreadLocks()
+
+
+# =========================
+# IDEMPOTENT REPLIES
+# =========================
+
+# How long a retried message gets the stored answer instead of a new one
+REPLY_TTL = 10 * 60
+
+
+def _reply_key(user_id, idempotency_key):
+    return f"chat-reply:{user_id}:{idempotency_key}"
+
+
+def get_reply(user_id, idempotency_key):
+    """Return the reply already computed for this client message, if any."""
+    if not idempotency_key:
+        return None
+    return cache.get(_reply_key(user_id, idempotency_key))
+
+
+def store_reply(user_id, idempotency_key, reply):
+    if idempotency_key:
+        cache.set(_reply_key(user_id, idempotency_key), reply, REPLY_TTL)
@@ -1,4 +1,5 @@
 from typing import Optional
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 from langgraph.graph import MessagesState
 from langgraph.checkpoint.memory import MemorySaver
@@ -6,7 +7,8 @@ from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
 from .llm import llm
-from .rag import retriever
+from .rag import get_embeddings, rag_index
+from .router import intent_router, keyword_intent
 from .tools import (
     wikipedia_tool,
     tavily_search,
@@ -22,6 +24,8 @@ from .models import FavoriteDestination
 class AgentState(MessagesState):
     intent: str
     user_name: Optional[str] = None
+    # Running summary of the messages that fell out of the prompt window
+    summary: str
 
 
 # =========================
@@ -42,30 +46,62 @@ SYSTEM_TREKKA = SystemMessage(
 )
 
 
+def prompt_history(state):
+    """The thread's messages, with the running summary after the system prompt."""
+    messages = state["messages"]
+    summary = state.get("summary")
+    if not summary:
+        return messages
+    note = SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+    if messages and isinstance(messages[0], SystemMessage):
+        return [messages[0], note] + messages[1:]
+    return [note] + messages
+
+
+
+# =========================
+# EMBEDDING HANDOFF
+# =========================
+
+# Intents whose node answers from the RAG index
+RAG_INTENTS = {"rag"}
+
+# Query embeddings computed by intent_node for a RAG intent, keyed by
+# thread_id, so rag_node searches without embedding the message again
+_routed_embeddings = {}
+
+
+def _thread_id(config):
+    return (config or {}).get("configurable", {}).get("thread_id")
+
 
 # =========================
 # INTENT NODE
 # =========================
-def intent_node(state: AgentState):
-    text = state["messages"][-1].content.lower()
-
-    if "save" in text:
-        state["intent"] = "save"
-    elif "weather" in text:
-        state["intent"] = "weather"
-    elif "news" in text:
-        state["intent"] = "nepali_news"
-    elif "wikipedia" in text:
-        state["intent"] = "wiki"
-    elif "search" in text:
-        state["intent"] = "tavily"
-    elif any(k in text for k in ["local information"]):
-        state["intent"] = "rag"
-    else:
-        state["intent"] = "chat"
+def intent_node(state: AgentState, config: RunnableConfig):
+    query = state["messages"][-1].content
 
-        # Debugging
-    print(f"[DEBUG] User text: {text} -> Intent: {state['intent']}")
+    # Keyword rules settle the obvious messages; everything else is routed
+    # on its embedding
+    intent, confidence = keyword_intent(query), 1.0
+    embedding = None
+    if intent is None:
+        try:
+            embedding = get_embeddings().embed_query(query)
+            intent, confidence = intent_router.classify(query, embedding)
+        except Exception as e:
+            print(f"[ROUTER] Could not embed the message, answering as chat: {e}")
+            intent, confidence = "chat", 0.0
+    state["intent"] = intent
+
+    # Debugging
+    print(f"[DEBUG] User text: {query.lower()} -> Intent: {intent} ({confidence:.2f})")
+
+    # Drop one left by an earlier turn whose rag_node never ran
+    thread_id = _thread_id(config)
+    _routed_embeddings.pop(thread_id, None)
+    if intent in RAG_INTENTS and embedding is not None:
+        _routed_embeddings[thread_id] = (query, embedding)
 
     return state
 
@@ -75,7 +111,7 @@ def intent_node(state: AgentState):
 # =========================
 def chat_node(state: AgentState):
     print("[DEBUG] Entering CHAT node")
-    response = llm.invoke(state["messages"])
+    response = llm.invoke(prompt_history(state))
     state["messages"].append(response)
     return state
 
@@ -83,15 +119,19 @@ def chat_node(state: AgentState):
 # =========================
 # RAG NODE
 # =========================
-def rag_node(state: AgentState):
+def rag_node(state: AgentState, config: RunnableConfig):
     print("[DEBUG] Entering rag node")
     query = state["messages"][-1].content
-    docs = retriever.invoke(query)
+
+    routed_query, embedding = _routed_embeddings.pop(_thread_id(config), (None, None))
+    if routed_query != query:
+        embedding = None
+    docs = rag_index.retrieve(query, embedding=embedding)
 
     context = "\n\n".join(d.page_content for d in docs)
 
     response = llm.invoke(
-        state["messages"] + [
+        prompt_history(state) + [
             SystemMessage(content="Use the context below to answer naturally."),
             HumanMessage(content=f"Context:\n{context}\n\nQuestion:\n{query}")
         ]
@@ -161,7 +201,7 @@ def nepali_news_node(state: AgentState):
         return state
 
     response = llm.invoke(
-        state["messages"] + [
+        prompt_history(state) + [
             HumanMessage(content=f"Summarize these news articles clearly:\n{articles}")
         ]
     )
@@ -0,0 +1,250 @@
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+import numpy as np
+import ormsgpack
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+# Web workers talk to one local inference process that hosts the embedding
+# model, the FAISS index and the reranker, instead of each loading its own.
+#
+# Wire format: every message is a 4-byte big-endian length followed by an
+# ormsgpack map. Requests are {"op": ..., **params}; responses are
+# {"ok": true, "result": ...} or {"ok": false, "error": "..."}. Vectors
+# travel as raw float32 bytes.
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+
+class InferenceError(Exception):
+    pass
+
+
+def send_frame(sock, payload):
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("inference socket closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_frame(sock):
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    if size > MAX_FRAME:
+        raise ConnectionError(f"frame of {size} bytes is too large")
+    return _recv_exactly(sock, size)
+
+
+def pack_vector(vector):
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def unpack_vector(data):
+    return np.frombuffer(data, dtype=np.float32).tolist()
+
+
+def pack_docs(docs):
+    return [{"page_content": d.page_content, "metadata": d.metadata} for d in docs]
+
+
+def unpack_docs(items):
+    return [Document(page_content=i["page_content"], metadata=i["metadata"]) for i in items]
+
+
+# =========================
+# CLIENT
+# =========================
+
+class InferenceClient:
+    """
+    Calls the inference process over its Unix socket. Each thread keeps
+    its own connection open between calls; a connection the server has
+    dropped is replaced once before the call fails.
+    """
+
+    def __init__(self, path, timeout=10.0, connect_timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+    def _socket(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.connect_timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            sock.settimeout(self.timeout)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def call(self, op, **params):
+        payload = ormsgpack.packb({"op": op, **params})
+        for attempt in range(2):
+            try:
+                sock = self._socket()
+                send_frame(sock, payload)
+                response = ormsgpack.unpackb(recv_frame(sock))
+                break
+            except TimeoutError:
+                # The answer may still arrive; never read it as the next reply
+                self._close()
+                raise InferenceError(f"{op} timed out after {self.timeout}s")
+            except OSError as e:
+                self._close()
+                if attempt:
+                    raise InferenceError(f"inference server unreachable at {self.path}: {e}") from e
+
+        if not response["ok"]:
+            raise InferenceError(response["error"])
+        return response["result"]
+
+
+class RemoteEmbeddings(Embeddings):
+    """The embedding model of the inference process."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def embed_query(self, text):
+        return unpack_vector(self.client.call("embed_query", text=text))
+
+    def embed_documents(self, texts):
+        return [unpack_vector(v) for v in self.client.call("embed_documents", texts=texts)]
+
+
+class RemoteRagIndex:
+    """Same interface as rag.RagIndex, served by the inference process."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @property
+    def version(self):
+        return self.client.call("version")
+
+    @staticmethod
+    def _vector(embedding):
+        return None if embedding is None else pack_vector(embedding)
+
+    def search(self, query, k=None, embedding=None):
+        return unpack_docs(self.client.call("search", query=query, k=k, embedding=self._vector(embedding)))
+
+    def candidates(self, query, k=None, embedding=None):
+        return unpack_docs(self.client.call("candidates", query=query, k=k, embedding=self._vector(embedding)))
+
+    def retrieve(self, query, embedding=None, rerank=None):
+        return unpack_docs(
+            self.client.call("retrieve", query=query, embedding=self._vector(embedding), rerank=rerank)
+        )
+
+    def reload(self, background=False):
+        if background:
+            threading.Thread(target=self.reload, daemon=True).start()
+            return None
+        return self.client.call("reload")
+
+    def rebuild(self):
+        return self.client.call("rebuild")
+
+    def start_watcher(self):
+        """The inference process watches CURRENT itself."""
+
+
+# =========================
+# SERVER
+# =========================
+
+class InferenceHandler(socketserver.BaseRequestHandler):
+    """Serves one client connection until it closes."""
+
+    def handle(self):
+        while True:
+            try:
+                request = ormsgpack.unpackb(recv_frame(self.request))
+            except (ConnectionError, OSError):
+                return
+            try:
+                response = {"ok": True, "result": self.server.dispatch(request)}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            try:
+                send_frame(self.request, ormsgpack.packb(response))
+            except OSError:
+                return   # client gave up waiting
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, index, embeddings):
+        self.index = index
+        self.embeddings = embeddings
+        if os.path.exists(path):
+            os.unlink(path)   # left over from a previous run
+        super().__init__(path, InferenceHandler)
+        os.chmod(path, 0o660)
+
+    def dispatch(self, request):
+        op = request.pop("op")
+        handler = getattr(self, f"op_{op}", None)
+        if handler is None:
+            raise ValueError(f"unknown op {op!r}")
+        return handler(**request)
+
+    @staticmethod
+    def _embedding(data):
+        return None if data is None else unpack_vector(data)
+
+    def op_embed_query(self, text):
+        return pack_vector(self.embeddings.embed_query(text))
+
+    def op_embed_documents(self, texts):
+        return [pack_vector(v) for v in self.embeddings.embed_documents(texts)]
+
+    def op_version(self):
+        return self.index.version
+
+    def op_search(self, query, k=None, embedding=None):
+        options = {"k": k} if k else {}
+        return pack_docs(self.index.search(query, embedding=self._embedding(embedding), **options))
+
+    def op_candidates(self, query, k=None, embedding=None):
+        options = {"k": k} if k else {}
+        return pack_docs(self.index.candidates(query, embedding=self._embedding(embedding), **options))
+
+    def op_retrieve(self, query, embedding=None, rerank=None):
+        return pack_docs(self.index.retrieve(query, embedding=self._embedding(embedding), rerank=rerank))
+
+    def op_reload(self):
+        return self.index.reload()
+
+    def op_rebuild(self):
+        return self.index.rebuild()
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
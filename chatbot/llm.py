@@ -1,6 +1,14 @@
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
+import contextvars
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .admission import AdmissionController, LLMOverloaded, current_user_id
+from .usage import QuotaExceeded, current_intent, usage_recorder
 
 # Load .env file
 load_dotenv()
@@ -8,8 +16,201 @@ load_dotenv()
 # Get API key from environment
 api_key = os.getenv("Groq_API_KEY")
 
-llm = ChatGroq(
-    api_key=api_key,   # use the actual value from .env
-    model="llama-3.1-8b-instant",
-    temperature=0.2
+PRIMARY_MODEL = "llama-3.1-8b-instant"
+# Model hedged requests and failover go to; empty disables both. A hedge
+# only helps if it is no slower than the primary, so by default it is a
+# second request to the same model
+FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", PRIMARY_MODEL)
+
+# Refusals of our own (admission queue, daily quota): not provider failures
+REFUSALS = (LLMOverloaded, QuotaExceeded)
+
+# Outbound call limits for this process (see AdmissionController)
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+    max_queued_per_user=int(os.getenv("LLM_MAX_QUEUED_PER_USER", "3")),
+    timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "20")),
+)
+
+
+class LLMRouter:
+    """
+    Sends each call to the first healthy provider. If it has not answered
+    within its recent p95 latency, the same call is also sent to the next
+    healthy provider and whichever answers first wins; the slower answer is
+    discarded. A provider that fails `failure_threshold` times in a row is
+    skipped for `cooldown` seconds, and a failed call moves straight on to
+    the next provider.
+
+    Providers are usually AdmittedLLM wrappers, so every attempt, the
+    losing hedge included, holds its own admission slot and records its
+    own tokens. Slots are taken on the calling thread before an attempt
+    goes to the pool, so callers wait in the admission queue (fair between
+    users, with a deadline and a 429) rather than in the pool's; hedges
+    only take a slot that is free now and are dropped otherwise. Attempts
+    run in a copy of the caller's context, so the user, the graph node and
+    LangChain callbacks follow them into the pool threads.
+    """
+
+    def __init__(self, providers, default_hedge_delay=2.0, min_hedge_delay=0.25,
+                 failure_threshold=3, cooldown=30.0, window=200, max_workers=32):
+        self.providers = list(providers)   # [(name, chat model), ...]
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._latencies = {name: deque(maxlen=window) for name, _ in self.providers}
+        self._failures = {name: 0 for name, _ in self.providers}
+        self._benched_until = {name: 0.0 for name, _ in self.providers}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    def hedge_delay(self, name):
+        """Seconds to wait on a provider before hedging: its p95 latency."""
+        with self._lock:
+            samples = sorted(self._latencies[name])
+        if len(samples) < 20:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, samples[int(0.95 * (len(samples) - 1))])
+
+    def healthy(self):
+        now = time.monotonic()
+        with self._lock:
+            providers = [p for p in self.providers if self._benched_until[p[0]] <= now]
+        # With everyone benched, trying is better than failing outright
+        return providers or list(self.providers)
+
+    def _call(self, name, call, args, kwargs):
+        started = time.monotonic()
+        try:
+            response = call(*args, **kwargs)
+        except REFUSALS:
+            raise
+        except Exception:
+            with self._lock:
+                self._failures[name] += 1
+                if self._failures[name] >= self.failure_threshold:
+                    self._benched_until[name] = time.monotonic() + self.cooldown
+            raise
+        with self._lock:
+            self._latencies[name].append(time.monotonic() - started)
+            self._failures[name] = 0
+        return response
+
+    def invoke(self, *args, **kwargs):
+        candidates = deque(self.healthy())
+        pending = {}   # future -> True for hedges
+        error = None
+
+        def launch(hedge):
+            name, model = candidates[0]
+            call = model.invoke
+            if hasattr(model, "admit"):
+                # Raises LLMOverloaded / QuotaExceeded here, on the caller;
+                # a refused provider stays a candidate for the next try
+                model.admit(wait=not hedge)
+                call = model.invoke_admitted
+            candidates.popleft()
+            context = contextvars.copy_context()
+            future = self._pool.submit(context.run, self._call, name, call, args, kwargs)
+            pending[future] = hedge
+            return name
+
+        while candidates or pending:
+            if not pending:
+                # First attempt, or failover after everything in flight failed
+                newest = launch(hedge=False)
+            done, _ = wait(
+                pending,
+                timeout=self.hedge_delay(newest) if candidates else None,
+                return_when=FIRST_COMPLETED
+            )
+            if not done:
+                # Slower than usual: hedge on the next provider
+                try:
+                    newest = launch(hedge=True)
+                except REFUSALS:
+                    pass   # no free slot: keep waiting on what is in flight
+                continue
+            for future in done:
+                hedge = pending.pop(future)
+                try:
+                    return future.result()
+                except REFUSALS as e:
+                    if not hedge:
+                        raise   # no slot or no quota: failing over won't help
+                except Exception as e:
+                    error = e
+        raise error
+
+
+class AdmittedLLM:
+    """
+    Chat model wrapper that enforces the user's daily token quota, takes an
+    admission slot for every call and records the call's token usage.
+    LLMRouter splits a call in two: admit() on the request thread, then
+    invoke_admitted() on a pool thread.
+    """
+
+    def __init__(self, llm, controller, recorder=None):
+        self.llm = llm
+        self.controller = controller
+        self.recorder = recorder
+
+    def admit(self, wait=True):
+        """Check the caller's quota and take a slot for one invoke_admitted() call."""
+        user_id = current_user_id.get()
+        if self.recorder is not None:
+            self.recorder.check_quota(user_id)
+        self.controller.acquire(user_id, wait)
+
+    def invoke(self, *args, **kwargs):
+        self.admit()
+        return self.invoke_admitted(*args, **kwargs)
+
+    def invoke_admitted(self, *args, **kwargs):
+        """Make the call in the slot admit() took, then release it."""
+        user_id = current_user_id.get()
+        started = time.monotonic()
+        try:
+            response = self.llm.invoke(*args, **kwargs)
+        finally:
+            latency = time.monotonic() - started
+            self.controller.release(latency)
+
+        if self.recorder is not None:
+            tokens = getattr(response, "usage_metadata", None) or {}
+            self.recorder.record(
+                user_id=user_id,
+                model=getattr(response, "response_metadata", {}).get("model_name", ""),
+                intent=current_intent(),
+                prompt_tokens=tokens.get("input_tokens", 0),
+                completion_tokens=tokens.get("output_tokens", 0),
+                latency_ms=int(latency * 1000),
+            )
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+def _groq(model):
+    return ChatGroq(
+        api_key=api_key,   # use the actual value from .env
+        model=model,
+        temperature=0.2
+    )
+
+
+providers = [("primary", _groq(PRIMARY_MODEL))]
+if FALLBACK_MODEL:
+    providers.append(("fallback", _groq(FALLBACK_MODEL)))
+
+# Admission and usage wrap each provider, not the router, so hedges count.
+# Every attempt in the pool holds a slot, so max_concurrent threads suffice
+llm = LLMRouter(
+    [(name, AdmittedLLM(model, admission, usage_recorder)) for name, model in providers],
+    max_workers=admission.max_concurrent,
 )
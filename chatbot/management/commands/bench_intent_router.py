@@ -0,0 +1,79 @@
+import json
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from chatbot.rag import get_embeddings
+from chatbot.router import intent_router, keyword_intent
+
+
+LABELS_PATH = os.path.join(os.path.dirname(__file__), "intent_benchmark.json")
+
+
+def substring_intent(text):
+    """The routing rules intent_node used before the embedding router."""
+    text = text.lower()
+    if "save" in text:
+        return "save"
+    elif "weather" in text:
+        return "weather"
+    elif "news" in text:
+        return "nepali_news"
+    elif "wikipedia" in text:
+        return "wiki"
+    elif "search" in text:
+        return "tavily"
+    elif "local information" in text:
+        return "rag"
+    return "chat"
+
+
+class Command(BaseCommand):
+    help = "Measure intent routing accuracy and per-message overhead on a labeled set."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--labels", default=LABELS_PATH, help="JSON list of [message, intent] pairs")
+        parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions per message")
+
+    def handle(self, *args, **options):
+        with open(options["labels"]) as f:
+            labeled = json.load(f)
+
+        embeddings = get_embeddings()
+        intent_router.centroids()  # exclude the one-off centroid build from timings
+        vectors = [embeddings.embed_query(text) for text, _ in labeled]
+
+        routers = {
+            "substring rules": lambda text, vector: substring_intent(text),
+            "keyword fast path + centroids": lambda text, vector: intent_router.route(text, vector)[0],
+        }
+        for name, route in routers.items():
+            correct, timings = 0, []
+            misses = []
+            for (text, expected), vector in zip(labeled, vectors):
+                started = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    intent = route(text, vector)
+                timings.append((time.perf_counter() - started) / options["repeat"] * 1000)
+                if intent == expected:
+                    correct += 1
+                else:
+                    misses.append(f"    {text!r}: expected {expected}, got {intent}")
+
+            self.stdout.write(
+                f"{name}: {correct}/{len(labeled)} correct ({correct / len(labeled):.0%}), "
+                f"routing overhead mean {statistics.mean(timings):.3f} ms, max {max(timings):.3f} ms"
+            )
+            for line in misses:
+                self.stdout.write(line)
+
+        started = time.perf_counter()
+        for text, _ in labeled:
+            if keyword_intent(text) is None:
+                embeddings.embed_query(text)
+        self.stdout.write(
+            f"embedding cost of the messages keywords leave to the router: "
+            f"{(time.perf_counter() - started) / len(labeled) * 1000:.1f} ms/message"
+        )
@@ -0,0 +1,94 @@
+import json
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from chatbot.rag import RERANK_CANDIDATES, SEARCH_K, get_embeddings, rag_index
+from chatbot.rerank import reranker
+from chatbot.transcripts import estimate_tokens
+
+
+QUESTIONS_PATH = os.path.join(os.path.dirname(__file__), "rag_benchmark.json")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare plain top-k retrieval with BM25 + cross-encoder reranking: "
+        "answer recall, prompt context size and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--questions",
+            default=QUESTIONS_PATH,
+            help="JSON list of [question, phrase the answer context must contain] pairs",
+        )
+        parser.add_argument(
+            "--generate",
+            action="store_true",
+            help="Also time LLM generation with each context (calls the live model)",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["questions"]) as f:
+            questions = json.load(f)
+
+        embeddings = get_embeddings()
+        rag_index.reload()
+        vectors = [embeddings.embed_query(q) for q, _ in questions]
+
+        setups = [
+            (f"dense top {SEARCH_K}", lambda q, v: rag_index.search(q, SEARCH_K, embedding=v)),
+        ]
+        for top_n in (1, 2):
+            setups.append((
+                f"{RERANK_CANDIDATES}+{RERANK_CANDIDATES} candidates, reranked top {top_n}",
+                lambda q, v, n=top_n: reranker.rerank(q, rag_index.candidates(q, embedding=v), n),
+            ))
+
+        # Load the cross-encoder outside the timings
+        reranker.rerank(questions[0][0], rag_index.candidates(questions[0][0], embedding=vectors[0]), 1)
+
+        for name, retrieve in setups:
+            hits, tokens, timings, generation = 0, [], [], []
+            for (question, expected), vector in zip(questions, vectors):
+                reranker.clear_cache()
+                started = time.perf_counter()
+                docs = retrieve(question, vector)
+                timings.append((time.perf_counter() - started) * 1000)
+
+                context = "\n\n".join(d.page_content for d in docs)
+                hits += expected.lower() in context.lower()
+                tokens.append(estimate_tokens(context))
+
+                if options["generate"]:
+                    generation.append(self._generate(question, context))
+
+            line = (
+                f"{name}: recall {hits}/{len(questions)} ({hits / len(questions):.0%}), "
+                f"context {statistics.mean(tokens):.0f} tokens, "
+                f"retrieval {statistics.mean(timings):.1f} ms"
+            )
+            if generation:
+                line += f", generation {statistics.mean(generation):.0f} ms"
+            self.stdout.write(line)
+
+        # The score cache makes a repeated question cost no model calls
+        question, _ = questions[0]
+        started = time.perf_counter()
+        reranker.rerank(question, rag_index.candidates(question, embedding=vectors[0]), 2)
+        self.stdout.write(f"repeated question, cached scores: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    @staticmethod
+    def _generate(question, context):
+        from chatbot.llm import llm
+
+        started = time.perf_counter()
+        llm.invoke([
+            SystemMessage(content="Use the context below to answer naturally."),
+            HumanMessage(content=f"Context:\n{context}\n\nQuestion:\n{question}")
+        ])
+        return (time.perf_counter() - started) * 1000
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Run in a fresh interpreter: import what a web worker imports, answer one
+# RAG question and report the resident set size
+WORKER_SCRIPT = """
+import django
+django.setup()
+from chatbot.graph import app
+from chatbot.rag import get_embeddings, rag_index
+from chatbot.router import intent_router
+query = "best time to visit Pokhara"
+embedding = get_embeddings().embed_query(query)
+intent_router.route(query, embedding)
+rag_index.retrieve(query, embedding=embedding)
+for line in open("/proc/self/status"):
+    if line.startswith("VmRSS"):
+        print(int(line.split()[1]) // 1024)
+"""
+
+
+def _rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS"):
+                return int(line.split()[1]) // 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-worker memory with in-process models versus the shared "
+        "inference server, and the total for a given number of workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Worker count for the totals (default: 4)")
+
+    def _worker_rss(self, env):
+        result = subprocess.run(
+            [sys.executable, "-c", WORKER_SCRIPT],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        return int(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "backend.settings")}
+        env.pop("RAG_INFERENCE_SOCKET", None)
+
+        local = self._worker_rss(env)
+        self.stdout.write(f"in-process models: {local} MB per worker, {workers * local} MB for {workers} workers")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "inference.sock")
+            server = subprocess.Popen(
+                [sys.executable, "manage.py", "run_inference_server", "--socket", path],
+                env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL,
+            )
+            try:
+                deadline = time.monotonic() + 300
+                while not os.path.exists(path):
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("inference server did not start")
+                    time.sleep(0.2)
+
+                remote = self._worker_rss({**env, "RAG_INFERENCE_SOCKET": path})
+                sidecar = _rss_mb(server.pid)
+            finally:
+                server.terminate()
+                server.wait()
+
+        self.stdout.write(
+            f"inference server: {remote} MB per worker + {sidecar} MB server, "
+            f"{workers * remote + sidecar} MB for {workers} workers"
+        )
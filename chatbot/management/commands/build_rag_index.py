@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.rag import build_index, PDF_PATH
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a new RAG index version from the travel guides and make it live. "
+        "Running workers pick it up on their next CURRENT check or on SIGUSR2."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "pdfs",
+            nargs="*",
+            help=f"PDF guides to index (default: {PDF_PATH})",
+        )
+
+    def handle(self, *args, **options):
+        version = build_index(options["pdfs"] or None)
+        self.stdout.write(self.style.SUCCESS(f"RAG index version {version} is live"))
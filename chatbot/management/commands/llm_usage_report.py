@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.db.models import Count, Sum
+from django.utils import timezone
+from django.core.management.base import BaseCommand
+
+from chatbot.models import LLMUsage
+from chatbot.usage import usage_recorder
+
+
+class Command(BaseCommand):
+    help = "Summarise LLM token usage by user, intent or model."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=1, help="How many days back to include (default: 1)")
+        parser.add_argument(
+            "--by",
+            choices=["user", "intent", "model"],
+            default="user",
+            help="Group totals by this column (default: user)",
+        )
+        parser.add_argument("--limit", type=int, default=20, help="Rows to show (default: 20)")
+
+    def handle(self, *args, **options):
+        usage_recorder.flush()
+        column = "user__email" if options["by"] == "user" else options["by"]
+        since = timezone.now() - timedelta(days=options["days"])
+        rows = (
+            LLMUsage.objects
+            .filter(created_at__gte=since)
+            .values(column)
+            .annotate(
+                calls=Count("id"),
+                prompt=Sum("prompt_tokens"),
+                completion=Sum("completion_tokens"),
+                latency=Sum("latency_ms"),
+            )
+            .order_by("-completion", "-prompt")[:options["limit"]]
+        )
+        self.stdout.write(f"{options['by']:<30} {'calls':>7} {'prompt':>10} {'completion':>11} {'avg ms':>8}")
+        for row in rows:
+            name = row[column] or "-"
+            self.stdout.write(
+                f"{name:<30} {row['calls']:>7} {row['prompt']:>10} {row['completion']:>11} "
+                f"{row['latency'] // row['calls']:>8}"
+            )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.weather import prefetch_forecasts
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch and store forecasts for every catalogued destination. "
+        "Meant to run nightly from cron, off-peak."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "locations",
+            nargs="*",
+            help="Locations to refresh (default: all catalogued destinations)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Maximum concurrent OpenWeather requests (default: 8)",
+        )
+
+    def handle(self, *args, **options):
+        stored, failed = prefetch_forecasts(options["locations"] or None, workers=options["workers"])
+        for location, error in sorted(failed.items()):
+            self.stderr.write(f"{location}: {error}")
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} forecasts, {len(failed)} failed"))
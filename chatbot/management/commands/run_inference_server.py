@@ -0,0 +1,43 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from chatbot.inference import InferenceServer
+from chatbot.rag import INFERENCE_SOCKET, RELOAD_SIGNAL, RERANK_ENABLED, RagIndex, load_embeddings
+from chatbot.rerank import reranker
+
+
+class Command(BaseCommand):
+    help = (
+        "Host the embedding model, RAG index and reranker for all web workers "
+        "on a Unix socket. Start workers with RAG_INFERENCE_SOCKET pointing at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            default=INFERENCE_SOCKET or "/tmp/trekka-inference.sock",
+            help="Unix socket path (default: $RAG_INFERENCE_SOCKET or /tmp/trekka-inference.sock)",
+        )
+
+    def handle(self, *args, **options):
+        # Always the local models here, whatever RAG_INFERENCE_SOCKET says
+        embeddings = load_embeddings()
+        index = RagIndex()
+        version = index.reload()
+        embeddings.embed_query("warm up")
+        if RERANK_ENABLED:
+            reranker.rerank("warm up", index.search("warm up"), 1)
+
+        signal.signal(RELOAD_SIGNAL, lambda signum, frame: index.reload(background=True))
+
+        server = InferenceServer(options["socket"], index, embeddings)
+        self.stdout.write(self.style.SUCCESS(
+            f"Serving RAG index version {version} on {options['socket']}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
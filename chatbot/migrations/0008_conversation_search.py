@@ -0,0 +1,87 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:04
+
+import uuid
+
+import zstandard as zstd
+from django.conf import settings
+from django.db import migrations, models
+
+# The search index as of this migration (see chatbot/search.py), inlined
+# so later changes to that module can't change what this migration does
+TABLE = 'chatbot_search'
+
+SEARCH_SQL = {
+    'sqlite': {
+        'create': [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "conversation_id UNINDEXED, user_id UNINDEXED, kind UNINDEXED, body, "
+            "tokenize = 'porter unicode61')",
+        ],
+        'insert': f"INSERT INTO {TABLE} (conversation_id, user_id, kind, body) VALUES (%s, %s, %s, %s)",
+    },
+    'postgresql': {
+        'create': [
+            f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+            "id bigserial PRIMARY KEY, conversation_id uuid NOT NULL, user_id bigint NOT NULL, "
+            "kind varchar(10) NOT NULL, document tsvector NOT NULL)",
+            f"CREATE INDEX IF NOT EXISTS {TABLE}_document_idx ON {TABLE} USING GIN (document)",
+            f"CREATE INDEX IF NOT EXISTS {TABLE}_conversation_idx ON {TABLE} (conversation_id)",
+        ],
+        'insert': (
+            f"INSERT INTO {TABLE} (conversation_id, user_id, kind, document) "
+            "VALUES (%s, %s, %s, to_tsvector('english', %s))"
+        ),
+    },
+}
+
+
+def search_key(vendor, conversation_id):
+    # Django stores UUIDs as 32 hex characters on SQLite
+    return uuid.UUID(str(conversation_id)).hex if vendor == 'sqlite' else conversation_id
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in SEARCH_SQL:
+        return
+    for sql in SEARCH_SQL[vendor]['create']:
+        schema_editor.execute(sql)
+
+    # Backfill what was stored before the index existed
+    Conversation = apps.get_model('chatbot', 'Conversation')
+    ChatMessage = apps.get_model('chatbot', 'ChatMessage')
+    rows = []
+    for conv in Conversation.objects.using(schema_editor.connection.alias).iterator():
+        text = f"{conv.title}\n{conv.summary}".strip()
+        if text:
+            rows.append([search_key(vendor, conv.id), conv.user_id, 'meta', text])
+    messages = ChatMessage.objects.using(schema_editor.connection.alias).select_related('conversation')
+    for message in messages.iterator():
+        text = message.content
+        if message.body is not None:
+            text = zstd.ZstdDecompressor().decompress(bytes(message.body)).decode('utf-8')
+        rows.append([search_key(vendor, message.conversation_id), message.conversation.user_id, 'message', text])
+    if rows:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(SEARCH_SQL[vendor]['insert'], rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in SEARCH_SQL:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0007_chatmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='conv_user_created_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0008_conversation_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=100, unique=True)),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(blank=True, max_length=10)),
+                ('days', models.JSONField(default=list)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 import uuid
 
+import zstandard as zstd
+
 User = settings.AUTH_USER_MODEL
 
 
@@ -30,6 +33,120 @@ class Conversation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's conversations, newest first
+            models.Index(fields=["user", "-created_at", "-id"], name="conv_user_created_idx"),
+        ]
 
     def __str__(self):
         return self.title or str(self.id)
+
+
+class ChatMessage(models.Model):
+    """
+    One message of a conversation transcript. Bodies longer than
+    COMPRESS_OVER bytes are stored zstd-compressed in `body` instead of
+    `content`; read either through `text`.
+    """
+    COMPRESS_OVER = 1024
+
+    ROLE_CHOICES = (
+        ("user", "User"),
+        ("assistant", "Assistant"),
+    )
+
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name="messages"
+    )
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    content = models.TextField(blank=True)
+    body = models.BinaryField(null=True, blank=True)
+    token_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # History pages walk backwards by id within one conversation
+            models.Index(fields=["conversation", "-id"], name="chatmsg_conv_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.role}: {self.text[:50]}"
+
+    @classmethod
+    def build(cls, conversation, role, text, token_count=0, created_at=None):
+        """Return an unsaved message, compressing long bodies."""
+        message = cls(
+            conversation=conversation,
+            role=role,
+            token_count=token_count,
+            created_at=created_at or timezone.now()
+        )
+        encoded = text.encode("utf-8")
+        if len(encoded) > cls.COMPRESS_OVER:
+            message.body = zstd.ZstdCompressor().compress(encoded)
+        else:
+            message.content = text
+        return message
+
+    @property
+    def text(self):
+        if self.body is not None:
+            return zstd.ZstdDecompressor().decompress(bytes(self.body)).decode("utf-8")
+        return self.content
+
+
+class WeatherForecast(models.Model):
+    """
+    Daily forecast summaries for a catalogued destination, refreshed in
+    bulk by the prefetch_forecasts command so requests never wait on
+    OpenWeather.
+    """
+    location = models.CharField(max_length=100, unique=True)
+    city = models.CharField(max_length=100)
+    country = models.CharField(max_length=10, blank=True)
+    days = models.JSONField(default=list)  # [{"date", "avg_temp", "condition"}]
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.location} ({self.fetched_at:%Y-%m-%d %H:%M})"
+
+    def as_forecast(self):
+        return {"city": self.city, "country": self.country, "days": self.days}
+
+
+class LLMUsage(models.Model):
+    """
+    Token usage of one LLM call. Rows are written in batches by
+    chatbot.usage.UsageRecorder, never on the request path.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="llm_usage"
+    )
+    model = models.CharField(max_length=100)
+    intent = models.CharField(max_length=30, blank=True)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Daily per-user totals
+            models.Index(fields=["user", "created_at"], name="llmusage_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.model} ({self.intent or 'other'}): {self.total_tokens} tokens"
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
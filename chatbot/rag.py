@@ -1,64 +1,379 @@
+import json
 import os
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+import re
+import shutil
+import signal
+import threading
+import time
 
+from django.utils.text import slugify
 
+from photo_gallery.models import PhotoGallery
 
-# Paths
+from .inference import InferenceClient, RemoteEmbeddings, RemoteRagIndex
+from .rerank import BM25, reranker
 
 
+# Paths
 # Absolute path to chatbot/ directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PDF_PATH = os.path.join(BASE_DIR, "sample.pdf")
 
-# Sanity check
-print("PDF PATH:", PDF_PATH)
-print("FILE EXISTS:", os.path.exists(PDF_PATH))
+# Every build is saved to INDEX_DIR/<version>/ and the CURRENT file names the
+# live version, so workers can pick up a new index without a restart.
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(BASE_DIR, "rag_index"))
+CURRENT_FILE = os.path.join(INDEX_DIR, "CURRENT")
+KEEP_VERSIONS = 3
 
-if not os.path.exists(PDF_PATH):
-    raise FileNotFoundError(f"PDF not found at {PDF_PATH}")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
+SEARCH_K = 4
 
-# Load PDF
+# Optional reranking: a cross-encoder picks the best RERANK_TOP_N of about
+# RERANK_CANDIDATES dense + BM25 candidates, so prompts carry fewer chunks
+RERANK_ENABLED = os.getenv("RAG_RERANK", "").lower() in ("1", "true", "yes")
+RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "20"))
+RERANK_TOP_N = int(os.getenv("RAG_RERANK_TOP_N", "2"))
 
+# Seconds between checks of CURRENT (0 disables the watcher)
+WATCH_INTERVAL = int(os.getenv("RAG_WATCH_INTERVAL", "30"))
 
-loader = PyPDFLoader(PDF_PATH)
-documents = loader.load()
+# gunicorn keeps HUP/USR1 for itself, so workers reload on USR2
+RELOAD_SIGNAL = signal.SIGUSR2
 
+# When set, embeddings and retrieval are served by the run_inference_server
+# process on this Unix socket and web workers load no model or index
+INFERENCE_SOCKET = os.getenv("RAG_INFERENCE_SOCKET")
+INFERENCE_TIMEOUT = float(os.getenv("RAG_INFERENCE_TIMEOUT", "10"))
 
-# Split documents
 
+# =========================
+# EMBEDDINGS (LOCAL + FREE)
+# =========================
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=500,
-    chunk_overlap=50
-)
+_embeddings = None
+_embeddings_lock = threading.Lock()
 
-documents = text_splitter.split_documents(documents)
 
+def load_embeddings():
+    """Load the embedding model once per process."""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            # Imports torch; only processes that embed locally pay for it
+            from langchain_huggingface import HuggingFaceEmbeddings
+            _embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    return _embeddings
 
-# Embeddings (LOCAL + FREE)
 
+def get_embeddings():
+    """The embedding model: the inference process's when one is configured."""
+    if INFERENCE_SOCKET:
+        return _remote_embeddings
+    return load_embeddings()
 
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
 
+# =========================
+# LOCATIONS
+# =========================
 
-# Vector Store
+# Words that say what kind of place it is rather than which place
+GENERIC_LOCATION_WORDS = {
+    "base", "camp", "circuit", "hill", "lake", "mountain", "mt", "national",
+    "park", "region", "temple", "trek", "valley", "village",
+}
 
 
-vectorstore = FAISS.from_documents(
-    documents=documents,
-    embedding=embeddings
+def _location_keywords():
+    """
+    Map the words people type ("everest", "abc", "rara") onto catalogue
+    locations. Every distinctive word of a name counts, plus one-word
+    nicknames in brackets like "(Fishtail)".
+    """
+    keywords = {}
+    for name, _ in PhotoGallery.LOCATION_CHOICES:
+        if name == "Other":
+            continue
+        core, _, nickname = name.partition("(")
+        words = set(re.findall(r"[a-z]+", core.lower()))
+        distinctive = {w for w in words if len(w) >= 4 and w not in GENERIC_LOCATION_WORDS}
+        nickname = nickname.split(")")[0].strip().lower()
+        if nickname and " " not in nickname and nickname not in GENERIC_LOCATION_WORDS:
+            distinctive.add(nickname)
+        for keyword in distinctive | {" ".join(core.lower().split())}:
+            keywords.setdefault(keyword, set()).add(name)
+    return keywords
+
+
+LOCATION_KEYWORDS = _location_keywords()
+_LOCATION_RE = re.compile(
+    r"\b(" + "|".join(
+        re.escape(k) for k in sorted(LOCATION_KEYWORDS, key=len, reverse=True)
+    ) + r")\b"
 )
 
 
-# Retriever
+def match_locations(text):
+    """Return the catalogue locations a piece of text talks about."""
+    found = set()
+    for keyword in _LOCATION_RE.findall(text.lower()):
+        found |= LOCATION_KEYWORDS[keyword]
+    return found
 
 
-retriever = vectorstore.as_retriever(
-    search_kwargs={"k": 4}
-)
+# =========================
+# INDEX BUILD
+# =========================
+
+def load_documents(pdf_paths=None):
+    """Load the travel guides and split them into chunks."""
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    documents = []
+    for path in pdf_paths or [PDF_PATH]:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"PDF not found at {path}")
+        documents.extend(PyPDFLoader(path).load())
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=500,
+        chunk_overlap=50
+    )
+    chunks = text_splitter.split_documents(documents)
+    for chunk in chunks:
+        chunk.metadata["locations"] = sorted(match_locations(chunk.page_content))
+    return chunks
+
+
+def current_version():
+    """Return the version named by CURRENT, or None if nothing was built yet."""
+    try:
+        with open(CURRENT_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_current(version):
+    tmp = f"{CURRENT_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, CURRENT_FILE)
+
+
+def _prune_versions():
+    live = current_version()
+    versions = sorted(
+        name for name in os.listdir(INDEX_DIR)
+        if os.path.isdir(os.path.join(INDEX_DIR, name)) and not name.endswith(".tmp")
+    )
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != live:
+            shutil.rmtree(os.path.join(INDEX_DIR, name), ignore_errors=True)
+
+
+def build_index(pdf_paths=None):
+    """
+    Build a new index version on disk and make it the live one.
+    Besides the global index, every location gets a sub-index of the chunks
+    tagged with it. Workers swap to the new version on their next reload.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    documents = load_documents(pdf_paths)
+    embeddings = load_embeddings()
+    # Embed once, shared by the global index and the location shards
+    vectors = embeddings.embed_documents([d.page_content for d in documents])
+
+    def _store(indices):
+        return FAISS.from_embeddings(
+            [(documents[i].page_content, vectors[i]) for i in indices],
+            embeddings,
+            metadatas=[documents[i].metadata for i in indices],
+        )
+
+    by_location = {}
+    for i, doc in enumerate(documents):
+        for location in doc.metadata["locations"]:
+            by_location.setdefault(location, []).append(i)
+
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    version = time.strftime("%Y%m%d%H%M%S")
+    path = os.path.join(INDEX_DIR, version)
+    tmp = f"{path}.{os.getpid()}.tmp"
+
+    _store(range(len(documents))).save_local(tmp)
+    shards = {}
+    for location, indices in by_location.items():
+        shards[location] = f"shard-{slugify(location)}"
+        _store(indices).save_local(tmp, index_name=shards[location])
+    with open(os.path.join(tmp, "shards.json"), "w") as f:
+        json.dump(shards, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+    _write_current(version)
+    _prune_versions()
+    print(f"[RAG] Built index version {version} ({len(documents)} chunks)")
+    return version
+
+
+# =========================
+# LIVE INDEX
+# =========================
+
+class RagIndex:
+    """
+    Holds the vector stores for the live index version.
+
+    The (version, vectorstore, shards, bm25) tuple is replaced with a single
+    reference swap, so a request that already grabbed the old stores
+    finishes on them and the old index is freed once the last such request
+    lets go of it.
+    """
+
+    def __init__(self):
+        self._active = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+
+    @property
+    def version(self):
+        active = self._active
+        return active[0] if active else None
+
+    def _get_active(self):
+        active = self._active
+        if active is None:
+            self.reload()
+            active = self._active
+        return active
+
+    def search(self, query, k=SEARCH_K, embedding=None):
+        """
+        Return the k chunks closest to the query. A query that names known
+        locations only searches those locations' shards, topped up from the
+        global index when the shards hold fewer than k chunks.
+        """
+        _, vectorstore, shards, _ = self._get_active()
+        if embedding is None:
+            embedding = load_embeddings().embed_query(query)
+
+        scored = []
+        for location in match_locations(query) & shards.keys():
+            scored.extend(shards[location].similarity_search_with_score_by_vector(embedding, k))
+        # Shard hits first; the global index only fills the remaining places
+        ranked = sorted(scored, key=lambda pair: pair[1])
+        if len(scored) < k:
+            ranked += vectorstore.similarity_search_with_score_by_vector(embedding, k)
+
+        docs, seen = [], set()
+        for doc, _ in ranked:
+            if doc.page_content not in seen:
+                seen.add(doc.page_content)
+                docs.append(doc)
+        return docs[:k]
+
+    def candidates(self, query, k=RERANK_CANDIDATES, embedding=None):
+        """Up to 2*k distinct chunks: the k nearest by embedding plus the k best by BM25."""
+        bm25 = self._get_active()[3]
+        docs, seen = [], set()
+        for doc in self.search(query, k, embedding) + bm25.search(query, k):
+            if doc.page_content not in seen:
+                seen.add(doc.page_content)
+                docs.append(doc)
+        return docs
+
+    def retrieve(self, query, embedding=None, rerank=None):
+        """
+        The chunks to put in the RAG prompt: the RERANK_TOP_N best reranked
+        candidates when reranking is on, else the SEARCH_K nearest chunks.
+        """
+        if rerank is None:
+            rerank = RERANK_ENABLED
+        if rerank:
+            return reranker.rerank(query, self.candidates(query, embedding=embedding), RERANK_TOP_N)
+        return self.search(query, SEARCH_K, embedding)
+
+    def rebuild(self):
+        """Build a new index version from the guides and serve it."""
+        build_index()
+        return self.reload()
+
+    def reload(self, background=False):
+        """
+        Load the version named by CURRENT (building one if none exists) and
+        swap it in. Returns the live version.
+        """
+        if background:
+            threading.Thread(target=self.reload, daemon=True).start()
+            return self.version
+
+        with self._reload_lock:
+            version = current_version() or build_index()
+            if version == self.version:
+                return version
+
+            path = os.path.join(INDEX_DIR, version)
+            vectorstore = self._load(path, "index")
+            shards = {}
+            manifest = os.path.join(path, "shards.json")
+            if os.path.exists(manifest):
+                with open(manifest) as f:
+                    for location, index_name in json.load(f).items():
+                        shards[location] = self._load(path, index_name)
+            bm25 = BM25(
+                vectorstore.docstore.search(doc_id)
+                for doc_id in vectorstore.index_to_docstore_id.values()
+            )
+            self._active = (version, vectorstore, shards, bm25)
+            print(f"[RAG] Serving index version {version}")
+
+        self.start_watcher()
+        return version
+
+    @staticmethod
+    def _load(path, index_name):
+        from langchain_community.vectorstores import FAISS
+
+        return FAISS.load_local(
+            path,
+            load_embeddings(),
+            index_name=index_name,
+            allow_dangerous_deserialization=True,  # we wrote these files
+        )
+
+    def start_watcher(self):
+        """Poll CURRENT in the background and reload when it changes."""
+        if WATCH_INTERVAL <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            try:
+                if current_version() not in (None, self.version):
+                    self.reload()
+            except Exception as e:
+                print(f"[RAG] Reload failed, still serving {self.version}: {e}")
+
+
+if INFERENCE_SOCKET:
+    inference_client = InferenceClient(INFERENCE_SOCKET, timeout=INFERENCE_TIMEOUT)
+    _remote_embeddings = RemoteEmbeddings(inference_client)
+    rag_index = RemoteRagIndex(inference_client)
+else:
+    rag_index = RagIndex()
+
+def install_reload_signal():
+    """Reload the index in the background when the worker gets RELOAD_SIGNAL."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(
+        RELOAD_SIGNAL,
+        lambda signum, frame: rag_index.reload(background=True)
+    )
@@ -0,0 +1,122 @@
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+
+RERANK_MODEL = os.getenv("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+# =========================
+# BM25
+# =========================
+
+class BM25:
+    """
+    Okapi BM25 over the chunks of one index version. The guides are small,
+    so a plain in-memory scan is enough; it catches exact names and terms
+    ("Tribhuvan", "permits") that the embedding search ranks too low.
+    """
+
+    def __init__(self, docs, k1=1.5, b=0.75):
+        self.docs = list(docs)
+        self.k1 = k1
+        self.b = b
+        self._tfs = [Counter(_tokens(d.page_content)) for d in self.docs]
+        self._lengths = [sum(tf.values()) for tf in self._tfs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0
+
+        df = Counter(term for tf in self._tfs for term in tf)
+        n = len(self.docs)
+        self._idf = {term: math.log(1 + (n - f + 0.5) / (f + 0.5)) for term, f in df.items()}
+
+    def search(self, query, k):
+        terms = set(_tokens(query)) & self._idf.keys()
+        if not terms:
+            return []
+
+        scored = []
+        for doc, tf, length in zip(self.docs, self._tfs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length)
+            score = sum(
+                self._idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm)
+                for t in terms if t in tf
+            )
+            if score > 0:
+                scored.append((score, doc))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [doc for _, doc in scored[:k]]
+
+
+# =========================
+# CROSS-ENCODER
+# =========================
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class Reranker:
+    """
+    Scores (query, chunk) pairs with a small cross-encoder on the CPU.
+    Scores are cached per (query, chunk), so a repeated question, or the
+    same chunk coming back for it from a newer index version, is not
+    scored again.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, cache_size=10000):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self._model = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()   # (query digest, chunk digest) -> score
+
+    def _predict(self, pairs):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, device="cpu")
+        return [float(s) for s in self._model.predict(pairs)]
+
+    def scores(self, query, docs):
+        query_key = _digest(" ".join(query.lower().split()))
+        keys = [(query_key, _digest(d.page_content)) for d in docs]
+
+        with self._lock:
+            cached = {key: self._cache[key] for key in keys if key in self._cache}
+            for key in cached:
+                self._cache.move_to_end(key)
+
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            fresh = self._predict([(query, docs[i].page_content) for i in missing])
+            with self._lock:
+                for i, score in zip(missing, fresh):
+                    cached[keys[i]] = self._cache[keys[i]] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [cached[key] for key in keys]
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def rerank(self, query, docs, top_n):
+        """Return the top_n docs, best first."""
+        if not docs:
+            return []
+        scores = self.scores(query, docs)
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order[:top_n]]
+
+
+reranker = Reranker()
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from .rag import EMBEDDING_MODEL, INDEX_DIR, get_embeddings, match_locations
+
+
+# =========================
+# KEYWORD FAST PATH
+# =========================
+
+def keyword_intent(text):
+    """
+    Route messages whose wording leaves no doubt, without embedding them.
+    Returns None when the embedding router has to decide.
+    """
+    text = text.lower().strip()
+
+    # "save Rara Lake", but not "save money on my trek"
+    if text.startswith("save") and match_locations(text):
+        return "save"
+    if re.search(r"\b(weather|forecast)\b", text):
+        return "weather"
+    if re.search(r"\bnews\b", text):
+        return "nepali_news"
+    if "wikipedia" in text:
+        return "wiki"
+    if re.search(r"\bsearch\b", text):
+        return "tavily"
+    if "local information" in text:
+        return "rag"
+    return None
+
+
+# =========================
+# EMBEDDING ROUTER
+# =========================
+
+# A handful of typical messages per intent; each intent is represented by
+# the mean of their embeddings
+INTENT_EXAMPLES = {
+    "save": [
+        "save Pokhara to my favourites",
+        "add Rara Lake to my favorite destinations",
+        "bookmark Mustang for later",
+        "remember Langtang as one of my favourite places",
+        "put Bhaktapur on my saved list",
+    ],
+    "weather": [
+        "will it rain in Pokhara tomorrow",
+        "how cold is it in Namche this week",
+        "is it sunny in Kathmandu today",
+        "temperature at Everest base camp",
+        "snow conditions on the Annapurna circuit",
+    ],
+    "nepali_news": [
+        "what is happening in Nepal today",
+        "latest headlines from Kathmandu",
+        "any recent strikes or road closures in Nepal",
+        "current events in Nepali politics",
+    ],
+    "wiki": [
+        "tell me the history of Lumbini",
+        "who was the first person to climb Everest",
+        "what is the population of Nepal",
+        "facts about the Kathmandu valley",
+    ],
+    "tavily": [
+        "search the web for trekking agencies in Thamel",
+        "find flight prices from Kathmandu to Lukla",
+        "look up hotel reviews in Pokhara",
+        "find bus tickets to Chitwan online",
+    ],
+    "rag": [
+        "what permits do I need for the Langtang trek",
+        "how many days does the Annapurna base camp trek take",
+        "best season to visit Rara Lake",
+        "where can I stay on the Poon Hill route",
+        "what should I pack for the Everest base camp trek",
+        "local customs to respect in Bhaktapur",
+    ],
+    "chat": [
+        "hello",
+        "thank you so much",
+        "who are you",
+        "how are you today",
+        "I want to save money on my trek",
+        "can you help me plan something",
+    ],
+}
+
+# Minimum cosine similarity to the best centroid; below it we just chat
+CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.35"))
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+class IntentRouter:
+    """
+    Nearest-centroid intent classifier over sentence embeddings.
+
+    Centroids are computed once and cached next to the RAG index, keyed by
+    a hash of the examples and the embedding model, so workers only embed
+    the examples after either changes.
+    """
+
+    def __init__(self, examples=INTENT_EXAMPLES, threshold=CONFIDENCE_THRESHOLD):
+        self.examples = examples
+        self.threshold = threshold
+        self._intents = sorted(examples)
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def _cache_path(self):
+        digest = hashlib.sha1(
+            json.dumps([EMBEDDING_MODEL, self.examples], sort_keys=True).encode()
+        ).hexdigest()[:12]
+        return os.path.join(INDEX_DIR, f"intent-centroids-{digest}.npy")
+
+    def centroids(self):
+        with self._lock:
+            if self._centroids is None:
+                path = self._cache_path()
+                if os.path.exists(path):
+                    self._centroids = np.load(path)
+                else:
+                    embeddings = get_embeddings()
+                    self._centroids = _normalize([
+                        _normalize(embeddings.embed_documents(self.examples[intent])).mean(axis=0)
+                        for intent in self._intents
+                    ])
+                    os.makedirs(INDEX_DIR, exist_ok=True)
+                    np.save(path, self._centroids)
+        return self._centroids
+
+    def route(self, text, embedding=None):
+        """
+        Return (intent, confidence). Pass the query embedding when it has
+        already been computed so the message is only embedded once.
+        """
+        intent = keyword_intent(text)
+        if intent is not None:
+            return intent, 1.0
+        return self.classify(text, embedding)
+
+    def classify(self, text, embedding=None):
+        """(intent, confidence) from the embedding alone, for messages keyword_intent left open."""
+        if embedding is None:
+            embedding = get_embeddings().embed_query(text)
+        scores = self.centroids() @ _normalize(embedding)
+        best = int(scores.argmax())
+        confidence = float(scores[best])
+        if confidence < self.threshold:
+            return "chat", confidence
+        return self._intents[best], confidence
+
+
+intent_router = IntentRouter()
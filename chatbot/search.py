@@ -0,0 +1,131 @@
+import re
+import uuid
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+# Full-text index over conversation titles, summaries and transcript
+# messages. SQLite uses an FTS5 virtual table, Postgres a tsvector column
+# with a GIN index. Each conversation has one "meta" row (title + summary,
+# replaced on save) and one row per message (appended as turns are stored).
+
+TABLE = "chatbot_search"
+
+
+class SQLiteSearchBackend:
+    create_sql = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        "conversation_id UNINDEXED, user_id UNINDEXED, kind UNINDEXED, body, "
+        "tokenize = 'porter unicode61')",
+    ]
+    drop_sql = [f"DROP TABLE IF EXISTS {TABLE}"]
+
+    @staticmethod
+    def key(conversation_id):
+        # Django stores UUIDs as 32 hex characters on SQLite
+        return uuid.UUID(str(conversation_id)).hex
+
+    @staticmethod
+    def to_query(text):
+        """Turn free text into an FTS5 query: every word must match, the last as a prefix."""
+        words = re.findall(r"\w+", text)
+        if not words:
+            return None
+        terms = [f'"{w}"' for w in words]
+        terms[-1] += "*"
+        return " ".join(terms)
+
+    insert_sql = f"INSERT INTO {TABLE} (conversation_id, user_id, kind, body) VALUES (%s, %s, %s, %s)"
+    match_sql = f"SELECT conversation_id FROM {TABLE} WHERE {TABLE} MATCH %s AND user_id = %s"
+
+
+class PostgresSearchBackend:
+    create_sql = [
+        f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+        "id bigserial PRIMARY KEY, conversation_id uuid NOT NULL, user_id bigint NOT NULL, "
+        "kind varchar(10) NOT NULL, document tsvector NOT NULL)",
+        f"CREATE INDEX IF NOT EXISTS {TABLE}_document_idx ON {TABLE} USING GIN (document)",
+        f"CREATE INDEX IF NOT EXISTS {TABLE}_conversation_idx ON {TABLE} (conversation_id)",
+    ]
+    drop_sql = [f"DROP TABLE IF EXISTS {TABLE}"]
+
+    @staticmethod
+    def key(conversation_id):
+        return conversation_id
+
+    @staticmethod
+    def to_query(text):
+        return text.strip() or None
+
+    insert_sql = (
+        f"INSERT INTO {TABLE} (conversation_id, user_id, kind, document) "
+        "VALUES (%s, %s, %s, to_tsvector('english', %s))"
+    )
+    match_sql = (
+        f"SELECT conversation_id FROM {TABLE} "
+        "WHERE document @@ websearch_to_tsquery('english', %s) AND user_id = %s"
+    )
+
+
+def get_backend(using=connection):
+    if using.vendor == "postgresql":
+        return PostgresSearchBackend
+    if using.vendor == "sqlite":
+        return SQLiteSearchBackend
+    return None
+
+
+# =========================
+# INCREMENTAL SYNC
+# =========================
+
+def index_conversation(conversation):
+    """Replace the title/summary row of a conversation."""
+    backend = get_backend()
+    if backend is None:
+        return
+    key = backend.key(conversation.id)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE conversation_id = %s AND kind = 'meta'", [key])
+        text = f"{conversation.title}\n{conversation.summary}".strip()
+        if text:
+            cursor.execute(backend.insert_sql, [key, conversation.user_id, "meta", text])
+
+
+def index_messages(conversation, texts):
+    """Append newly stored transcript messages."""
+    backend = get_backend()
+    if backend is None or not texts:
+        return
+    key = backend.key(conversation.id)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            backend.insert_sql,
+            [[key, conversation.user_id, "message", text] for text in texts]
+        )
+
+
+def remove_conversation(conversation_id):
+    backend = get_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE conversation_id = %s", [backend.key(conversation_id)])
+
+
+def matching_conversations(queryset, user, text):
+    """
+    Narrow a Conversation queryset to the user's conversations matching the
+    search text. Falls back to a title/summary substring filter on
+    databases without a full-text backend.
+    """
+    backend = get_backend()
+    if backend is None:
+        return queryset.filter(Q(title__icontains=text) | Q(summary__icontains=text))
+
+    query = backend.to_query(text)
+    if query is None:
+        return queryset.none()
+    return queryset.filter(id__in=RawSQL(backend.match_sql, [query, user.id]))
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Conversation
+from .search import index_conversation, remove_conversation
+
+
+@receiver(post_save, sender=Conversation)
+def sync_conversation_search(sender, instance, **kwargs):
+    """Keep the full-text row for title and summary in step with the model."""
+    index_conversation(instance)
+
+
+@receiver(post_delete, sender=Conversation)
+def drop_conversation_search(sender, instance, **kwargs):
+    remove_conversation(instance.id)
@@ -0,0 +1,125 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage
+
+from .admission import llm_user
+from .concurrency import thread_locks
+from .graph import app
+from .llm import llm
+from .transcripts import get_or_create_conversation
+
+
+# Messages (user + assistant, system prompt excluded) kept verbatim in the
+# prompt; older ones only live on in the thread's running summary
+HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "12"))
+
+FOLD_PROMPT = (
+    "You maintain a running summary of a travel chat. Update the summary with "
+    "the new messages below. Keep names, places, dates and decisions, drop "
+    "small talk, and stay under 120 words. Reply with the summary only."
+)
+
+FINALIZE_PROMPT = (
+    "Update the running summary of this travel chat with the latest messages "
+    "and give the chat a title. Reply in exactly this form:\n"
+    "TITLE: <2-4 words>\n"
+    "SUMMARY: <3-4 lines>"
+)
+
+_compaction_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def _transcript(messages):
+    return "\n".join(
+        f"{'User' if isinstance(m, HumanMessage) else 'Trekka'}: {m.content}"
+        for m in messages
+    )
+
+
+def _delta_prompt(summary, messages):
+    return HumanMessage(content=(
+        f"Summary so far:\n{summary or '(none yet)'}\n\nNew messages:\n{_transcript(messages)}"
+    ))
+
+
+def evictable(messages, window=HISTORY_WINDOW):
+    """
+    The oldest messages beyond the prompt window. The window always starts
+    at a user message, so no reply is kept without its question.
+    """
+    body = [m for m in messages if not isinstance(m, SystemMessage)]
+    cut = max(0, len(body) - window)
+    if cut == 0:
+        return []
+    while cut < len(body) and not isinstance(body[cut], HumanMessage):
+        cut += 1
+    return body[:cut]
+
+
+def fold(summary, messages, model=llm):
+    """Fold only the given messages into the running summary: one short call."""
+    return model.invoke([SystemMessage(content=FOLD_PROMPT), _delta_prompt(summary, messages)]).content.strip()
+
+
+def compact(user, thread_id, model=llm):
+    """
+    Move the messages that fell out of the prompt window into the running
+    summary, drop them from the thread state and keep the conversation's
+    stored summary in step.
+    """
+    with thread_locks.hold(thread_id), llm_user(user.id):
+        state = app.get_state(_config(thread_id))
+        evicted = evictable(state.values.get("messages", []))
+        if not evicted:
+            return None
+
+        summary = fold(state.values.get("summary", ""), evicted, model)
+        app.update_state(_config(thread_id), {
+            "messages": [RemoveMessage(id=m.id) for m in evicted],
+            "summary": summary,
+        })
+
+        conversation = get_or_create_conversation(user, thread_id)
+        if conversation is not None:
+            conversation.summary = summary
+            conversation.save(update_fields=["summary", "updated_at"])
+        return summary
+
+
+def _compact_in_background(user, thread_id):
+    try:
+        compact(user, thread_id)
+    except Exception as e:
+        # The window just stays longer until the next turn retries
+        print(f"[SUMMARY] Compaction of {thread_id} failed: {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule_compaction(user, thread_id):
+    """
+    Compact after the reply has gone out. The thread lock makes the next
+    turn on this thread wait for it rather than race it.
+    """
+    _compaction_pool.submit(_compact_in_background, user, thread_id)
+
+
+def finalize(summary, messages, model=llm):
+    """
+    Title and final summary for a conversation in one call: the running
+    summary plus whatever is still in the window. Returns (title, summary).
+    """
+    text = model.invoke([SystemMessage(content=FINALIZE_PROMPT), _delta_prompt(summary, messages)]).content
+
+    title = re.search(r"^\s*TITLE:\s*(.+)$", text, re.MULTILINE | re.IGNORECASE)
+    final = re.search(r"^\s*SUMMARY:\s*(.+)", text, re.MULTILINE | re.IGNORECASE | re.DOTALL)
+    summary = final.group(1).strip() if final else (summary or text.strip())
+    title = title.group(1).strip() if title else summary
+    return " ".join(title.split()[:4]), summary
@@ -0,0 +1,966 @@
+"""
+Test cases for the chatbot app
+Run with: python manage.py test chatbot
+"""
+
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from unittest import mock
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from .admission import AdmissionController, LLMOverloaded, llm_user
+from .concurrency import ThreadLocks
+from .graph import SYSTEM_TREKKA, _routed_embeddings, app as graph_app, intent_node, prompt_history, rag_node
+from . import rag
+from .inference import InferenceClient, InferenceError, InferenceServer, RemoteEmbeddings, RemoteRagIndex
+from .llm import AdmittedLLM, LLMRouter
+from .models import Conversation, ChatMessage, LLMUsage, WeatherForecast
+from .rerank import BM25, Reranker
+from .router import IntentRouter, keyword_intent
+from .search import index_messages
+from .summaries import HISTORY_WINDOW, compact, evictable, finalize
+from .tools import weather_tool
+from .usage import QuotaExceeded, UsageRecorder
+from .weather import aggregate_daily, format_forecast, prefetch_forecasts
+
+User = get_user_model()
+
+
+class ChatMessageModelTests(TestCase):
+    """Test cases for transcript storage"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='chat@example.com', password='testpass123')
+        self.conversation = Conversation.objects.create(user=self.user)
+
+    def test_short_message_stored_as_text(self):
+        """Short bodies stay in the plain content column"""
+        message = ChatMessage.build(self.conversation, 'user', 'Namaste!')
+        message.save()
+        message.refresh_from_db()
+        self.assertEqual(message.content, 'Namaste!')
+        self.assertIsNone(message.body)
+        self.assertEqual(message.text, 'Namaste!')
+
+    def test_long_message_compressed(self):
+        """Long bodies are zstd-compressed and read back unchanged"""
+        text = 'Day 1: Kathmandu to Syabrubesi. ' * 100
+        message = ChatMessage.build(self.conversation, 'assistant', text)
+        message.save()
+        message.refresh_from_db()
+        self.assertEqual(message.content, '')
+        self.assertLess(len(message.body), len(text))
+        self.assertEqual(message.text, text)
+
+
+class ChatTurnTests(APITestCase):
+    """Test cases for ordering and replaying chat turns"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='turns@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_thread_locks_serialize_turns(self):
+        locks = ThreadLocks()
+        running, overlaps = [], []
+
+        def turn(name):
+            with locks.hold(name):
+                running.append(name)
+                overlaps.append(running.count(name))
+                time.sleep(0.02)
+                running.remove(name)
+
+        threads = [threading.Thread(target=turn, args=(name,)) for name in ['a', 'a', 'a', 'b']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(overlaps), 1)
+        self.assertEqual(locks._locks, {})
+
+    def test_repeated_idempotency_key_replays_reply(self):
+        graph = mock.Mock()
+        graph.get_state.return_value = mock.Mock(values={})
+        graph.invoke.return_value = {'messages': [HumanMessage(content='hi'), AIMessage(content='Namaste!')]}
+        with mock.patch('chatbot.views.app', graph), mock.patch('chatbot.views.record_turn'):
+            responses = [
+                self.client.post('/api/chat/', {'message': 'hi', 'thread_id': 't1'}, headers={'Idempotency-Key': 'k1'})
+                for _ in range(2)
+            ]
+        self.assertEqual(graph.invoke.call_count, 1)
+        self.assertEqual(responses[0].json(), {'thread_id': 't1', 'response': 'Namaste!'})
+        self.assertEqual(responses[1].json(), responses[0].json())
+
+
+class ConversationMessagesAPITests(APITestCase):
+    """Test cases for the paginated message history endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='chat@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        self.conversation = Conversation.objects.create(user=self.user)
+        ChatMessage.objects.bulk_create([
+            ChatMessage.build(self.conversation, 'user' if i % 2 == 0 else 'assistant', f'message {i}')
+            for i in range(5)
+        ])
+        self.client.force_authenticate(user=self.user)
+
+    def url(self, conversation_id=None):
+        return f'/api/conversations/{conversation_id or self.conversation.id}/messages/'
+
+    def test_pages_backwards_from_latest(self):
+        """Pages return the newest messages first, oldest-first within a page"""
+        response = self.client.get(self.url(), {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([m['content'] for m in data['messages']], ['message 3', 'message 4'])
+
+        response = self.client.get(self.url(), {'limit': 2, 'before': data['next_before']})
+        data = response.json()
+        self.assertEqual([m['content'] for m in data['messages']], ['message 1', 'message 2'])
+
+        response = self.client.get(self.url(), {'limit': 2, 'before': data['next_before']})
+        data = response.json()
+        self.assertEqual([m['content'] for m in data['messages']], ['message 0'])
+        self.assertIsNone(data['next_before'])
+
+    def test_other_users_conversation_not_found(self):
+        """Users cannot read each other's transcripts"""
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_conversation_not_found(self):
+        response = self.client.get(self.url(uuid.uuid4()))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConversationSearchAPITests(APITestCase):
+    """Test cases for conversation listing and full-text search"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='chat@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        self.langtang = Conversation.objects.create(
+            user=self.user, title='Langtang planning', summary='Permits and tea houses.'
+        )
+        self.pokhara = Conversation.objects.create(
+            user=self.user, title='Pokhara boating', summary='Renting a boat on Phewa Lake.'
+        )
+        Conversation.objects.create(
+            user=self.other_user, title='Langtang trip', summary='Someone else asking about permits.'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, q, **params):
+        return self.client.get('/api/conversations/search/', {'q': q, **params}).json()
+
+    def test_search_title_and_summary(self):
+        """Search matches titles and summaries of the user's own conversations"""
+        data = self.search('langtang permits')
+        self.assertEqual([c['id'] for c in data['conversations']], [str(self.langtang.id)])
+
+    def test_search_prefix_match(self):
+        """The last word matches as a prefix while typing"""
+        data = self.search('phew')
+        self.assertEqual([c['id'] for c in data['conversations']], [str(self.pokhara.id)])
+
+    def test_search_finds_message_text(self):
+        """Persisted messages are searchable"""
+        conversation = Conversation.objects.create(user=self.user)
+        index_messages(conversation, ['Is the Gosaikunda lake frozen in January?'])
+        data = self.search('gosaikunda')
+        self.assertEqual([c['id'] for c in data['conversations']], [str(conversation.id)])
+
+    def test_search_follows_title_updates(self):
+        """Saving a conversation replaces its indexed title"""
+        self.pokhara.title = 'Paragliding in Sarangkot'
+        self.pokhara.save()
+        self.assertEqual(self.search('pokhara')['conversations'], [])
+        self.assertEqual(len(self.search('paragliding')['conversations']), 1)
+
+    def test_deleted_conversation_not_found(self):
+        self.langtang.delete()
+        self.assertEqual(self.search('langtang')['conversations'], [])
+
+    def test_list_keyset_pagination(self):
+        """The list pages through conversations newest first"""
+        response = self.client.get('/api/conversations/', {'limit': 1})
+        data = response.json()
+        self.assertEqual([c['id'] for c in data['conversations']], [str(self.pokhara.id)])
+
+        response = self.client.get('/api/conversations/', {'limit': 1, 'cursor': data['next_cursor']})
+        data = response.json()
+        self.assertEqual([c['id'] for c in data['conversations']], [str(self.langtang.id)])
+        self.assertIsNone(data['next_cursor'])
+
+
+class AdmissionControllerTests(TestCase):
+    """Test cases for the outbound LLM admission controller"""
+
+    def make_controller(self, **overrides):
+        options = dict(max_concurrent=1, max_queue=4, max_queued_per_user=2, timeout=2)
+        options.update(overrides)
+        return AdmissionController(**options)
+
+    def wait_for_queue(self, controller, size):
+        while controller._waiting < size:
+            time.sleep(0.005)
+
+    def test_rejects_when_queue_full(self):
+        """Callers beyond the queue limit get a 429 with Retry-After"""
+        controller = self.make_controller(max_queue=0)
+        controller.acquire('a')
+        with self.assertRaises(LLMOverloaded) as ctx:
+            controller.acquire('b')
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertGreaterEqual(ctx.exception.wait, 1)
+
+    def test_times_out_waiting(self):
+        controller = self.make_controller(timeout=0.05)
+        controller.acquire('a')
+        with self.assertRaises(LLMOverloaded):
+            controller.acquire('b')
+        self.assertEqual(controller._waiting, 0)
+
+    def test_round_robin_between_users(self):
+        """A user with a backlog does not starve a user who queued later"""
+        controller = self.make_controller()
+        controller.acquire('holder')
+        order = []
+
+        def call(user):
+            with controller.slot(user):
+                order.append(user)
+
+        threads = []
+        for user in ['chatty', 'chatty', 'quiet']:
+            thread = threading.Thread(target=call, args=(user,))
+            thread.start()
+            threads.append(thread)
+            self.wait_for_queue(controller, len(threads))
+
+        controller.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ['chatty', 'quiet', 'chatty'])
+
+    def test_per_user_queue_limit(self):
+        """One user cannot fill the whole queue"""
+        controller = self.make_controller(max_queued_per_user=1)
+        controller.acquire('holder')
+        thread = threading.Thread(target=controller.acquire, args=('chatty',))
+        thread.start()
+        self.wait_for_queue(controller, 1)
+        with self.assertRaises(LLMOverloaded):
+            controller.acquire('chatty')
+        controller.release()
+        thread.join()
+
+
+class ScriptedProvider:
+    """Stand-in chat model that answers after a scripted delay, or fails"""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(f'{self.name} is down')
+        return AIMessage(content=f'answer from {self.name}')
+
+
+class LLMRouterTests(TestCase):
+    """Test cases for hedged requests and failover between LLM providers"""
+
+    def make_router(self, *providers, **options):
+        options.setdefault('default_hedge_delay', 0.05)
+        return LLMRouter([(p.name, p) for p in providers], **options)
+
+    def test_fast_primary_is_not_hedged(self):
+        primary, secondary = ScriptedProvider('primary'), ScriptedProvider('secondary')
+        router = self.make_router(primary, secondary)
+        self.assertEqual(router.invoke([]).content, 'answer from primary')
+        self.assertEqual(secondary.calls, 0)
+
+    def test_slow_primary_is_hedged(self):
+        """The secondary answers first when the primary stalls"""
+        primary = ScriptedProvider('primary', delay=1.0)
+        secondary = ScriptedProvider('secondary', delay=0.01)
+        router = self.make_router(primary, secondary)
+        started = time.monotonic()
+        self.assertEqual(router.invoke([]).content, 'answer from secondary')
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_hedge_delay_follows_p95(self):
+        primary = ScriptedProvider('primary')
+        router = self.make_router(primary, min_hedge_delay=0.0)
+        router._latencies['primary'].extend([0.1] * 95 + [0.9] * 5)
+        self.assertAlmostEqual(router.hedge_delay('primary'), 0.1)
+
+    def test_fails_over_on_error(self):
+        primary = ScriptedProvider('primary', fail=True)
+        secondary = ScriptedProvider('secondary')
+        router = self.make_router(primary, secondary)
+        self.assertEqual(router.invoke([]).content, 'answer from secondary')
+
+    def test_unhealthy_provider_is_skipped(self):
+        """After repeated failures the primary is benched for the cooldown"""
+        primary = ScriptedProvider('primary', fail=True)
+        secondary = ScriptedProvider('secondary')
+        router = self.make_router(primary, secondary, failure_threshold=2, cooldown=60)
+        router.invoke([])
+        router.invoke([])
+        router.invoke([])
+        self.assertEqual(primary.calls, 2)
+        self.assertEqual(secondary.calls, 3)
+
+    def test_raises_when_every_provider_fails(self):
+        router = self.make_router(ScriptedProvider('a', fail=True), ScriptedProvider('b', fail=True))
+        with self.assertRaises(ConnectionError):
+            router.invoke([])
+
+    def admitted(self, controller, recorder, *providers):
+        return [(p.name, AdmittedLLM(p, controller, recorder)) for p in providers]
+
+    def test_hedge_needs_a_free_slot(self):
+        """A hedge never waits for, or takes more than, the admission limit"""
+        controller = AdmissionController(max_concurrent=1, max_queue=4, max_queued_per_user=2, timeout=2)
+        primary = ScriptedProvider('primary', delay=0.2)
+        secondary = ScriptedProvider('secondary')
+        router = LLMRouter(self.admitted(controller, None, primary, secondary), default_hedge_delay=0.05)
+        self.assertEqual(router.invoke([]).content, 'answer from primary')
+        self.assertEqual(secondary.calls, 0)
+        self.assertEqual(controller._active, 0)
+
+    def test_saturated_admission_answers_429_through_the_router(self):
+        """Callers queue for a slot on their own thread, not in the router's pool"""
+        controller = AdmissionController(max_concurrent=1, max_queue=1, max_queued_per_user=1, timeout=2)
+        provider = ScriptedProvider('primary', delay=0.2)
+        router = LLMRouter(self.admitted(controller, None, provider), max_workers=1)
+        answers = []
+
+        def call(user):
+            with llm_user(user):
+                answers.append(router.invoke([]).content)
+
+        running = threading.Thread(target=call, args=('first',))
+        running.start()
+        while controller._active < 1:
+            time.sleep(0.005)
+        queued = threading.Thread(target=call, args=('second',))
+        queued.start()
+        while controller._waiting < 1:
+            time.sleep(0.005)
+
+        with llm_user('third'), self.assertRaises(LLMOverloaded):
+            router.invoke([])
+        running.join()
+        queued.join()
+        self.assertEqual(answers, ['answer from primary'] * 2)
+        self.assertEqual(controller._active, 0)
+
+    def test_losing_hedge_keeps_its_slot_and_is_recorded(self):
+        controller = AdmissionController(max_concurrent=2, max_queue=4, max_queued_per_user=2, timeout=2)
+        recorder = UsageRecorder(batch_size=1000, flush_interval=3600, quota=0)
+        primary = MeteredProvider(delay=0.3)
+        primary.name = 'primary'
+        secondary = MeteredProvider()
+        secondary.name = 'secondary'
+        router = LLMRouter(self.admitted(controller, recorder, primary, secondary), default_hedge_delay=0.05)
+
+        with llm_user('hedger'):
+            router.invoke([])
+        # The primary is still running, in its own slot
+        self.assertEqual(controller._active, 1)
+        deadline = time.monotonic() + 2
+        while len(recorder._buffer) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(controller._active, 0)
+        with recorder._lock:
+            self.assertEqual([u.user_id for u in recorder._buffer], ['hedger', 'hedger'])
+
+
+class WeatherForecastTests(APITestCase):
+    """Test cases for the stored forecasts and the weather endpoint"""
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.days = [
+            {'date': (today + timedelta(days=n)).isoformat(), 'avg_temp': 20.0 + n, 'condition': 'clear sky'}
+            for n in range(-1, 4)
+        ]
+        WeatherForecast.objects.create(
+            location='Pokhara', city='Pokhara', country='NP',
+            days=self.days, fetched_at=timezone.now()
+        )
+
+    def test_aggregate_daily(self):
+        entries = [
+            {'dt_txt': '2026-10-20 09:00:00', 'main': {'temp': 18}, 'weather': [{'description': 'rain'}]},
+            {'dt_txt': '2026-10-20 12:00:00', 'main': {'temp': 22}, 'weather': [{'description': 'clouds'}]},
+            {'dt_txt': '2026-10-20 15:00:00', 'main': {'temp': 20}, 'weather': [{'description': 'clouds'}]},
+            {'dt_txt': '2026-10-21 09:00:00', 'main': {'temp': 15}, 'weather': [{'description': 'snow'}]},
+        ]
+        self.assertEqual(aggregate_daily(entries), [
+            {'date': '2026-10-20', 'avg_temp': 20.0, 'condition': 'clouds'},
+            {'date': '2026-10-21', 'avg_temp': 15.0, 'condition': 'snow'},
+        ])
+
+    @mock.patch.dict(os.environ, {'OPENWEATHER_API_KEY': 'test'})
+    def test_malformed_payload_fails_only_its_location(self):
+        entry = {'dt_txt': '2026-10-20 09:00:00', 'main': {'temp': 18}, 'weather': [{'description': 'rain'}]}
+        payloads = {
+            'Illam': {'list': [entry], 'city': {'name': 'Illam', 'country': 'NP'}},
+            'Dharan': {'list': [{'dt_txt': '2026-10-20 09:00:00', 'weather': []}]},
+            'Mustang': {'list': [entry], 'city': None},
+            'Manang': ['not', 'an', 'object'],
+        }
+
+        def get(url, params, timeout):
+            return mock.Mock(status_code=200, json=lambda: payloads[params['q'].split(',')[0]])
+
+        with mock.patch('requests.Session.get', side_effect=get):
+            stored, failed = prefetch_forecasts(list(payloads))
+        self.assertEqual(stored, 1)
+        self.assertEqual(sorted(failed), ['Dharan', 'Manang', 'Mustang'])
+        self.assertTrue(all(e.startswith('Malformed forecast response') for e in failed.values()))
+        self.assertTrue(WeatherForecast.objects.filter(location='Illam').exists())
+
+    def test_format_skips_past_days(self):
+        text = format_forecast(WeatherForecast.objects.get().as_forecast(), days=2)
+        self.assertIn(self.days[1]['date'], text)
+        self.assertIn(self.days[2]['date'], text)
+        self.assertNotIn(self.days[0]['date'], text)
+        self.assertNotIn(self.days[3]['date'], text)
+
+    def test_weather_tool_answers_from_store(self):
+        """Catalogued destinations need neither the LLM nor OpenWeather"""
+        text = weather_tool('Will it rain in Pokhara this week?')
+        self.assertTrue(text.startswith('Weather forecast for Pokhara, NP'))
+
+    def test_endpoint_serves_stored_forecast(self):
+        response = APIClient().get('/api/weather/pokhara/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['location'], 'Pokhara')
+        self.assertEqual(response.data['days'], self.days)
+
+    def test_endpoint_ignores_stale_forecast(self):
+        WeatherForecast.objects.update(fetched_at=timezone.now() - timedelta(days=3))
+        response = APIClient().get('/api/weather/Pokhara/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_endpoint_unknown_location(self):
+        response = APIClient().get('/api/weather/Atlantis/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MeteredProvider:
+    """Stand-in chat model that reports token usage like ChatGroq does"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def invoke(self, messages):
+        time.sleep(self.delay)
+        return AIMessage(
+            content='hi',
+            usage_metadata={'input_tokens': 30, 'output_tokens': 12, 'total_tokens': 42},
+            response_metadata={'model_name': 'test-model'},
+        )
+
+
+class UsageRecorderTests(TestCase):
+    """Test cases for LLM usage accounting and the daily token quota"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='meter@example.com', password='testpass123')
+        # Large batches and intervals: rows are only written by explicit flushes
+        self.recorder = UsageRecorder(batch_size=1000, flush_interval=3600, quota=100)
+        self.llm = AdmittedLLM(
+            MeteredProvider(),
+            AdmissionController(max_concurrent=2, max_queue=2, max_queued_per_user=1, timeout=1),
+            self.recorder
+        )
+
+    def test_calls_are_buffered_until_flush(self):
+        with llm_user(self.user.id):
+            self.llm.invoke([])
+        self.assertEqual(LLMUsage.objects.count(), 0)
+
+        self.assertEqual(self.recorder.flush(), 1)
+        usage = LLMUsage.objects.get()
+        self.assertEqual(usage.user, self.user)
+        self.assertEqual(usage.model, 'test-model')
+        self.assertEqual((usage.prompt_tokens, usage.completion_tokens), (30, 12))
+
+    def test_quota_is_enforced_from_memory(self):
+        with llm_user(self.user.id):
+            self.llm.invoke([])
+            self.llm.invoke([])
+            self.llm.invoke([])   # 126 tokens spent, over the quota of 100
+            with self.assertNumQueries(0):
+                with self.assertRaises(QuotaExceeded):
+                    self.llm.invoke([])
+
+    def test_quota_counts_earlier_usage(self):
+        """A fresh process picks up what the user already spent today"""
+        LLMUsage.objects.create(user=self.user, model='test-model', prompt_tokens=80, completion_tokens=20)
+        with llm_user(self.user.id), self.assertRaises(QuotaExceeded):
+            self.llm.invoke([])
+
+    def test_writer_thread_closes_its_connection(self):
+        with mock.patch('chatbot.usage.connection') as connection, \
+                mock.patch.object(self.recorder, '_wake'), \
+                mock.patch.object(self.recorder, 'flush', side_effect=[1, SystemExit]):
+            with self.assertRaises(SystemExit):
+                self.recorder._run()
+        self.assertEqual(connection.close.call_count, 2)
+
+    def test_anonymous_calls_are_not_limited(self):
+        for _ in range(5):
+            self.llm.invoke([])
+        self.assertEqual(self.recorder.flush(), 5)
+
+
+class CountingReranker(Reranker):
+    """Reranker that scores by query-word overlap and counts model calls"""
+
+    def __init__(self):
+        super().__init__(model_name='unused')
+        self.scored_pairs = 0
+
+    def _predict(self, pairs):
+        self.scored_pairs += len(pairs)
+        return [
+            float(sum(word in text.lower() for word in query.lower().split()))
+            for query, text in pairs
+        ]
+
+
+class RerankTests(TestCase):
+    """Test cases for BM25 candidates and cached cross-encoder reranking"""
+
+    def setUp(self):
+        self.docs = [
+            Document(page_content='Pokhara sits beside Phewa Lake.'),
+            Document(page_content='Tribhuvan International Airport is the entry point to Nepal.'),
+            Document(page_content='Lumbini is the birthplace of Lord Buddha.'),
+        ]
+
+    def test_bm25_ranks_exact_terms(self):
+        bm25 = BM25(self.docs)
+        self.assertEqual(bm25.search('arriving at Tribhuvan airport', 2), [self.docs[1]])
+        self.assertEqual(bm25.search('unrelated words', 2), [])
+
+    def test_rerank_returns_top_n(self):
+        reranker = CountingReranker()
+        top = reranker.rerank('where was buddha born lumbini', self.docs, 1)
+        self.assertEqual(top, [self.docs[2]])
+
+    def test_scores_are_cached_per_query_and_chunk(self):
+        reranker = CountingReranker()
+        reranker.rerank('phewa lake', self.docs, 2)
+        reranker.rerank('Phewa  Lake', self.docs[:2], 2)
+        self.assertEqual(reranker.scored_pairs, 3)
+
+        reranker.rerank('another question', self.docs[:1], 1)
+        self.assertEqual(reranker.scored_pairs, 4)
+
+
+class StaticIndex:
+    """Stand-in RAG index that returns fixed chunks"""
+    version = 'v1'
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.docs = [Document(page_content='Phewa Lake is in Pokhara.', metadata={'locations': ['Pokhara']})]
+
+    def retrieve(self, query, embedding=None, rerank=None):
+        time.sleep(self.delay)
+        return self.docs
+
+
+class InferenceServerTests(TestCase):
+    """Test cases for the inference server protocol and client"""
+
+    def start_server(self, index):
+        server = InferenceServer(self.path, index, DeterministicFakeEmbedding(size=8))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'inference.sock')
+
+    def test_round_trip(self):
+        self.start_server(StaticIndex())
+        client = InferenceClient(self.path)
+        embedding = RemoteEmbeddings(client).embed_query('pokhara')
+        expected = DeterministicFakeEmbedding(size=8).embed_query('pokhara')
+        self.assertEqual(embedding, np.float32(expected).tolist())
+
+        index = RemoteRagIndex(client)
+        docs = index.retrieve('lakes', embedding=embedding)
+        self.assertEqual(docs[0].page_content, 'Phewa Lake is in Pokhara.')
+        self.assertEqual(docs[0].metadata, {'locations': ['Pokhara']})
+        self.assertEqual(index.version, 'v1')
+
+    def test_errors_are_reported(self):
+        self.start_server(StaticIndex())
+        with self.assertRaises(InferenceError):
+            InferenceClient(self.path).call('no_such_op')
+
+    def test_reconnects_after_dropped_connection(self):
+        self.start_server(StaticIndex())
+        client = InferenceClient(self.path)
+        self.assertEqual(client.call('version'), 'v1')
+
+        client._local.sock.shutdown(socket.SHUT_RDWR)
+        self.assertEqual(client.call('version'), 'v1')
+
+    def test_timeout(self):
+        self.start_server(StaticIndex(delay=1.0))
+        client = InferenceClient(self.path, timeout=0.1)
+        with self.assertRaises(InferenceError):
+            RemoteRagIndex(client).retrieve('slow')
+        client.timeout = 5
+        self.assertEqual(client.call('version'), 'v1')
+
+    def test_server_unreachable(self):
+        with self.assertRaises(InferenceError):
+            InferenceClient(self.path).call('version')
+
+
+class ScriptedModel:
+    """Stand-in chat model that replies with fixed text and keeps the prompts"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages)
+        return AIMessage(content=self.reply)
+
+
+class RollingSummaryTests(TestCase):
+    """Test cases for folding evicted history into a running summary"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='chat@example.com', password='testpass123')
+        self.thread_id = str(uuid.uuid4())
+
+    def turns(self, count):
+        messages = [SYSTEM_TREKKA]
+        for n in range(count):
+            messages += [HumanMessage(content=f'question {n}'), AIMessage(content=f'answer {n}')]
+        return messages
+
+    def test_evictable_keeps_whole_turns(self):
+        messages = self.turns(4)
+        self.assertEqual(evictable(messages, window=8), [])
+        self.assertEqual([m.content for m in evictable(messages, window=5)], ['question 0', 'answer 0', 'question 1', 'answer 1'])
+
+    def test_compact_folds_only_the_evicted_delta(self):
+        config = {'configurable': {'thread_id': self.thread_id}}
+        graph_app.update_state(config, {'messages': self.turns(HISTORY_WINDOW // 2 + 2), 'summary': 'Earlier: Pokhara'})
+        model = ScriptedModel('Planning Pokhara, then Mustang')
+
+        summary = compact(self.user, self.thread_id, model)
+        self.assertEqual(summary, 'Planning Pokhara, then Mustang')
+
+        prompt = model.prompts[0][-1].content
+        self.assertIn('Earlier: Pokhara', prompt)
+        self.assertIn('question 1', prompt)
+        self.assertNotIn('question 2', prompt)
+
+        state = graph_app.get_state(config).values
+        self.assertEqual(len([m for m in state['messages'] if not isinstance(m, SystemMessage)]), HISTORY_WINDOW)
+        self.assertEqual(state['summary'], summary)
+        self.assertEqual(Conversation.objects.get(id=self.thread_id).summary, summary)
+
+        # Nothing left to fold
+        self.assertIsNone(compact(self.user, self.thread_id, model))
+        self.assertEqual(len(model.prompts), 1)
+
+    def test_prompt_includes_running_summary(self):
+        history = prompt_history({'messages': self.turns(1), 'summary': 'Wants a lake trek'})
+        self.assertIs(history[0], SYSTEM_TREKKA)
+        self.assertIn('Wants a lake trek', history[1].content)
+        self.assertEqual(history[2].content, 'question 0')
+
+    def test_finalize_returns_title_and_summary(self):
+        model = ScriptedModel('TITLE: Pokhara Lake Trip Plans Today\nSUMMARY: Planned two days in Pokhara.\nBoating on Phewa.')
+        title, summary = finalize('Earlier summary', self.turns(1)[1:], model)
+        self.assertEqual(title, 'Pokhara Lake Trip Plans')
+        self.assertEqual(summary, 'Planned two days in Pokhara.\nBoating on Phewa.')
+        self.assertEqual(len(model.prompts), 1)
+
+
+class BagOfWordsEmbeddings:
+    """Stand-in sentence embedding: hashed word counts, so shared words mean similar vectors"""
+    STOPWORDS = {'i', 'to', 'my', 'on', 'the', 'for', 'a', 'in', 'is', 'of', 'as', 'me'}
+
+    def __init__(self, size=256):
+        self.size = size
+        self.calls = 0
+
+    def _embed(self, text):
+        vector = np.zeros(self.size + 1, dtype=np.float32)
+        vector[-1] = 0.1   # no zero vectors
+        for word in set(text.lower().split()) - self.STOPWORDS:
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1
+        return vector.tolist()
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self._embed(text)
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+
+class IntentRouterTests(TestCase):
+    """Test cases for the keyword fast path and the embedding router"""
+
+    def setUp(self):
+        self.embeddings = BagOfWordsEmbeddings()
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        for target, value in [('chatbot.router.get_embeddings', lambda: self.embeddings),
+                              ('chatbot.router.INDEX_DIR', index_dir.name),
+                              ('chatbot.graph.get_embeddings', lambda: self.embeddings)]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_keyword_fast_path(self):
+        self.assertEqual(keyword_intent('Save Rara Lake'), 'save')
+        self.assertEqual(keyword_intent('weather in Pokhara'), 'weather')
+        self.assertIsNone(keyword_intent('I want to save money on my trek'))
+
+        self.assertEqual(IntentRouter().route('Save Rara Lake'), ('save', 1.0))
+        self.assertEqual(self.embeddings.calls, 0)
+
+    def test_saving_money_is_not_a_save(self):
+        router = IntentRouter(examples={
+            'save': ['save Pokhara to my favourites', 'bookmark Mustang for later'],
+            'chat': ['I want to save money on my trek', 'hello'],
+        })
+        self.assertEqual(router.route('I want to save money on my trek')[0], 'chat')
+        self.assertEqual(router.route('save some money for the trek')[0], 'chat')
+
+    def test_routes_on_embedding_above_threshold(self):
+        self.assertEqual(IntentRouter().route('bookmark Mustang for later')[0], 'save')
+
+        intent, confidence = IntentRouter(threshold=1.01).route('bookmark Mustang for later')
+        self.assertEqual(intent, 'chat')
+        self.assertLess(confidence, 1.01)
+
+    def test_reuses_the_given_embedding(self):
+        embedding = self.embeddings.embed_query('bookmark Mustang for later')
+        intent, _ = IntentRouter().classify('bookmark Mustang for later', embedding)
+        self.assertEqual(intent, 'save')
+        self.assertEqual(self.embeddings.calls, 1)
+
+    def test_only_rag_intents_hand_off_their_embedding(self):
+        config = {'configurable': {'thread_id': 'router-chat'}}
+        state = intent_node({'messages': [HumanMessage(content='hello')]}, config)
+        self.assertEqual(state['intent'], 'chat')
+        self.assertNotIn('router-chat', _routed_embeddings)
+
+    def test_embedding_failure_answers_as_chat(self):
+        embeddings = mock.Mock()
+        embeddings.embed_query.side_effect = RuntimeError('model not loaded')
+        config = {'configurable': {'thread_id': 'router-fail'}}
+        with mock.patch('chatbot.graph.get_embeddings', return_value=embeddings):
+            state = intent_node({'messages': [HumanMessage(content='bookmark Mustang for later')]}, config)
+        self.assertEqual(state['intent'], 'chat')
+        self.assertNotIn('router-fail', _routed_embeddings)
+
+
+class GatedEmbeddings(Embeddings):
+    """Fake embeddings whose embed_query can be held until a test lets it go"""
+
+    def __init__(self):
+        self.fake = DeterministicFakeEmbedding(size=32)
+        self.embedding_query = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def embed_documents(self, texts):
+        return self.fake.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.embedding_query.set()
+        self.release.wait(5)
+        return self.fake.embed_query(text)
+
+
+def guide_chunk(text):
+    """A chunk tagged with its locations, as load_documents does"""
+    return Document(page_content=text, metadata={'locations': sorted(rag.match_locations(text))})
+
+
+class RagIndexTests(TestCase):
+    """Test cases for the versioned RAG index, built on fake embeddings"""
+
+    def setUp(self):
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        self.embeddings = GatedEmbeddings()
+        self.documents = []
+        self.versions = iter(f'v{n}' for n in range(1, 10))
+        for target, value in [
+            ('INDEX_DIR', index_dir.name),
+            ('CURRENT_FILE', os.path.join(index_dir.name, 'CURRENT')),
+            ('WATCH_INTERVAL', 0),
+            ('load_embeddings', lambda: self.embeddings),
+            ('load_documents', lambda pdf_paths=None: self.documents),
+        ]:
+            patcher = mock.patch.object(rag, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(rag.time, 'strftime', lambda fmt: next(self.versions))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def build(self, *texts):
+        self.documents = [guide_chunk(text) for text in texts]
+        return rag.build_index()
+
+    def test_reload_swaps_version_and_in_flight_searches_finish_on_old_index(self):
+        self.build('Old guide: Phewa Lake boating.')
+        index = rag.RagIndex()
+        self.assertEqual(index.reload(), 'v1')
+
+        self.embeddings.release.clear()
+        in_flight = {}
+        thread = threading.Thread(target=lambda: in_flight.update(docs=index.search('boating', k=1)))
+        thread.start()
+        self.assertTrue(self.embeddings.embedding_query.wait(5))
+
+        # The search holds v1's stores while a new version goes live
+        self.build('New guide: Rara Lake camping.')
+        self.assertEqual(index.reload(), 'v2')
+        self.assertEqual(index.version, 'v2')
+
+        self.embeddings.release.set()
+        thread.join(5)
+        self.assertEqual([d.page_content for d in in_flight['docs']], ['Old guide: Phewa Lake boating.'])
+        self.assertEqual([d.page_content for d in index.search('boating', k=1)], ['New guide: Rara Lake camping.'])
+
+    def test_reload_is_a_no_op_for_the_live_version(self):
+        self.build('Old guide: Phewa Lake boating.')
+        index = rag.RagIndex()
+        index.reload()
+        active = index._active
+        self.assertEqual(index.reload(), 'v1')
+        self.assertIs(index._active, active)
+
+    def test_match_locations(self):
+        self.assertEqual(rag.match_locations('Trekking to ABC, then Rara'),
+                         {'Annapurna Base Camp (ABC) Trek', 'Rara Lake', 'Rara National Park'})
+        self.assertEqual(rag.match_locations('sunrise over Fishtail'), {'Machapuchare (Fishtail)'})
+        self.assertEqual(rag.match_locations('a lake near the base camp'), set())
+
+    def build_guides(self):
+        self.build(
+            'Pokhara has lakeside cafes.',
+            'Boats can be hired in Pokhara.',
+            'Pokhara is the gateway to the Annapurnas.',
+            'Paragliding over Pokhara at dawn.',
+            'Mustang needs a restricted area permit.',
+            'Carry cash, ATMs are rare on the trail.',
+            'Teahouses close early in winter.',
+        )
+        return rag.RagIndex()
+
+    def test_location_queries_search_their_shard(self):
+        index = self.build_guides()
+        docs = index.search('cafes in Pokhara', k=4)
+        self.assertEqual(len(docs), 4)
+        self.assertTrue(all('Pokhara' in d.metadata['locations'] for d in docs))
+
+    def test_small_shards_are_topped_up_from_the_global_index(self):
+        index = self.build_guides()
+        docs = index.search('permits for Mustang', k=4)
+        self.assertEqual(len(docs), 4)
+        self.assertEqual(len({d.page_content for d in docs}), 4)
+        self.assertEqual(docs[0].page_content, 'Mustang needs a restricted area permit.')
+
+    def test_queries_without_a_location_search_the_global_index(self):
+        index = self.build_guides()
+        _, _, shards, _ = index._get_active()
+        for shard in shards.values():
+            shard.similarity_search_with_score_by_vector = mock.Mock(side_effect=AssertionError('shard searched'))
+        docs = index.search('what should I pack', k=4)
+        self.assertEqual(len(docs), 4)
+
+
+class RagHandoffTests(TestCase):
+    """Test cases for rag_node reusing the embedding the intent was routed on"""
+
+    def setUp(self):
+        self.embeddings = BagOfWordsEmbeddings()
+        self.index = mock.Mock(wraps=StaticIndex())
+        self.model = ScriptedModel('Take a boat on Phewa Lake.')
+        for target, value in [('chatbot.graph.get_embeddings', lambda: self.embeddings),
+                              ('chatbot.graph.rag_index', self.index),
+                              ('chatbot.graph.llm', self.model)]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.config = {'configurable': {'thread_id': f'handoff-{uuid.uuid4()}'}}
+
+    def turn(self, text):
+        state = intent_node({'messages': [HumanMessage(content=text)]}, self.config)
+        self.assertEqual(state['intent'], 'rag')
+        return rag_node(state, self.config)
+
+    @mock.patch('chatbot.graph.intent_router.classify', return_value=('rag', 0.9))
+    def test_rag_node_searches_with_the_routed_embedding(self, classify):
+        query = 'what should I pack for Pokhara'
+        self.turn(query)
+
+        self.assertEqual(self.embeddings.calls, 1)
+        self.index.retrieve.assert_called_once_with(query, embedding=self.embeddings.embed_query(query))
+        self.assertNotIn(self.config['configurable']['thread_id'], _routed_embeddings)
+        self.assertIn('Phewa Lake is in Pokhara.', self.model.prompts[0][-1].content)
+
+    def test_keyword_routed_messages_are_embedded_by_the_search(self):
+        query = 'local information about Pokhara'
+        self.turn(query)
+
+        self.assertEqual(self.embeddings.calls, 0)
+        self.index.retrieve.assert_called_once_with(query, embedding=None)
\ No newline at end of file
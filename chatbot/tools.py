@@ -1,6 +1,7 @@
 import wikipedia
-import requests
 from .llm import llm
+from .rag import match_locations
+from .weather import WeatherError, fetch_forecast, format_forecast, stored_forecast
 from dotenv import load_dotenv
 import os
 
@@ -9,8 +10,6 @@ from tavily import TavilyClient
 # Load .env file
 load_dotenv()
 
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-
 Tavily_API_KEY = os.getenv("Tavily_API_KEY")
 
 
@@ -50,11 +49,17 @@ def weather_tool(user_text: str, days: int = 3):
     """
     Fetch weather forecast for a Nepali city mentioned in user_text.
     Returns either a string forecast or a dict with "error".
+    Catalogued destinations are answered from the nightly forecast store.
     """
-    if not OPENWEATHER_API_KEY:
-        return {"error": "Weather API key missing."}
-
-    # Step 1: Extract city name using LLM
+    # Step 1: Catalogued destinations named in the text
+    for location in sorted(match_locations(user_text)):
+        forecast = stored_forecast(location)
+        if forecast is not None:
+            text = format_forecast(forecast.as_forecast(), days)
+            if text:
+                return text
+
+    # Step 2: Extract city name using LLM
     prompt = f"Extract the city name from this text (Nepal only): '{user_text}'. Respond only with city name."
     city_response = llm.invoke([{"role": "user", "content": prompt}])
     city = city_response.content.strip()
@@ -62,44 +67,17 @@ def weather_tool(user_text: str, days: int = 3):
     if not city:
         return {"error": "Could not detect city."}
 
-    # Step 2: Fetch weather from OpenWeatherMap
-    url = "https://api.openweathermap.org/data/2.5/forecast"
-    params = {"q": f"{city},NP", "appid": OPENWEATHER_API_KEY, "units": "metric"}
-
-    try:
-        res = requests.get(url, params=params)
-        if res.status_code != 200:
-            return {"error": res.json().get("message", "Unable to fetch weather.")}
-
-        data = res.json()
-        forecast_list = data.get("list", [])
-
-        # Step 3: Aggregate per day
-        daily = {}
-        for entry in forecast_list:
-            date = entry["dt_txt"].split(" ")[0]
-            if date not in daily:
-                daily[date] = {"temps": [], "conds": []}
-            daily[date]["temps"].append(entry["main"]["temp"])
-            daily[date]["conds"].append(entry["weather"][0]["description"])
-
-        # Step 4: Build readable string
-        sorted_dates = sorted(daily.keys())[:days]
-        lines = []
-        for i, date in enumerate(sorted_dates):
-            temps = daily[date]["temps"]
-            avg_temp = round(sum(temps) / len(temps), 1)
-            conds = daily[date]["conds"]
-            main_condition = max(set(conds), key=conds.count)
-            lines.append(f"{i+1}) Date: {date}, Avg Temp: {avg_temp}°C, Condition: {main_condition}")
-
-        if not lines:
-            return {"error": "No forecast data found."}
-
-        return f"Weather forecast for {data['city']['name']}, {data['city']['country']}:\n" + "\n".join(lines)
-
-    except Exception as e:
-        return {"error": str(e)} 
+    # Step 3: Stored forecast for that city, or fetch it live
+    forecast = stored_forecast(city)
+    if forecast is not None:
+        forecast = forecast.as_forecast()
+    else:
+        try:
+            forecast = fetch_forecast(city)
+        except WeatherError as e:
+            return {"error": str(e)}
+
+    return format_forecast(forecast, days) or {"error": "No forecast data found."}
 
 
     
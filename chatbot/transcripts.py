@@ -0,0 +1,62 @@
+import uuid
+
+from django.utils import timezone
+
+from .models import Conversation, ChatMessage
+from .search import index_messages
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) when the LLM did not report one."""
+    return max(1, len(text) // 4)
+
+
+def get_or_create_conversation(user, thread_id):
+    """
+    Return the user's Conversation for a chat thread, creating an untitled
+    one on the first turn. Returns None for thread ids that are not UUIDs or
+    that belong to someone else.
+    """
+    try:
+        conversation_id = uuid.UUID(str(thread_id))
+    except ValueError:
+        return None
+
+    conversation, _ = Conversation.objects.get_or_create(
+        id=conversation_id,
+        defaults={"user": user}
+    )
+    if conversation.user_id != user.id:
+        return None
+    return conversation
+
+
+def record_turn(user, thread_id, user_text, reply, received_at):
+    """
+    Persist one chat turn (the user's message and the assistant's reply)
+    with a single batched insert.
+    """
+    conversation = get_or_create_conversation(user, thread_id)
+    if conversation is None:
+        return []
+
+    usage = getattr(reply, "usage_metadata", None) or {}
+    messages = [
+        ChatMessage.build(
+            conversation,
+            "user",
+            user_text,
+            token_count=estimate_tokens(user_text),
+            created_at=received_at
+        ),
+        ChatMessage.build(
+            conversation,
+            "assistant",
+            reply.content,
+            token_count=usage.get("output_tokens") or estimate_tokens(reply.content),
+            created_at=timezone.now()
+        ),
+    ]
+    messages = ChatMessage.objects.bulk_create(messages)
+    index_messages(conversation, [user_text, reply.content])
+    return messages
@@ -8,5 +8,13 @@ urlpatterns = [
     # Chat lifecycle
     path("new-chat/", views.NewChatView.as_view(), name="new_chat"),
     path("conversations/", views.ConversationListView.as_view(), name="conversations"),
+    path("conversations/search/", views.ConversationSearchView.as_view(), name="conversation_search"),
+    path("conversations/<uuid:conversation_id>/messages/", views.ConversationMessagesView.as_view(), name="conversation_messages"),
     path("delete-conversation/", views.DeleteConversationView.as_view(), name="delete_conversation"),
+
+    # RAG index
+    path("rag/reload/", views.RagReloadView.as_view(), name="rag_reload"),
+
+    # Stored forecasts
+    path("weather/<str:location>/", views.WeatherView.as_view(), name="weather"),
 ]
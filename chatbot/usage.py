@@ -0,0 +1,146 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime, time as dt_time, timedelta
+
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from langchain_core.runnables.config import ensure_config
+from rest_framework.exceptions import Throttled
+
+from .models import LLMUsage
+
+logger = logging.getLogger(__name__)
+
+# Tokens a user may spend per day (prompt + completion); 0 disables the quota
+DAILY_TOKEN_QUOTA = int(os.getenv("LLM_DAILY_TOKEN_QUOTA", "0"))
+
+
+class QuotaExceeded(Throttled):
+    """Raised before an LLM call once the user's daily token quota is spent."""
+    default_detail = "You have reached today's assistant usage limit. Please try again tomorrow."
+
+
+def current_intent():
+    """The graph node making the current LLM call; nodes are named after intents."""
+    return ensure_config().get("metadata", {}).get("langgraph_node", "")
+
+
+def _seconds_until_midnight():
+    now = timezone.localtime()
+    midnight = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), dt_time.min))
+    return max(1, int((midnight - now).total_seconds()))
+
+
+class UsageRecorder:
+    """
+    Write-behind buffer for LLMUsage rows.
+
+    `record` only appends to memory; a background thread bulk-inserts the
+    buffer every `flush_interval` seconds, or sooner once `batch_size` rows
+    are waiting. Per-user daily token totals are kept in memory too, seeded
+    once per user and day from the database, so quota checks cost no query
+    on the hot path. Totals are per process: with several workers a user
+    can overshoot the quota by what the other workers have not flushed.
+    """
+
+    def __init__(self, batch_size=50, flush_interval=5.0, max_buffer=10000, quota=DAILY_TOKEN_QUOTA):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.quota = quota
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._totals = {}              # (user_id, date) -> tokens spent
+        self._wake = threading.Event()
+        self._thread = None
+
+    # ---- quota ----
+
+    def used_today(self, user_id):
+        key = (user_id, timezone.localdate())
+        with self._lock:
+            if key in self._totals:
+                return self._totals[key]
+
+        start = timezone.make_aware(datetime.combine(key[1], dt_time.min))
+        spent = LLMUsage.objects.filter(user_id=user_id, created_at__gte=start).aggregate(
+            prompt=Sum("prompt_tokens"), completion=Sum("completion_tokens")
+        )
+        with self._lock:
+            # Unflushed rows from this process are not in the database yet
+            buffered = sum(
+                u.prompt_tokens + u.completion_tokens for u in self._buffer
+                if u.user_id == user_id and u.created_at >= start
+            )
+            return self._totals.setdefault(key, (spent["prompt"] or 0) + (spent["completion"] or 0) + buffered)
+
+    def check_quota(self, user_id):
+        if not self.quota or user_id is None:
+            return
+        if self.used_today(user_id) >= self.quota:
+            raise QuotaExceeded(wait=_seconds_until_midnight())
+
+    # ---- recording ----
+
+    def record(self, user_id, model, intent, prompt_tokens, completion_tokens, latency_ms):
+        usage = LLMUsage(
+            user_id=user_id,
+            model=model,
+            intent=intent,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_ms=latency_ms,
+        )
+        key = (user_id, timezone.localdate())
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                # The database has been failing for a while; keep the newest rows
+                del self._buffer[0]
+            self._buffer.append(usage)
+            if key in self._totals:
+                self._totals[key] += usage.total_tokens
+            full = len(self._buffer) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-usage", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of rows written."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            # Drop totals of previous days
+            today = timezone.localdate()
+            self._totals = {k: v for k, v in self._totals.items() if k[1] == today}
+        if not batch:
+            return 0
+        try:
+            LLMUsage.objects.bulk_create(batch)
+        except Exception:
+            logger.exception("Could not write %s LLM usage rows; will retry", len(batch))
+            with self._lock:
+                self._buffer[:0] = batch[-self.max_buffer:]
+            return 0
+        return len(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                # This thread's own connection; don't hold it open between flushes
+                connection.close()
+
+
+usage_recorder = UsageRecorder(
+    batch_size=int(os.getenv("LLM_USAGE_BATCH_SIZE", "50")),
+    flush_interval=float(os.getenv("LLM_USAGE_FLUSH_INTERVAL", "5")),
+)
+atexit.register(usage_recorder.flush)
@@ -1,22 +1,43 @@
+import base64
 import uuid
+from datetime import datetime
 
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 
 from langchain_core.messages import HumanMessage, SystemMessage
+from .admission import llm_user
+from .concurrency import thread_locks, get_reply, store_reply
 from .graph import SYSTEM_TREKKA, app
-from .models import Conversation
-from .llm import llm
+from .models import Conversation, ChatMessage
+from .summaries import evictable, finalize, schedule_compaction
+from .transcripts import record_turn
+from .search import matching_conversations
+from .rag import rag_index
+from .weather import stored_forecast
 
 
 class ChatView(APIView):
+    """
+    POST /api/chat/
+    Send {"message": ..., "thread_id": ...}. Clients that may resend a
+    message should add an Idempotency-Key header (or "client_message_id");
+    a resend with the same key gets the first answer back.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
         message = request.data.get("message")
         thread_id = request.data.get("thread_id")
+        idempotency_key = (
+            request.headers.get("Idempotency-Key")
+            or request.data.get("client_message_id")
+        )
 
         if not message:
             return Response(
@@ -24,30 +45,54 @@ class ChatView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if not thread_id:
-            thread_id = str(uuid.uuid4())
+        reply = get_reply(request.user.id, idempotency_key)
+        if reply is not None:
+            return Response(reply)
+        received_at = timezone.now()
 
-        state = app.get_state(
-            config={"configurable": {"thread_id": thread_id}}
-        )
+        # Turns on one thread apply in order; a duplicate of an in-flight
+        # message waits here and then finds the stored reply
+        lock_name = thread_id or f"message:{request.user.id}:{idempotency_key}"
+        if not thread_id and not idempotency_key:
+            thread_id = lock_name = str(uuid.uuid4())
 
-        # Initialize state once
-        if not state.values.get("initialized"):
-            state.values["messages"] = [SYSTEM_TREKKA]
-            state.values["initialized"] = True
-            state.values["saved"] = False   # important
+        with thread_locks.hold(lock_name):
+            reply = get_reply(request.user.id, idempotency_key)
+            if reply is not None:
+                return Response(reply)
 
-        state.values["messages"].append(HumanMessage(content=message))
+            if not thread_id:
+                thread_id = str(uuid.uuid4())
 
-        result = app.invoke(
-            {"messages": state.values["messages"]},
-            config={"configurable": {"thread_id": thread_id}}
-        )
+            state = app.get_state(
+                config={"configurable": {"thread_id": thread_id}}
+            )
 
-        return Response({
-            "thread_id": thread_id,
-            "response": result["messages"][-1].content
-        })
+            # Initialize state once
+            if not state.values.get("initialized"):
+                state.values["messages"] = [SYSTEM_TREKKA]
+                state.values["initialized"] = True
+                state.values["saved"] = False   # important
+
+            state.values["messages"].append(HumanMessage(content=message))
+
+            with llm_user(request.user.id):
+                result = app.invoke(
+                    {"messages": state.values["messages"]},
+                    config={"configurable": {"thread_id": thread_id}}
+                )
+            record_turn(request.user, thread_id, message, result["messages"][-1], received_at)
+            if evictable(result["messages"]):
+                # Fold the overflow into the running summary after replying
+                schedule_compaction(request.user, thread_id)
+
+            reply = {
+                "thread_id": thread_id,
+                "response": result["messages"][-1].content
+            }
+            store_reply(request.user.id, idempotency_key, reply)
+
+        return Response(reply)
 
 
 class NewChatView(APIView):
@@ -58,66 +103,170 @@ class NewChatView(APIView):
         if not thread_id:
             return Response({"ok": True})
 
-        state = app.get_state(
-            config={"configurable": {"thread_id": thread_id}}
-        )
+        # Wait for any turn still running on this thread
+        with thread_locks.hold(thread_id), llm_user(request.user.id):
+            state = app.get_state(
+                config={"configurable": {"thread_id": thread_id}}
+            )
 
-        messages = state.values.get("messages", [])
+            messages = state.values.get("messages", [])
 
-        # Only save if more than 1 message
-        if len(messages) > 1:
-            conversation_text = "\n".join(
-                f"{msg.__class__.__name__}: {msg.content}"
-                for msg in messages
-                if hasattr(msg, "content")
-            )
+            # Only save if more than 1 message
+            if len(messages) > 1:
+                # Older messages are already in the running summary; one
+                # call folds in the rest and names the conversation
+                title, summary = finalize(
+                    state.values.get("summary", ""),
+                    [msg for msg in messages if not isinstance(msg, SystemMessage)]
+                )
 
-            # Generate summary
-            summary = llm.invoke([
-                SystemMessage(content="Summarize this conversation in 3–4 lines."),
-                HumanMessage(content=conversation_text)
-            ]).content.strip()
-
-            # Generate title
-            title = llm.invoke([
-                SystemMessage(content="Generate a short 2–4 word title. Only the title."),
-                HumanMessage(content=summary)
-            ]).content.strip()
-            title = " ".join(title.split()[:4])
-
-            # Check if conversation for this thread already exists
-            conv, created = Conversation.objects.update_or_create(
-                user=request.user,
-                id=thread_id,
-                defaults={"title": title, "summary": summary}
-            )
+                # Check if conversation for this thread already exists
+                conv, created = Conversation.objects.update_or_create(
+                    user=request.user,
+                    id=thread_id,
+                    defaults={"title": title, "summary": summary}
+                )
 
-            state.values["saved"] = True  # mark as saved
+                state.values["saved"] = True  # mark as saved
 
-        # Soft reset after saving
-        state.values["messages"] = []
-        state.values["initialized"] = False
+            # Soft reset after saving
+            state.values["messages"] = []
+            state.values["initialized"] = False
 
         return Response({"ok": True})
 
 
+def _encode_cursor(conversation):
+    raw = f"{conversation.created_at.isoformat()}|{conversation.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    created_at, conversation_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), uuid.UUID(conversation_id)
+
+
+def conversation_page(request, queryset):
+    """
+    One keyset page of conversations, newest first, as a Response.
+    Pass the returned `next_cursor` as `cursor` to get the following page.
+    """
+    try:
+        limit = min(int(request.query_params.get("limit", 20)), 100)
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            created_at, conversation_id = _decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at)
+                | Q(created_at=created_at, id__lt=conversation_id)
+            )
+    except (ValueError, UnicodeDecodeError):
+        return Response(
+            {"error": "Invalid limit or cursor"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    page = list(queryset.order_by("-created_at", "-id")[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return Response({
+        "conversations": [
+            {
+                "id": str(c.id),
+                "title": c.title,
+                "summary": c.summary
+            }
+            for c in page
+        ],
+        "next_cursor": _encode_cursor(page[-1]) if has_more else None
+    })
+
+
 class ConversationListView(APIView):
+    """
+    GET /api/conversations/?limit=20&cursor=...
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        conversations = Conversation.objects.filter(user=request.user)
+        return conversation_page(request, conversations)
+
+
+class ConversationSearchView(APIView):
+    """
+    GET /api/conversations/search/?q=langtang permits&limit=20&cursor=...
+    Full-text search over the user's conversation titles, summaries and
+    messages, newest first.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        conversations = Conversation.objects.filter(
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response(
+                {"error": "q required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        conversations = matching_conversations(
+            Conversation.objects.filter(user=request.user),
+            request.user,
+            query
+        )
+        return conversation_page(request, conversations)
+
+
+class ConversationMessagesView(APIView):
+    """
+    GET /api/conversations/<id>/messages/?limit=20&before=<message id>
+    Returns the last `limit` messages (oldest first). Pass the returned
+    `next_before` as `before` to load the page preceding them.
+    """
+    permission_classes = [IsAuthenticated]
+
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
+    def get(self, request, conversation_id):
+        conversation = get_object_or_404(
+            Conversation,
+            id=conversation_id,
             user=request.user
-        ).order_by("-created_at")
+        )
+
+        try:
+            limit = min(int(request.query_params.get("limit", self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+            before = request.query_params.get("before")
+            before = int(before) if before else None
+        except ValueError:
+            return Response(
+                {"error": "limit and before must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        messages = ChatMessage.objects.filter(conversation=conversation).order_by("-id")
+        if before is not None:
+            messages = messages.filter(id__lt=before)
+        # One extra row tells us whether an older page exists
+        page = list(messages[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit][::-1]
 
         return Response({
-            "conversations": [
+            "conversation_id": str(conversation.id),
+            "messages": [
                 {
-                    "id": str(c.id),
-                    "title": c.title,
-                    "summary": c.summary
+                    "id": m.id,
+                    "role": m.role,
+                    "content": m.text,
+                    "token_count": m.token_count,
+                    "created_at": m.created_at
                 }
-                for c in conversations
-            ]
+                for m in page
+            ],
+            "next_before": page[0].id if has_more else None
         })
 
 
@@ -132,3 +281,48 @@ class DeleteConversationView(APIView):
                 user=request.user
             ).delete()
         return Response({"ok": True})
+
+
+class RagReloadView(APIView):
+    """
+    POST /api/rag/reload/
+    Swap this worker onto the latest RAG index version without a restart.
+    Send {"rebuild": true} to rebuild the index from the guides first.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        previous = rag_index.version
+        if request.data.get("rebuild"):
+            version = rag_index.rebuild()
+        else:
+            version = rag_index.reload()
+        return Response({
+            "ok": True,
+            "previous_version": previous,
+            "version": version
+        })
+
+
+class WeatherView(APIView):
+    """
+    GET /api/weather/<location>/
+    The stored daily forecast for a catalogued destination, as refreshed by
+    the prefetch_forecasts job. Never calls OpenWeather.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, location):
+        forecast = stored_forecast(location)
+        if forecast is None:
+            return Response(
+                {"error": "No forecast available for this location"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({
+            "location": forecast.location,
+            "city": forecast.city,
+            "country": forecast.country,
+            "days": forecast.days,
+            "fetched_at": forecast.fetched_at
+        })
@@ -0,0 +1,41 @@
+from backend.warmup import warm_step
+
+from .llm import providers
+from .rag import RERANK_ENABLED, get_embeddings, rag_index
+from .rerank import reranker
+from .router import intent_router
+from .weather import OPENWEATHER_URL, REQUEST_TIMEOUT, http
+
+
+@warm_step("rag index")
+def load_rag_index():
+    rag_index.reload()
+
+
+@warm_step("embedding model")
+def run_dummy_embedding():
+    get_embeddings().embed_query("warm up")
+
+
+@warm_step("intent centroids")
+def load_intent_centroids():
+    intent_router.centroids()
+
+
+@warm_step("reranker")
+def load_reranker():
+    if RERANK_ENABLED:
+        reranker.rerank("warm up", rag_index.search("warm up"), 1)
+
+
+@warm_step("llm connections", required=False)
+def open_llm_connections():
+    # A one-token completion leaves a pooled HTTPS connection behind for
+    # the first chat call to reuse
+    for _, model in providers:
+        model.invoke("ping", max_tokens=1)
+
+
+@warm_step("weather connections", required=False)
+def open_weather_connections():
+    http.head(OPENWEATHER_URL, timeout=REQUEST_TIMEOUT)
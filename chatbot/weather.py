@@ -0,0 +1,161 @@
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+import requests
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import WeatherForecast
+
+
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/forecast"
+
+# Forecasts are refreshed nightly; anything older is treated as missing
+MAX_AGE = timedelta(hours=float(os.getenv("WEATHER_MAX_AGE_HOURS", "36")))
+REQUEST_TIMEOUT = 10
+
+# Shared so live lookups reuse pooled connections to OpenWeather
+http = requests.Session()
+
+
+class WeatherError(Exception):
+    pass
+
+
+# =========================
+# OPENWEATHER
+# =========================
+
+def aggregate_daily(entries):
+    """
+    Collapse OpenWeather's 3-hourly forecast entries into one summary per
+    day: the average temperature and the most frequent condition.
+    """
+    daily = {}
+    for entry in entries:
+        date = entry["dt_txt"].split(" ")[0]
+        day = daily.setdefault(date, {"temps": [], "conds": []})
+        day["temps"].append(entry["main"]["temp"])
+        day["conds"].append(entry["weather"][0]["description"])
+
+    return [
+        {
+            "date": date,
+            "avg_temp": round(sum(day["temps"]) / len(day["temps"]), 1),
+            "condition": Counter(day["conds"]).most_common(1)[0][0],
+        }
+        for date, day in sorted(daily.items())
+    ]
+
+
+def fetch_forecast(city, session=None):
+    """Fetch and aggregate the 5-day forecast for a Nepali city."""
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        raise WeatherError("Weather API key missing.")
+
+    params = {"q": f"{city},NP", "appid": api_key, "units": "metric"}
+    try:
+        res = (session or http).get(OPENWEATHER_URL, params=params, timeout=REQUEST_TIMEOUT)
+        data = res.json()
+    except (requests.RequestException, ValueError) as e:
+        raise WeatherError(str(e))
+    if res.status_code != 200:
+        message = data.get("message") if isinstance(data, dict) else None
+        raise WeatherError(message or "Unable to fetch weather.")
+
+    # A payload missing fields fails this city, not the whole prefetch
+    try:
+        days = aggregate_daily(data.get("list", []))
+        forecast = {
+            "city": data["city"]["name"],
+            "country": data["city"]["country"],
+            "days": days,
+        }
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
+        raise WeatherError(f"Malformed forecast response: {e!r}")
+    if not days:
+        raise WeatherError("No forecast data found.")
+    return forecast
+
+
+def format_forecast(forecast, days=3):
+    """Render a stored or freshly fetched forecast as numbered chat lines."""
+    today = timezone.localdate().isoformat()
+    upcoming = [d for d in forecast["days"] if d["date"] >= today][:days]
+    if not upcoming:
+        return None
+    lines = [
+        f"{i + 1}) Date: {d['date']}, Avg Temp: {d['avg_temp']}°C, Condition: {d['condition']}"
+        for i, d in enumerate(upcoming)
+    ]
+    return f"Weather forecast for {forecast['city']}, {forecast['country']}:\n" + "\n".join(lines)
+
+
+# =========================
+# FORECAST STORE
+# =========================
+
+def catalogued_locations():
+    """Every destination we keep a forecast for, from the gallery choices and travelKit."""
+    from photo_gallery.models import PhotoGallery
+    from travelKit.models import Location
+
+    names = {value for value, _ in PhotoGallery.LOCATION_CHOICES if value != "Other"}
+    names.update(Location.objects.values_list("name", flat=True))
+    return sorted(names)
+
+
+def query_name(location):
+    """The name OpenWeather should geocode: 'Makalu Trek (Everest Region)' -> 'Makalu Trek'."""
+    return re.sub(r"\s*\(.*?\)", "", location).strip()
+
+
+def prefetch_forecasts(locations=None, workers=8):
+    """
+    Fetch forecasts for the given (default: all catalogued) locations with
+    at most `workers` requests in flight, and store them.
+    Returns (stored, {location: error}).
+    """
+    locations = locations or catalogued_locations()
+    stored, failed = 0, {}
+
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetch_forecast, query_name(location), session): location
+            for location in locations
+        }
+        # Writes stay on this thread; workers only talk to OpenWeather
+        for future in as_completed(futures):
+            location = futures[future]
+            try:
+                forecast = future.result()
+            except WeatherError as e:
+                failed[location] = str(e)
+                continue
+            WeatherForecast.objects.update_or_create(
+                location=location,
+                defaults={
+                    "city": forecast["city"],
+                    "country": forecast["country"],
+                    "days": forecast["days"],
+                    "fetched_at": timezone.now(),
+                }
+            )
+            stored += 1
+
+    return stored, failed
+
+
+def stored_forecast(location):
+    """The stored forecast for a location or city name, or None if missing or stale."""
+    return (
+        WeatherForecast.objects
+        .filter(Q(location__iexact=location) | Q(city__iexact=location))
+        .filter(fetched_at__gte=timezone.now() - MAX_AGE)
+        .order_by("-fetched_at")
+        .first()
+    )
@@ -0,0 +1,161 @@
+"""
+Resized JPEG and WebP renditions of uploaded images.
+
+Every image field listed in IMAGE_FIELDS gets three companion columns on
+its model: <field>_width and <field>_height (upright size of the original)
+and <field>_renditions:
+
+    {"source": "<image name the renditions were made from>",
+     "formats": {"webp": {"320": "<storage name>", ...}, "jpeg": {...}}}
+
+After an upload is committed (see signals.py) the image is handed to a
+background thread, which runs the decoding and encoding in a process pool
+and stores the results. Serializers expose them with SrcsetField.
+"""
+
+import multiprocessing
+import os
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from .render import render
+
+# (model, image field) pairs that get renditions
+IMAGE_FIELDS = (
+    ("photo_gallery.PhotoGallery", "image"),
+    ("accounts.User", "profile_picture"),
+    ("sherpa.Sherpa", "photo"),
+    ("travelKit.TravelKitItem", "image"),
+)
+
+WIDTHS = (320, 640, 1280)
+QUALITY = {"jpeg": 82, "webp": 80}
+EXTENSIONS = {"jpeg": "jpg", "webp": "webp"}
+WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+_jobs = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="derivatives")
+_processes = None
+_lock = threading.Lock()
+_queued = set()   # (model, pk, field, image name) waiting or running
+
+
+def image_fields():
+    """[(model class, field name)] for IMAGE_FIELDS."""
+    return [(apps.get_model(label), field) for label, field in IMAGE_FIELDS]
+
+
+def column_names(field_name):
+    return f"{field_name}_width", f"{field_name}_height", f"{field_name}_renditions"
+
+
+def rendition_name(source, format, width):
+    """renditions/<source dir>/<source stem>_<width>.<ext>"""
+    stem = posixpath.splitext(source)[0]
+    return f"renditions/{stem}_{width}.{EXTENSIONS[format]}"
+
+
+def renditions_current(instance, field_name):
+    """True when the stored renditions were made from the current image."""
+    image = getattr(instance, field_name)
+    renditions = getattr(instance, column_names(field_name)[2]) or {}
+    return renditions.get("source") == (image.name or None)
+
+
+def _process_pool():
+    global _processes
+    with _lock:
+        if _processes is None:
+            # spawn, not fork: the web worker has threads and open sockets
+            _processes = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _processes
+
+
+def delete_renditions(storage, renditions):
+    for names in (renditions or {}).get("formats", {}).values():
+        for name in names.values():
+            storage.delete(name)
+
+
+def generate(instance, field_name, in_process=False):
+    """
+    Make and store the renditions of one instance's image, then record
+    them with its dimensions. Renditions of a previous image are deleted.
+    If the image changes while this runs, the new files are thrown away;
+    the change has scheduled its own run.
+    """
+    model = type(instance)
+    width_column, height_column, renditions_column = column_names(field_name)
+    image = getattr(instance, field_name)
+    source = image.name
+    storage = image.storage
+
+    with image.open("rb") as f:
+        data = f.read()
+    if in_process:
+        width, height, encoded = render(data, WIDTHS, QUALITY)
+    else:
+        width, height, encoded = _process_pool().submit(render, data, WIDTHS, QUALITY).result()
+
+    formats = {}
+    for format, by_width in encoded.items():
+        formats[format] = {}
+        for target, content in by_width.items():
+            name = rendition_name(source, format, target)
+            formats[format][str(target)] = storage.save(name, ContentFile(content))
+    renditions = {"source": source, "formats": formats}
+
+    current = model.objects.filter(pk=instance.pk).first()
+    if current is None or getattr(current, field_name).name != source:
+        delete_renditions(storage, renditions)
+        return None
+
+    previous = getattr(current, renditions_column)
+    setattr(current, width_column, width)
+    setattr(current, height_column, height)
+    setattr(current, renditions_column, renditions)
+    current.save(update_fields=[width_column, height_column, renditions_column])
+    # Every save above took a reference, also for names the previous run
+    # stored too, so all of the previous references are released
+    delete_renditions(storage, previous)
+    return current
+
+
+def clear(instance, field_name):
+    """The image was removed: drop its renditions and dimensions."""
+    width_column, height_column, renditions_column = column_names(field_name)
+    storage, renditions = getattr(instance, field_name).storage, getattr(instance, renditions_column)
+    transaction.on_commit(lambda: delete_renditions(storage, renditions))
+    setattr(instance, width_column, None)
+    setattr(instance, height_column, None)
+    setattr(instance, renditions_column, {})
+    instance.save(update_fields=[width_column, height_column, renditions_column])
+
+
+def _generate_in_background(model, pk, field_name, job):
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is not None and getattr(instance, field_name) and not renditions_current(instance, field_name):
+            generate(instance, field_name)
+    except Exception as e:
+        # The image is still served as uploaded; generate_derivatives retries
+        print(f"[IMAGING] Renditions for {model.__name__} {pk} failed: {e}")
+    finally:
+        with _lock:
+            _queued.discard(job)
+        close_old_connections()
+
+
+def schedule(instance, field_name):
+    """Generate the renditions off the request thread, once per image."""
+    model = type(instance)
+    job = (model, instance.pk, field_name, getattr(instance, field_name).name)
+    with _lock:
+        if job in _queued:
+            return
+        _queued.add(job)
+    _jobs.submit(_generate_in_background, model, instance.pk, field_name, job)
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from imaging.derivatives import WORKERS, generate, image_fields, renditions_current
+
+
+class Command(BaseCommand):
+    help = (
+        "Make the JPEG/WebP renditions of every image that doesn't have "
+        "current ones: images from before the pipeline, or failed runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate even current renditions")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=WORKERS,
+            help=f"Images processed at once (default: {WORKERS})",
+        )
+
+    def handle(self, *args, **options):
+        pending = []
+        for model, field_name in image_fields():
+            for instance in model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True}).iterator():
+                if options["force"] or not renditions_current(instance, field_name):
+                    pending.append((instance, field_name))
+
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = {pool.submit(generate, instance, field_name): (instance, field_name) for instance, field_name in pending}
+            for future in as_completed(futures):
+                instance, field_name = futures[future]
+                try:
+                    future.result()
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{instance._meta.label} {instance.pk} {field_name}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Generated renditions for {done} images, {failed} failed"))
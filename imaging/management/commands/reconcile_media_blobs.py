@@ -0,0 +1,91 @@
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from imaging.derivatives import column_names, image_fields
+from imaging.models import MediaBlob
+from imaging.storage import ContentAddressedStorage, content_addressed_storage
+
+
+def references():
+    """Count of rows pointing at each content-addressed file, renditions included."""
+    counts = Counter()
+    for model, field_name in image_fields():
+        if not isinstance(model._meta.get_field(field_name).storage, ContentAddressedStorage):
+            continue
+        rows = model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+        for name, renditions in rows.values_list(field_name, column_names(field_name)[2]).iterator():
+            counts[name] += 1
+            for names in (renditions or {}).get("formats", {}).values():
+                counts.update(names.values())
+    return counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the references to content-addressed media files, repair "
+        "drifted MediaBlob.refcount values and delete files nothing refers to. "
+        "Files newer than --grace-minutes are left alone, as their rows may "
+        "not be saved yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace-minutes", type=int, default=60, help="Age before an orphan is deleted (default: 60)")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        dry_run = options["dry_run"]
+        counts = references()
+        cutoff = timezone.now() - timedelta(minutes=options["grace_minutes"])
+        repaired = removed = 0
+
+        for blob in MediaBlob.objects.iterator():
+            actual = counts.pop(blob.name, 0)
+            if actual == blob.refcount:
+                continue
+            if actual == 0:
+                if blob.created_at > cutoff:
+                    continue
+                self.stdout.write(f"{blob.name}: unreferenced, deleting")
+                if not dry_run:
+                    blob.delete()
+                    storage.delete(blob.name)
+                removed += 1
+            else:
+                self.stdout.write(f"{blob.name}: refcount {blob.refcount}, actual {actual}")
+                if not dry_run:
+                    MediaBlob.objects.filter(pk=blob.pk).update(refcount=actual)
+                repaired += 1
+
+        # Referenced files without a row (e.g. restored from a backup)
+        for name, actual in counts.items():
+            if not name.startswith(f"{storage.prefix}/") or not storage.exists(name):
+                continue
+            self.stdout.write(f"{name}: no MediaBlob row, {actual} references")
+            if not dry_run:
+                MediaBlob.objects.update_or_create(
+                    name=name, defaults={"size": storage.size(name), "refcount": actual}
+                )
+            repaired += 1
+
+        # Files on disk no row knows about (a crash between write and commit)
+        known = set(MediaBlob.objects.values_list("name", flat=True))
+        root = storage.path(storage.prefix)
+        for directory, _, files in os.walk(root):
+            for file in files:
+                path = os.path.join(directory, file)
+                name = os.path.relpath(path, storage.location).replace(os.sep, "/")
+                if name in known or name in counts or os.path.getmtime(path) > time.time() - options["grace_minutes"] * 60:
+                    continue
+                self.stdout.write(f"{name}: stray file, deleting")
+                if not dry_run:
+                    os.unlink(path)
+                removed += 1
+
+        verb = "Found" if dry_run else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {repaired} reference counts, {removed} unreferenced files"))
@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class MediaBlob(models.Model):
+    """
+    One stored file of the content-addressed media storage, with the
+    number of references to it (model image fields and their renditions).
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} references)"
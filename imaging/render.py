@@ -0,0 +1,47 @@
+"""
+Image decoding and encoding for the derivative pipeline. Only Pillow is
+used here: the functions run in worker processes that never set up Django.
+"""
+
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+
+def _encode(image, format, **options):
+    out = BytesIO()
+    image.save(out, format=format, **options)
+    return out.getvalue()
+
+
+def _flatten(image):
+    """JPEG has no alpha channel: paint transparent areas white."""
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def render(data, widths, quality):
+    """
+    Decode an uploaded image, turn it upright from its EXIF orientation and
+    encode it as JPEG and WebP at each width narrower than the original (or
+    at the original width when it is narrower than them all). Metadata is
+    not carried over. Returns (width, height, {format: {width: bytes}}),
+    with the upright width and height of the original.
+    """
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        width, height = image.size
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    renditions = {"jpeg": {}, "webp": {}}
+    for target in [w for w in widths if w < width] or [width]:
+        size = (target, max(1, round(height * target / width)))
+        resized = image if size == image.size else image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        renditions["webp"][target] = _encode(resized, "WEBP", quality=quality["webp"], method=4)
+        renditions["jpeg"][target] = _encode(
+            _flatten(resized) if has_alpha else resized,
+            "JPEG", quality=quality["jpeg"], optimize=True, progressive=True
+        )
+    return width, height, renditions
@@ -0,0 +1,52 @@
+from rest_framework import serializers
+
+from .derivatives import column_names, renditions_current
+from .uploads import ImageRejected, normalize
+
+
+class NormalizedImageField(serializers.ImageField):
+    """
+    Image upload that is validated and replaced with its normalized
+    re-encoding (see uploads.py) before it reaches the model.
+    """
+
+    def to_internal_value(self, data):
+        upload = super().to_internal_value(data)
+        try:
+            return normalize(upload)
+        except ImageRejected as e:
+            raise serializers.ValidationError(str(e))
+
+
+class SrcsetField(serializers.Field):
+    """
+    Read-only srcset strings for the renditions of an image field, per
+    format, ready for <source srcset="...">:
+
+        {"webp": "https://.../a_320.webp 320w, https://.../a_640.webp 640w",
+         "jpeg": "..."}
+
+    None while the renditions are still being made.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.image_field = image_field
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        if not image or not renditions_current(instance, self.image_field):
+            return None
+
+        request = self.context.get('request')
+        renditions = getattr(instance, column_names(self.image_field)[2])
+        srcset = {}
+        for format, names in renditions['formats'].items():
+            candidates = []
+            for width, name in sorted(names.items(), key=lambda item: int(item[0])):
+                url = image.storage.url(name)
+                candidates.append(f"{request.build_absolute_uri(url) if request else url} {width}w")
+            srcset[format] = ', '.join(candidates)
+        return srcset
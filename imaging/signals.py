@@ -0,0 +1,72 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .derivatives import column_names, clear, delete_renditions, image_fields, renditions_current, schedule
+from .storage import ContentAddressedStorage
+
+
+def image_saved(sender, instance, field_name, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and field_name not in update_fields):
+        return
+    if renditions_current(instance, field_name):
+        return
+    if getattr(instance, field_name):
+        transaction.on_commit(partial(schedule, instance, field_name))
+    else:
+        clear(instance, field_name)
+
+
+def image_deleted(sender, instance, field_name, **kwargs):
+    renditions = getattr(instance, column_names(field_name)[2])
+    storage = getattr(instance, field_name).storage
+    transaction.on_commit(partial(delete_renditions, storage, renditions))
+
+
+# Content-addressed files are shared, so they are only released through
+# the storage's reference counts: when a row drops or replaces its image.
+
+def remember_stored_name(sender, instance, field_name, update_fields=None, raw=False, **kwargs):
+    if raw or instance.pk is None or (update_fields is not None and field_name not in update_fields):
+        return
+    file = getattr(instance, field_name)
+    if file and file._committed:
+        return   # same file as loaded
+    stored = sender.objects.filter(pk=instance.pk).values_list(field_name, flat=True).first()
+    if stored:
+        instance.__dict__.setdefault("_replaced_media", {})[field_name] = stored
+
+
+def release_replaced(sender, instance, field_name, **kwargs):
+    # The upload took a reference of its own, even when its content (and
+    # so its name) is the same as the stored file's: always drop the old one
+    stored = instance.__dict__.get("_replaced_media", {}).pop(field_name, None)
+    if stored:
+        storage = getattr(instance, field_name).storage
+        transaction.on_commit(partial(storage.delete, stored))
+
+
+def release_deleted(sender, instance, field_name, **kwargs):
+    file = getattr(instance, field_name)
+    if file:
+        transaction.on_commit(partial(file.storage.delete, file.name))
+
+
+for model, field_name in image_fields():
+    label = model._meta.label_lower
+    handlers = [
+        (post_save, image_saved, "saved"),
+        (post_delete, image_deleted, "deleted"),
+    ]
+    if isinstance(model._meta.get_field(field_name).storage, ContentAddressedStorage):
+        handlers += [
+            (pre_save, remember_stored_name, "remember"),
+            (post_save, release_replaced, "replaced"),
+            (post_delete, release_deleted, "released"),
+        ]
+    for signal, handler, name in handlers:
+        signal.connect(
+            partial(handler, field_name=field_name), sender=model, weak=False,
+            dispatch_uid=f"imaging_{name}_{label}"
+        )
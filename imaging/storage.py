@@ -0,0 +1,89 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each distinct file once, named by the SHA-256 of its content
+    and sharded by hash prefix: cas/3f/a9/3fa9...c1.jpg. The name a field
+    asks for only contributes its extension.
+
+    Every save is one reference and every delete drops one
+    (MediaBlob.refcount); the file goes with its last reference. Saving
+    content that is already stored costs one hashing pass and no writes.
+    """
+    prefix = "cas"
+
+    def get_available_name(self, name, max_length=None):
+        return name   # _save names the file after its content
+
+    def content_name(self, digest, extension):
+        return f"{self.prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        name = self.content_name(digest.hexdigest(), os.path.splitext(name)[1].lower())
+
+        with transaction.atomic():
+            blob, created = MediaBlob.objects.select_for_update().get_or_create(name=name, defaults={"size": size})
+            # A new row always gets its file: one left on disk may be about
+            # to be removed by the delete of the previous row
+            if created or not self.exists(name):
+                self._write(name, content)
+            MediaBlob.objects.filter(pk=blob.pk).update(refcount=F("refcount") + 1)
+        return name
+
+    def _write(self, name, content):
+        """Write next to the final path, then rename, so no one reads a partial file."""
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in content.chunks():
+                    out.write(chunk)
+            file_move_safe(temporary, path, allow_overwrite=True)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+
+    def delete(self, name):
+        from .models import MediaBlob
+
+        if not name:
+            return
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.refcount > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(refcount=F("refcount") - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            # Last reference, or a file stored before content addressing.
+            # Removed under the row lock, so a save of the same content
+            # waits for it and then writes the file again.
+            super().delete(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def media_storage():
+    """Storage of the user-uploaded image fields (a callable, so migrations don't serialize it)."""
+    return content_addressed_storage
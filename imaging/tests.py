@@ -0,0 +1,372 @@
+"""
+Test cases for the imaging app
+Run with: python manage.py test imaging
+"""
+
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from photo_gallery.models import PhotoGallery
+from photo_gallery.serializers import PhotoGallerySerializer
+
+from .derivatives import generate
+from .models import MediaBlob
+from .storage import content_addressed_storage
+from .render import render
+from .serializers import NormalizedImageField
+from .uploads import MAX_SIDE, ImageRejected, normalize
+
+User = get_user_model()
+
+QUALITY = {"jpeg": 80, "webp": 80}
+
+
+def image_bytes(size=(1000, 500), mode='RGB', format='JPEG', exif=None):
+    image = Image.new(mode, size, color=(200, 30, 30, 128) if mode == 'RGBA' else 'red')
+    out = BytesIO()
+    image.save(out, format=format, **({'exif': exif} if exif else {}))
+    return out.getvalue()
+
+
+class RenderTests(TestCase):
+    """Test cases for decoding and encoding renditions"""
+
+    def test_widths_never_upscale(self):
+        width, height, renditions = render(image_bytes(), (320, 640, 1280), QUALITY)
+        self.assertEqual((width, height), (1000, 500))
+        self.assertEqual(sorted(renditions['webp']), [320, 640])
+        with Image.open(BytesIO(renditions['jpeg'][320])) as image:
+            self.assertEqual(image.size, (320, 160))
+            self.assertEqual(image.format, 'JPEG')
+
+    def test_small_image_keeps_its_width(self):
+        _, _, renditions = render(image_bytes((200, 100)), (320, 640), QUALITY)
+        self.assertEqual(list(renditions['jpeg']), [200])
+
+    def test_exif_orientation_applied_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6   # rotated 90 degrees clockwise
+        exif[0x010F] = 'PhoneMaker'
+        width, height, renditions = render(image_bytes(exif=exif.tobytes()), (320,), QUALITY)
+        self.assertEqual((width, height), (500, 1000))
+        for format in ('jpeg', 'webp'):
+            with Image.open(BytesIO(renditions[format][320])) as image:
+                self.assertEqual(image.size, (320, 640))
+                self.assertEqual(len(image.getexif()), 0)
+
+    def test_transparency(self):
+        _, _, renditions = render(image_bytes((400, 400), 'RGBA', 'PNG'), (320,), QUALITY)
+        with Image.open(BytesIO(renditions['webp'][320])) as image:
+            self.assertEqual(image.mode, 'RGBA')
+        with Image.open(BytesIO(renditions['jpeg'][320])) as image:
+            self.assertEqual(image.mode, 'RGB')
+
+
+class DerivativePipelineTests(TestCase):
+    """Test cases for storing renditions of model images"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(email='imaging@example.com', password='testpass123')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def create_photo(self):
+        return PhotoGallery.objects.create(
+            user=self.user,
+            image=SimpleUploadedFile('test_image.jpg', image_bytes(), content_type='image/jpeg'),
+            location='Kathmandu'
+        )
+
+    def test_upload_queues_one_job_after_commit(self):
+        # A fresh _queued: jobs submitted to a patched pool never leave it
+        with mock.patch('imaging.derivatives._jobs') as jobs, mock.patch('imaging.derivatives._queued', set()):
+            with self.captureOnCommitCallbacks(execute=True):
+                photo = self.create_photo()
+                jobs.submit.assert_not_called()
+            jobs.submit.assert_called_once()
+
+            # Saved again before the job ran: still one job
+            with self.captureOnCommitCallbacks(execute=True):
+                photo.title = 'Renamed'
+                photo.save()
+            jobs.submit.assert_called_once()
+
+    def test_fixture_load_queues_nothing(self):
+        """loaddata saves with raw=True: the fixture's image is not rendered"""
+        now = timezone.now()
+        photo = PhotoGallery(
+            user=self.user, image='photos/fixture.jpg', location='Pokhara', uploaded_at=now, updated_at=now
+        )
+        with mock.patch('imaging.derivatives._jobs') as jobs, mock.patch('imaging.derivatives._queued', set()):
+            with self.captureOnCommitCallbacks(execute=True):
+                photo.save_base(raw=True)
+            jobs.submit.assert_not_called()
+
+    def test_generate_stores_renditions_and_dimensions(self):
+        photo = generate(self.create_photo(), 'image', in_process=True)
+        self.assertEqual((photo.image_width, photo.image_height), (1000, 500))
+        names = photo.image_renditions['formats']['webp']
+        self.assertEqual(sorted(names, key=int), ['320', '640'])
+        self.assertTrue(all(default_storage.exists(name) for name in names.values()))
+
+        srcset = PhotoGallerySerializer(photo).data['image_srcset']
+        self.assertRegex(srcset['webp'], r'^/media/cas/.+\.webp 320w, /media/cas/.+\.webp 640w$')
+        self.assertIn('.jpg 640w', srcset['jpeg'])
+
+    def test_new_image_replaces_renditions(self):
+        photo = generate(self.create_photo(), 'image', in_process=True)
+        old = list(photo.image_renditions['formats']['jpeg'].values())
+
+        photo.image = SimpleUploadedFile('other.png', image_bytes((300, 300), format='PNG'), content_type='image/png')
+        photo.save()
+        self.assertIsNone(PhotoGallerySerializer(photo).data['image_srcset'])
+
+        photo = generate(photo, 'image', in_process=True)
+        self.assertEqual(list(photo.image_renditions['formats']['jpeg']), ['300'])
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+
+    def test_removed_image_clears_renditions(self):
+        self.user.profile_picture = SimpleUploadedFile('me.jpg', image_bytes(), content_type='image/jpeg')
+        self.user.save()
+        user = generate(self.user, 'profile_picture', in_process=True)
+        names = list(user.profile_picture_renditions['formats']['webp'].values())
+
+        user.profile_picture = None
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.profile_picture_renditions, {})
+        self.assertIsNone(user.profile_picture_width)
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test cases for deduplicated media files"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(email='cas@example.com', password='testpass123')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def create_photo(self, data=None, name='same.jpg'):
+        with mock.patch('imaging.derivatives._jobs'), self.captureOnCommitCallbacks(execute=True):
+            return PhotoGallery.objects.create(
+                user=self.user,
+                image=SimpleUploadedFile(name, data or image_bytes(), content_type='image/jpeg'),
+                location='Kathmandu'
+            )
+
+    def refcount(self, name):
+        return MediaBlob.objects.filter(name=name).values_list('refcount', flat=True).first()
+
+    def delete(self, instance):
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.delete()
+
+    def test_identical_uploads_share_one_file(self):
+        first, second = self.create_photo(), self.create_photo(name='copy.jpg')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^cas/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.jpg$')
+        self.assertEqual(self.refcount(first.image.name), 2)
+
+        self.delete(first)
+        self.assertEqual(self.refcount(second.image.name), 1)
+        self.assertTrue(default_storage.exists(second.image.name))
+
+        self.delete(second)
+        self.assertIsNone(self.refcount(second.image.name))
+        self.assertFalse(default_storage.exists(second.image.name))
+
+    def test_replaced_image_is_released(self):
+        photo = self.create_photo()
+        old = photo.image.name
+        photo.image = SimpleUploadedFile('new.png', image_bytes((300, 300), format='PNG'), content_type='image/png')
+        with mock.patch('imaging.derivatives._jobs'), self.captureOnCommitCallbacks(execute=True):
+            photo.save()
+        self.assertNotEqual(photo.image.name, old)
+        self.assertIsNone(self.refcount(old))
+        self.assertFalse(default_storage.exists(old))
+
+        # Saving other fields keeps the reference
+        photo.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.save()
+        self.assertEqual(self.refcount(photo.image.name), 1)
+
+    def test_identical_reupload_keeps_one_reference(self):
+        photo = self.create_photo()
+        name = photo.image.name
+        photo.image = SimpleUploadedFile('again.jpg', image_bytes(), content_type='image/jpeg')
+        with mock.patch('imaging.derivatives._jobs'), self.captureOnCommitCallbacks(execute=True):
+            photo.save()
+        self.assertEqual(photo.image.name, name)
+        self.assertEqual(self.refcount(name), 1)
+        self.assertTrue(default_storage.exists(name))
+
+        self.delete(photo)
+        self.assertIsNone(self.refcount(name))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_renditions_are_shared_and_released(self):
+        first = generate(self.create_photo(), 'image', in_process=True)
+        second = generate(self.create_photo(name='copy.jpg'), 'image', in_process=True)
+        name = first.image_renditions['formats']['webp']['320']
+        self.assertEqual(second.image_renditions['formats']['webp']['320'], name)
+        self.assertEqual(self.refcount(name), 2)
+
+        self.delete(first)
+        self.delete(second)
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_regenerated_renditions_keep_one_reference(self):
+        photo = generate(self.create_photo(), 'image', in_process=True)
+        name = photo.image_renditions['formats']['webp']['320']
+        photo = generate(photo, 'image', in_process=True)
+        self.assertEqual(photo.image_renditions['formats']['webp']['320'], name)
+        self.assertEqual(self.refcount(name), 1)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_reconcile_repairs_counts_and_orphans(self):
+        photo = self.create_photo()
+        orphan = self.create_photo(image_bytes((50, 50)), 'orphan.jpg')
+        # Lose the row without the post_delete signal releasing its file
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {PhotoGallery._meta.db_table} WHERE id = %s', [orphan.pk])
+        MediaBlob.objects.filter(name=photo.image.name).update(refcount=5)
+
+        call_command('reconcile_media_blobs', '--grace-minutes=0', stdout=StringIO())
+        self.assertEqual(self.refcount(photo.image.name), 1)
+        self.assertIsNone(self.refcount(orphan.image.name))
+        self.assertFalse(default_storage.exists(orphan.image.name))
+
+
+class MediaServingTests(TestCase):
+    """Test cases for the media view"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_SENDFILE='')
+        self.settings_override.enable()
+        self.legacy = default_storage.save('travelkit_items/old.jpg', SimpleUploadedFile('old.jpg', b'0123456789'))
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def get(self, name, **headers):
+        return self.client.get(f'/media/{name}', headers=headers)
+
+    def test_full_response_with_validators(self):
+        response = self.get(self.legacy)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertFalse(response['ETag'].startswith('W/'))
+
+        repeat = self.get(self.legacy, if_none_match=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat['ETag'], response['ETag'])
+
+    def test_content_addressed_files_are_immutable(self):
+        name = content_addressed_storage.save('photo.jpg', SimpleUploadedFile('photo.jpg', image_bytes()))
+        response = self.get(name)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['ETag'], '"%s"' % name.rsplit('/', 1)[1].split('.')[0])
+
+    def test_ranges(self):
+        response = self.get(self.legacy, range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+
+        self.assertEqual(b''.join(self.get(self.legacy, range='bytes=-3').streaming_content), b'789')
+        self.assertEqual(self.get(self.legacy, range='bytes=20-').status_code, 416)
+
+        # A stale If-Range gets the whole file
+        stale = self.get(self.legacy, range='bytes=2-5', if_range='"stale"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_sendfile_hands_off_to_proxy(self):
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected-media/'):
+            response = self.get(self.legacy)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.legacy}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+    def test_missing_and_outside_files(self):
+        self.assertEqual(self.get('travelkit_items/missing.jpg').status_code, 404)
+        self.assertEqual(self.get('../settings.py').status_code, 404)
+        self.assertEqual(self.get('travelkit_items').status_code, 404)
+
+
+class UploadNormalizationTests(TestCase):
+    """Test cases for validating and re-encoding uploads"""
+
+    def upload(self, data, name='upload.jpg'):
+        return SimpleUploadedFile(name, data, content_type='image/jpeg')
+
+    def test_oversized_dimensions_rejected(self):
+        for size in ((9000, 10), (7000, 7000)):
+            with self.assertRaisesMessage(ImageRejected, 'dimensions'):
+                normalize(self.upload(image_bytes(size, mode='1', format='PNG'), 'wide.png'))
+
+    def test_oversized_file_rejected(self):
+        with self.assertRaisesMessage(ImageRejected, '5MB'):
+            normalize(self.upload(b'\xff' * (5 * 1024 * 1024 + 1)))
+
+    def test_not_an_image_rejected(self):
+        with self.assertRaisesMessage(ImageRejected, 'valid image'):
+            normalize(self.upload(b'GIF89a but not really'))
+
+    def test_reencoded_upright_capped_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x8825] = {2: (27.0, 42.0, 0.0)}   # GPS position
+        result = normalize(self.upload(image_bytes((3000, 1000), exif=exif.tobytes()), 'holiday.jpeg'))
+        self.assertEqual(result.name, 'holiday.jpg')
+        with Image.open(result) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (853, MAX_SIDE))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_transparent_upload_becomes_webp(self):
+        result = normalize(self.upload(image_bytes((300, 300), 'RGBA', 'PNG'), 'logo.png'))
+        self.assertEqual(result.name, 'logo.webp')
+        with Image.open(result) as image:
+            self.assertEqual((image.format, image.mode), ('WEBP', 'RGBA'))
+
+    def test_serializer_field_normalizes_or_rejects(self):
+        field = NormalizedImageField()
+        result = field.run_validation(self.upload(image_bytes((3000, 1000)), 'big.png'))
+        self.assertEqual(result.name, 'big.jpg')
+        with Image.open(result) as image:
+            self.assertEqual(image.size, (MAX_SIDE, 853))
+
+        with self.assertRaises(ValidationError) as rejected:
+            field.run_validation(self.upload(image_bytes((9000, 10), mode='1', format='PNG'), 'wide.png'))
+        self.assertIn('dimensions', str(rejected.exception.detail))
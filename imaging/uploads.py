@@ -0,0 +1,93 @@
+"""
+Validation and normalization of uploaded images.
+
+An upload is checked in two steps. First only its header is read, so
+oversized dimensions and decompression bombs are rejected before any
+pixel is decoded. Then it is re-encoded on a small worker pool: turned
+upright, scaled down to MAX_SIDE, stripped of metadata and saved as JPEG
+(WebP when it has transparency) with a capped quality. The result is
+spooled to a temporary file, so storage writes it in chunks and a large
+upload never sits in request memory whole.
+"""
+
+import os
+import posixpath
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from PIL import Image, ImageOps
+
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+MAX_DIMENSION = 8000          # pixels on either side
+MAX_PIXELS = 40_000_000
+MAX_SIDE = 2560               # long side of the stored image
+QUALITY = 85
+ALLOWED_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+SPOOL_SIZE = 1024 * 1024      # re-encoded bytes kept in memory before spilling to disk
+
+# Decoding needs the full pixel buffer; a few at a time bounds the memory
+# all concurrent uploads can take
+_normalizers = ThreadPoolExecutor(
+    max_workers=int(os.getenv("IMAGE_UPLOAD_WORKERS", "2")), thread_name_prefix="normalize"
+)
+
+
+class ImageRejected(ValueError):
+    pass
+
+
+def inspect(upload):
+    """Read just the header: (format, (width, height)), or ImageRejected."""
+    if upload.size > MAX_UPLOAD_BYTES:
+        raise ImageRejected(f"Image size must not exceed {MAX_UPLOAD_BYTES // (1024 * 1024)}MB.")
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            format, size = image.format, image.size
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ImageRejected("Image dimensions are too large.")
+    except Exception:
+        raise ImageRejected("Upload a valid image.")
+    finally:
+        upload.seek(0)
+
+    if format not in ALLOWED_FORMATS:
+        raise ImageRejected(f"Unsupported image format {format}.")
+    width, height = size
+    if max(width, height) > MAX_DIMENSION or width * height > MAX_PIXELS:
+        raise ImageRejected(f"Image dimensions must not exceed {MAX_DIMENSION}px per side.")
+    return format, size
+
+
+def _reencode(upload, name):
+    upload.seek(0)
+    with Image.open(upload) as original:
+        # JPEGs can be decoded straight at a reduced scale
+        original.draft("RGB", (MAX_SIDE, MAX_SIDE))
+        image = ImageOps.exif_transpose(original)
+    image.thumbnail((MAX_SIDE, MAX_SIDE), Image.Resampling.LANCZOS)
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    if has_alpha:
+        image.convert("RGBA").save(out, format="WEBP", quality=QUALITY, method=4)
+        extension = "webp"
+    else:
+        image.convert("RGB").save(out, format="JPEG", quality=QUALITY, optimize=True, progressive=True)
+        extension = "jpg"
+    out.seek(0)
+
+    stem = posixpath.splitext(posixpath.basename(name))[0] or "image"
+    return File(out, name=f"{stem}.{extension}")
+
+
+def normalize(upload, timeout=30):
+    """Validate an uploaded image and return its normalized replacement file."""
+    inspect(upload)
+    try:
+        return _normalizers.submit(_reencode, upload, upload.name).result(timeout)
+    except TimeoutError:
+        raise ImageRejected("Image took too long to process.")
+    except Exception:
+        raise ImageRejected("Upload a valid image.")
@@ -0,0 +1,150 @@
+"""
+Serving of uploaded media (MEDIA_URL).
+
+With MEDIA_SENDFILE set, Django only resolves the file and checks the
+conditional headers; the front proxy sends the bytes:
+
+    MEDIA_SENDFILE=x-accel-redirect   nginx, an `internal` location at
+                                      MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT
+    MEDIA_SENDFILE=x-sendfile         Apache mod_xsendfile, lighttpd
+
+Otherwise the file is streamed with FileResponse, which answers Range
+requests. Either way responses carry a strong ETag and Last-Modified, so
+revalidation is a 304. Content-addressed files (cas/...) never change
+under their name and are cached for a year as immutable.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import ContentAddressedStorage
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"   # cache, but check the ETag before reuse
+
+_range = re.compile(r"^bytes=(\d*)-(\d*)$")
+_content_addressed = re.compile(rf"^{ContentAddressedStorage.prefix}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/([0-9a-f]{{64}})\.\w+$")
+
+
+class _FileRange:
+    """Reads only `length` bytes of an open file, from its current position."""
+
+    def __init__(self, file, length):
+        self.file, self.remaining = file, length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def etag_for(path, stat):
+    """The content hash for content-addressed names, else mtime and size."""
+    match = _content_addressed.match(path)
+    if match:
+        return f'"{match.group(1)}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def byte_range(request, size, etag, last_modified):
+    """
+    (start, end) of a satisfiable single Range, None to send the whole
+    file, or "unsatisfiable". Multiple ranges are answered in full.
+    """
+    header = request.headers.get("Range", "")
+    match = _range.match(header.replace(" ", ""))
+    if not match or not any(match.groups()):
+        return None
+
+    # If-Range: only a partial response of the same version
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(last_modified):
+        return None
+
+    first, last = match.groups()
+    if not first:   # last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+def set_headers(response, headers):
+    for name, value in headers.items():
+        response[name] = value
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404("File not found")
+    try:
+        stat = os.stat(fullpath)
+    except (OSError, ValueError):
+        raise Http404("File not found")
+    if not os.path.isfile(fullpath):
+        raise Http404("File not found")
+
+    path = path.replace(os.sep, "/")
+    etag = etag_for(path, stat)
+    last_modified = stat.st_mtime
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": IMMUTABLE if _content_addressed.match(path) else REVALIDATE,
+    }
+
+    # 304 Not Modified / 412 Precondition Failed
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is not None:
+        set_headers(response, headers)
+        return response
+
+    content_type = mimetypes.guess_type(fullpath)[0] or "application/octet-stream"
+    sendfile = getattr(settings, "MEDIA_SENDFILE", "")
+    if sendfile:
+        response = HttpResponse(content_type=content_type)
+        if sendfile == "x-accel-redirect":
+            response["X-Accel-Redirect"] = quote(getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/") + path)
+        else:
+            response["X-Sendfile"] = fullpath
+        set_headers(response, headers)
+        return response
+
+    requested = byte_range(request, stat.st_size, etag, last_modified)
+    if requested == "unsatisfiable":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    file = open(fullpath, "rb")
+    if requested is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = requested
+        file.seek(start)
+        response = FileResponse(_FileRange(file, end - start + 1), status=206, content_type=content_type)
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    response["Accept-Ranges"] = "bytes"
+    set_headers(response, headers)
+    return response
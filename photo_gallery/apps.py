@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PhotoGalleryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'photo_gallery'
+
+    def ready(self):
+        from . import signals  # noqa: F401
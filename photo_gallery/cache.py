@@ -0,0 +1,116 @@
+"""
+Response cache of the public photo feeds for anonymous visitors.
+
+Signed-in users get per-user fields (is_liked), so only anonymous
+requests are cached. An entry is keyed by the feed, its query string and
+the site it was served on, plus a generation counter that every change
+to a photo or a like bumps after commit (see signals.py). Bumping makes
+every fresh entry unreachable at once, without deleting anything.
+
+Each response is also kept, for STALE_SECONDS, under a key without the
+generation. A request that misses the fresh entry is answered from that
+copy while one background thread renders the feed again (single flight:
+the first request to take the lock starts it). Visitors only wait when
+there is no copy at all.
+
+The cache is the `photo_feeds` alias of CACHES, chosen with the
+PHOTO_FEED_CACHE setting: local memory per process, or a directory
+shared by the workers of a host so a bump reaches all of them.
+"""
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.test import RequestFactory
+from rest_framework.response import Response
+
+CACHE_ALIAS = 'photo_feeds'
+FRESH_SECONDS = int(os.getenv('PHOTO_FEED_FRESH_SECONDS', '30'))
+STALE_SECONDS = int(os.getenv('PHOTO_FEED_STALE_SECONDS', '600'))
+LOCK_SECONDS = 30   # a revalidation that takes longer can be started again
+
+GENERATION_KEY = 'photo_gallery:feed-generation'
+
+_revalidations = ThreadPoolExecutor(max_workers=2, thread_name_prefix='feed-cache')
+
+
+def feed_cache():
+    return caches[CACHE_ALIAS]
+
+
+def generation():
+    cache = feed_cache()
+    current = cache.get(GENERATION_KEY)
+    if current is None:
+        # Start from the clock, not 1, so an evicted counter can't come back
+        # to a generation that already has entries
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        current = cache.get(GENERATION_KEY)
+    return current
+
+
+def bump_generation():
+    """Make every cached feed stale. Called after commit by signals.py."""
+    cache = feed_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:   # not set yet, or evicted
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def request_digest(request, action):
+    query = sorted(request.query_params.lists())
+    key = f"{request.scheme}://{request.get_host()}|{action}|{query}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _revalidate(viewset, action, url, host, secure, lock_key):
+    try:
+        request = RequestFactory().get(url, HTTP_HOST=host, secure=secure)
+        request.revalidating_feed = True
+        viewset.as_view({'get': action})(request)
+    except Exception as e:
+        # The stale copy keeps being served; the next miss tries again
+        print(f"[FEED CACHE] Revalidating {url} failed: {e}")
+    finally:
+        feed_cache().delete(lock_key)
+        close_old_connections()
+
+
+def cached_feed(method):
+    """Cache a PublicPhotoViewSet action's anonymous responses."""
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return method(self, request, *args, **kwargs)
+
+        cache = feed_cache()
+        digest = request_digest(request, self.action)
+        fresh_key = f'photo_gallery:feed:{generation()}:{digest}'
+        stale_key = f'photo_gallery:feed-stale:{digest}'
+
+        if not getattr(request._request, 'revalidating_feed', False):
+            entries = cache.get_many([fresh_key, stale_key])
+            if fresh_key in entries:
+                return Response(entries[fresh_key], headers={'X-Cache': 'HIT'})
+            if stale_key in entries:
+                lock_key = f'photo_gallery:feed-lock:{digest}'
+                if cache.add(lock_key, 1, LOCK_SECONDS):
+                    _revalidations.submit(
+                        _revalidate, type(self), self.action, request.get_full_path(),
+                        request.get_host(), request.is_secure(), lock_key
+                    )
+                return Response(entries[stale_key], headers={'X-Cache': 'STALE'})
+
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(fresh_key, response.data, FRESH_SECONDS)
+            cache.set(stale_key, response.data, STALE_SECONDS)
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
@@ -0,0 +1,111 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from photo_gallery.models import PhotoGallery
+from photo_gallery import trending
+from photo_gallery.pagination import KeysetPagination, MOST_LIKED_FIRST, NEWEST_FIRST, TRENDING_FIRST
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the public feed queries at page 1 and a deep page, OFFSET "
+        "slicing against keyset pagination. Runs on generated photos inside "
+        "a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--photos", type=int, default=1_000_000, help="Photos to generate (default: 1000000)")
+        parser.add_argument("--page", type=int, default=500, help="Deep page to time (default: 500)")
+        parser.add_argument("--limit", type=int, default=12, help="Page size (default: 12)")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query (default: 5)")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.generate(options["photos"])
+                feeds = (("newest", NEWEST_FIRST), ("trending", TRENDING_FIRST), ("popular", MOST_LIKED_FIRST))
+                for name, ordering in feeds:
+                    self.bench(name, ordering, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def generate(self, count):
+        user = User.objects.create_user(email="feed-bench@example.invalid", password=None)
+        now = timezone.now()
+        started = time.perf_counter()
+
+        # Spread the upload dates over a year instead of stamping them all now
+        uploaded_at = PhotoGallery._meta.get_field("uploaded_at")
+        uploaded_at.auto_now_add = False
+        try:
+            batch = []
+            for i in range(count):
+                uploaded = now - timedelta(seconds=random.randrange(365 * 86400))
+                likes = int(random.paretovariate(1.5)) - 1
+                batch.append(PhotoGallery(
+                    user=user,
+                    image=f"bench/{i}.jpg",
+                    location=random.choice(PhotoGallery.LOCATION_CHOICES)[0],
+                    is_public=random.random() < 0.9,
+                    like_count=likes,
+                    # As if the likes came within a day of the upload
+                    trending_score=trending.score(uploaded, [uploaded + timedelta(hours=random.random() * 24) for _ in range(likes)]),
+                    uploaded_at=uploaded,
+                ))
+                if len(batch) == 10_000:
+                    PhotoGallery.objects.bulk_create(batch)
+                    batch = []
+            PhotoGallery.objects.bulk_create(batch)
+        finally:
+            uploaded_at.auto_now_add = True
+        self.stdout.write(f"Generated {count} photos in {time.perf_counter() - started:.1f}s")
+
+    def time(self, run, repeat):
+        run()   # warm the page cache
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def bench(self, name, ordering, options):
+        queryset = PhotoGallery.objects.filter(is_public=True).select_related("user")
+        limit, deep = options["limit"], options["page"]
+        factory = RequestFactory()
+
+        # Cursor for the deep page: the last row of the page before it
+        before = queryset.order_by(*ordering)[(deep - 1) * limit - 1]
+        deep_cursor = KeysetPagination(ordering).encode_cursor(before)
+
+        for page, cursor in ((1, None), (deep, deep_cursor)):
+            start = (page - 1) * limit
+
+            def offset():
+                list(queryset.order_by(*ordering)[start:start + limit])
+                queryset.count()
+
+            def keyset():
+                params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+                KeysetPagination(ordering).paginate_queryset(queryset, Request(factory.get("/", params)))
+
+            self.stdout.write(
+                f"{name} page {page}: offset + count {self.time(offset, options['repeat']):.1f} ms, "
+                f"keyset {self.time(keyset, options['repeat']):.1f} ms"
+            )
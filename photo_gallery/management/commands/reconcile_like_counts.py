@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from photo_gallery.models import PhotoGallery, PhotoLike
+
+
+def actual_like_count():
+    likes = PhotoLike.objects.filter(photo=OuterRef('pk')).order_by().values('photo')
+    return Coalesce(Subquery(likes.annotate(total=Count('pk')).values('total')), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Repair PhotoGallery.like_count where it has drifted from the PhotoLike rows "
+        "(bulk imports, manual SQL). Walks the photos in primary key chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Photos per chunk (default: 1000)")
+        parser.add_argument("--dry-run", action="store_true", help="Only report drifted photos")
+
+    def handle(self, *args, **options):
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            ids = list(
+                PhotoGallery.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:options["chunk_size"]]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+            checked += len(ids)
+
+            wrong = list(
+                PhotoGallery.objects.filter(pk__in=ids)
+                .annotate(actual=actual_like_count())
+                .exclude(like_count=F('actual'))
+                .values_list('pk', 'like_count', 'actual')
+            )
+            for pk, stored, actual in wrong:
+                self.stdout.write(f"photo {pk}: like_count {stored}, actual {actual}")
+            if wrong and not options["dry_run"]:
+                # Recount in the UPDATE itself so likes since the check are included
+                PhotoGallery.objects.filter(pk__in=[pk for pk, _, _ in wrong]).update(like_count=actual_like_count())
+            drifted += len(wrong)
+
+        verb = "found" if options["dry_run"] else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} photos, {verb} {drifted}"))
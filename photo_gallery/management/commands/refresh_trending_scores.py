@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from photo_gallery import trending
+from photo_gallery.models import PhotoGallery, PhotoLike
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute PhotoGallery.trending_score from the photos' likes. Scores "
+        "don't decay in storage, so this is only needed after changing "
+        "TRENDING_HALF_LIFE_HOURS, bulk imports or manual SQL. Walks the "
+        "photos in primary key chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Photos per chunk (default: 1000)")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=1e-6,
+            help="Scores closer than this to the recomputed one are left alone (default: 1e-6)",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report photos with a stale score")
+
+    def handle(self, *args, **options):
+        checked = stale = 0
+        last_pk = 0
+        while True:
+            photos = list(
+                PhotoGallery.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'uploaded_at', 'trending_score')[:options["chunk_size"]]
+            )
+            if not photos:
+                break
+            last_pk = photos[-1][0]
+            checked += len(photos)
+
+            liked_at = defaultdict(list)
+            likes = PhotoLike.objects.filter(photo_id__in=[pk for pk, _, _ in photos]).values_list('photo_id', 'created_at')
+            for photo_id, created_at in likes:
+                liked_at[photo_id].append(created_at)
+
+            changed = []
+            for pk, uploaded_at, stored in photos:
+                actual = trending.score(uploaded_at, liked_at[pk])
+                if abs(actual - stored) > options["tolerance"]:
+                    changed.append(PhotoGallery(pk=pk, trending_score=actual))
+            if changed and not options["dry_run"]:
+                PhotoGallery.objects.bulk_update(changed, ['trending_score'])
+            stale += len(changed)
+
+        verb = "found" if options["dry_run"] else "refreshed"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} photos, {verb} {stale}"))
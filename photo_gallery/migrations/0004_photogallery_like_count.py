@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:30
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_counts(apps, schema_editor):
+    PhotoGallery = apps.get_model('photo_gallery', 'PhotoGallery')
+    PhotoLike = apps.get_model('photo_gallery', 'PhotoLike')
+    likes = PhotoLike.objects.filter(photo=models.OuterRef('pk')).order_by().values('photo')
+    PhotoGallery.objects.update(
+        like_count=Coalesce(models.Subquery(likes.annotate(total=models.Count('pk')).values('total')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photo_gallery', '0003_alter_favoritelocation_location'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photogallery',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_like_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='photogallery',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-like_count', '-uploaded_at'], name='photo_public_popular_idx'),
+        ),
+    ]
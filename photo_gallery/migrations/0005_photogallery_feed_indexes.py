@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photo_gallery', '0004_photogallery_like_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='photogallery',
+            name='photo_public_popular_idx',
+        ),
+        migrations.AddIndex(
+            model_name='photogallery',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-like_count', '-uploaded_at', '-id'], name='photo_public_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photogallery',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-uploaded_at', '-id'], name='photo_public_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photogallery',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['location', '-uploaded_at', '-id'], name='photo_public_location_idx'),
+        ),
+    ]
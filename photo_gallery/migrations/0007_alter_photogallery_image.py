@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:59
+
+import django.core.validators
+import imaging.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photo_gallery', '0006_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='photogallery',
+            name='image',
+            field=models.ImageField(storage=imaging.storage.media_storage, upload_to='travelkit_items/%Y/%m/%d/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'gif', 'webp'])]),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:06
+
+import math
+import os
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+# The formula of photo_gallery/trending.py as of this migration, inlined so
+# later changes to that module can't change what this migration does
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+TAU = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "12")) * 3600 / math.log(2)
+BATCH_SIZE = 1000
+
+
+def score(uploaded_at, liked_at):
+    moments = [(t - EPOCH).total_seconds() / TAU for t in [uploaded_at, *liked_at]]
+    top = max(moments)
+    return top + math.log(sum(math.exp(m - top) for m in moments))
+
+
+def backfill_trending_scores(apps, schema_editor):
+    PhotoGallery = apps.get_model('photo_gallery', 'PhotoGallery')
+    PhotoLike = apps.get_model('photo_gallery', 'PhotoLike')
+    photos = PhotoGallery.objects.order_by('pk').only('pk', 'uploaded_at')
+    last_pk = 0
+    # One batch of photos and their likes in memory at a time; batches are
+    # fetched by pk, not from an open cursor over the table being updated
+    while batch := list(photos.filter(pk__gt=last_pk)[:BATCH_SIZE]):
+        last_pk = batch[-1].pk
+        liked_at = {}
+        likes = PhotoLike.objects.filter(photo_id__in=[photo.pk for photo in batch])
+        for photo_id, created_at in likes.values_list('photo_id', 'created_at').iterator():
+            liked_at.setdefault(photo_id, []).append(created_at)
+        for photo in batch:
+            photo.trending_score = score(photo.uploaded_at, liked_at.get(photo.pk, ()))
+        PhotoGallery.objects.bulk_update(batch, ['trending_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photo_gallery', '0007_alter_photogallery_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photogallery',
+            name='trending_score',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.RunPython(backfill_trending_scores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='photogallery',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-trending_score', '-id'], name='photo_public_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photogallery',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['location', '-trending_score', '-id'], name='photo_public_loc_trending_idx'),
+        ),
+    ]
@@ -1,6 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
+from imaging.storage import media_storage
+
+from . import trending
 
 User = get_user_model()
 
@@ -52,13 +56,22 @@ class PhotoGallery(models.Model):
 
     image = models.ImageField(
         upload_to='travelkit_items/%Y/%m/%d/',
+        storage=media_storage,
         validators=[FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'gif', 'webp'])]
     )
+    # Filled in by the imaging app after upload (see imaging/derivatives.py)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     location = models.CharField(max_length=50, choices=LOCATION_CHOICES, default='Other')
     title = models.CharField(max_length=200, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     is_public = models.BooleanField(default=True, help_text="If True, photo is visible to all users. If False, only you can see it.")
+    # Kept in step with PhotoLike by signals.py; reconcile_like_counts repairs drift
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    # Decayed likes for the trending feed (see trending.py); kept by signals.py
+    trending_score = models.FloatField(default=0.0, editable=False)
 
     uploaded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -67,10 +80,45 @@ class PhotoGallery(models.Model):
         ordering = ['-uploaded_at']
         verbose_name = 'Photo Gallery'
         verbose_name_plural = 'Photo Galleries'
+        indexes = [
+            # The public feeds (see pagination.py). Partial on is_public, since a
+            # leading boolean column can't supply the sort order
+            models.Index(
+                fields=['-like_count', '-uploaded_at', '-id'],
+                condition=models.Q(is_public=True),
+                name='photo_public_popular_idx'
+            ),
+            models.Index(
+                fields=['-uploaded_at', '-id'],
+                condition=models.Q(is_public=True),
+                name='photo_public_newest_idx'
+            ),
+            models.Index(
+                fields=['location', '-uploaded_at', '-id'],
+                condition=models.Q(is_public=True),
+                name='photo_public_location_idx'
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                condition=models.Q(is_public=True),
+                name='photo_public_trending_idx'
+            ),
+            models.Index(
+                fields=['location', '-trending_score', '-id'],
+                condition=models.Q(is_public=True),
+                name='photo_public_loc_trending_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.email}'s photo - {self.location}"
 
+    def save(self, *args, **kwargs):
+        # A new photo starts with the score of its upload alone
+        if self._state.adding and not self.trending_score:
+            self.trending_score = trending.score(self.uploaded_at or timezone.now())
+        super().save(*args, **kwargs)
+
     @property
     def get_image_url(self):
         if self.image:
@@ -88,6 +136,18 @@ class PhotoGallery(models.Model):
             return False
         return self.likes.filter(user=user).exists()
 
+    def toggle_like(self, user):
+        """
+        Like the photo for the user, or remove their like. The like row and
+        like_count change in one transaction. Returns (is_liked, like_count).
+        """
+        with transaction.atomic():
+            deleted, _ = self.likes.filter(user=user).delete()
+            if not deleted:
+                PhotoLike.objects.create(photo=self, user=user)
+        self.refresh_from_db(fields=['like_count'])
+        return not deleted, self.like_count
+
 
 class PhotoLike(models.Model):
     """
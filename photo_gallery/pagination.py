@@ -0,0 +1,116 @@
+import hashlib
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+# Feed orderings. Each ends in the primary key so every row has a unique
+# position, and each has a matching index (see PhotoGallery.Meta.indexes).
+NEWEST_FIRST = ('-uploaded_at', '-id')
+MOST_LIKED_FIRST = ('-like_count', '-uploaded_at', '-id')
+TRENDING_FIRST = ('-trending_score', '-id')
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks past the last row of the previous page
+    ("WHERE (like_count, uploaded_at, id) < (...)") instead of skipping
+    rows with OFFSET, so page 500 costs the same as page 1.
+
+    GET ...?limit=12                   first page
+    GET ...?cursor=<next>&limit=12     following pages
+    GET ...?count=true                 also return the total, cached for a minute
+
+    The cursor is signed and names its ordering, so it can't be edited or
+    replayed against another feed.
+    """
+    default_limit = 12
+    max_limit = 100
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    count_query_param = 'count'
+    count_cache_seconds = 60
+    salt = 'photo_gallery.keyset'
+
+    def __init__(self, ordering=NEWEST_FIRST):
+        self.ordering = tuple(ordering)
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = signing.loads(token, salt=self.salt)
+        except signing.BadSignature:
+            raise NotFound('Invalid cursor')
+        if payload.get('o') != list(self.ordering):
+            raise NotFound('Invalid cursor')
+        return [
+            model._meta.get_field(name.lstrip('-')).to_python(value)
+            for name, value in zip(self.ordering, payload['p'])
+        ]
+
+    def encode_cursor(self, obj):
+        position = [
+            obj._meta.get_field(name.lstrip('-')).value_to_string(obj)
+            for name in self.ordering
+        ]
+        return signing.dumps({'o': list(self.ordering), 'p': position}, salt=self.salt)
+
+    def after(self, position):
+        """Rows that sort after the given position in this ordering."""
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+
+        # Redundant bound on the leading column, so the planner seeks the
+        # index to it rather than scanning the ORs
+        first, value = self.ordering[0], position[0]
+        return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": value}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        self.count = self.get_count(queryset) if self.wants_count(request) else None
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        # One extra row tells whether there is a next page
+        page = list(queryset[:self.limit + 1])
+        self.next_cursor = self.encode_cursor(page[self.limit - 1]) if len(page) > self.limit else None
+        return page[:self.limit]
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def get_count(self, queryset):
+        """Total rows in the feed, at most count_cache_seconds old."""
+        key = 'photo_gallery:count:' + hashlib.md5(str(queryset.order_by().query).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_seconds)
+        return count
+
+    def get_paginated_response(self, data, **extra):
+        body = {'status': 'success'}
+        if self.count is not None:
+            body['count'] = self.count
+        body.update({'limit': self.limit, 'next': self.next_cursor, **extra, 'data': data})
+        return Response(body)
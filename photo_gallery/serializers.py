@@ -1,6 +1,35 @@
+from django.db import models
 from rest_framework import serializers
+from imaging.serializers import NormalizedImageField, SrcsetField
 from .models import PhotoGallery, PhotoLike, FavoriteLocation
 
+
+class PhotoGalleryListSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of photos with a constant number of queries.
+    The viewer's likes for the whole page are fetched in one query and
+    kept in the context, where PhotoGallerySerializer.get_is_liked reads them.
+    """
+
+    def to_representation(self, data):
+        photos = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.load_liked_ids(photos)
+        return super().to_representation(photos)
+
+    def load_liked_ids(self, photos):
+        request = self.context.get('request')
+        if not (request and request.user and request.user.is_authenticated):
+            return
+        checked = self.context.setdefault('liked_checked_ids', set())
+        liked = self.context.setdefault('liked_photo_ids', set())
+        pending = {photo.pk for photo in photos} - checked
+        if pending:
+            liked.update(PhotoLike.objects.filter(
+                user=request.user, photo_id__in=pending
+            ).values_list('photo_id', flat=True))
+            checked.update(pending)
+
+
 class PhotoGallerySerializer(serializers.ModelSerializer):
     """
     Serializer for photogallery model. 
@@ -12,14 +41,17 @@ class PhotoGallerySerializer(serializers.ModelSerializer):
     user_email = serializers.CharField(source='user.email', read_only=True)
     uploaded_by = serializers.SerializerMethodField()
     uploaded_by_id = serializers.SerializerMethodField()
+    image = NormalizedImageField()
     image_url = serializers.SerializerMethodField()
+    image_srcset = SrcsetField('image')
     likes_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     
     class Meta:
         model = PhotoGallery
-        fields = ['id', 'user_email', 'uploaded_by', 'uploaded_by_id', 'image', 'image_url', 'location', 'title', 'description', 'is_public', 'likes_count', 'is_liked', 'uploaded_at']
-        read_only_fields = ['id', 'user_email', 'uploaded_by', 'uploaded_by_id', 'likes_count', 'is_liked', 'uploaded_at']
+        fields = ['id', 'user_email', 'uploaded_by', 'uploaded_by_id', 'image', 'image_url', 'image_width', 'image_height', 'image_srcset', 'location', 'title', 'description', 'is_public', 'likes_count', 'is_liked', 'uploaded_at']
+        read_only_fields = ['id', 'user_email', 'uploaded_by', 'uploaded_by_id', 'image_width', 'image_height', 'likes_count', 'is_liked', 'uploaded_at']
+        list_serializer_class = PhotoGalleryListSerializer
 
     def get_uploaded_by_id(self, obj):  # 👈 add this method
         """Get uploader's user ID"""
@@ -46,24 +78,17 @@ class PhotoGallerySerializer(serializers.ModelSerializer):
 
     def get_likes_count(self, obj):
         """Get total likes count for this photo"""
-        return obj.likes_count
+        return obj.like_count
 
     def get_is_liked(self, obj):
         """Check if current user has liked this photo"""
         request = self.context.get('request')
         if request and request.user and request.user.is_authenticated:
+            if obj.pk in self.context.get('liked_checked_ids', ()):
+                return obj.pk in self.context['liked_photo_ids']
             return obj.is_liked_by(request.user)
         return False
 
-    def validate_image(self, value):
-        """
-        Validate image file size (max 5MB)
-        """
-        max_size = 5 * 1024 * 1024  # 5MB
-        if value.size > max_size:
-            raise serializers.ValidationError("Image size must not exceed 5MB.")
-        return value
-
 
 class PhotoLikeSerializer(serializers.ModelSerializer):
     """Serializer for PhotoLike model"""
@@ -0,0 +1,71 @@
+import threading
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import trending
+from .cache import bump_generation
+from .models import PhotoGallery, PhotoLike
+
+# Photos whose delete is running on this thread. Their likes go first in
+# the cascade, and rescoring the photo after each of them would cost
+# O(likes²) for nothing.
+_deleting = threading.local()
+
+
+def _photos_being_deleted():
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def recompute_trending_score(photo_id):
+    """Score the photo from its remaining likes (a like can't be subtracted exactly)."""
+    with transaction.atomic():
+        uploaded_at = (
+            PhotoGallery.objects.select_for_update().filter(pk=photo_id)
+            .values_list('uploaded_at', flat=True).first()
+        )
+        if uploaded_at is None:
+            return
+        liked_at = PhotoLike.objects.filter(photo_id=photo_id).values_list('created_at', flat=True)
+        PhotoGallery.objects.filter(pk=photo_id).update(trending_score=trending.score(uploaded_at, liked_at))
+
+
+@receiver(post_save, sender=PhotoLike)
+def like_added(sender, instance, created, **kwargs):
+    if created:
+        PhotoGallery.objects.filter(pk=instance.photo_id).update(
+            like_count=F('like_count') + 1,
+            trending_score=trending.add_like(instance.created_at),
+        )
+        transaction.on_commit(bump_generation)
+
+
+@receiver(post_delete, sender=PhotoLike)
+def like_removed(sender, instance, **kwargs):
+    if instance.photo_id in _photos_being_deleted():
+        return
+    PhotoGallery.objects.filter(pk=instance.photo_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+    recompute_trending_score(instance.photo_id)
+    transaction.on_commit(bump_generation)
+
+
+@receiver(pre_delete, sender=PhotoGallery)
+def photo_deleting(sender, instance, **kwargs):
+    _photos_being_deleted().add(instance.pk)
+
+
+@receiver(post_delete, sender=PhotoGallery)
+def photo_deleted(sender, instance, **kwargs):
+    _photos_being_deleted().discard(instance.pk)
+
+
+@receiver(post_save, sender=PhotoGallery)
+@receiver(post_delete, sender=PhotoGallery)
+def photo_changed(sender, instance, **kwargs):
+    # Uploads, edits, visibility changes, new renditions and deletes all
+    # show in the public feeds
+    transaction.on_commit(bump_generation)
@@ -3,18 +3,50 @@ Test cases for Photo Gallery API
 Run with: python manage.py test photo_gallery.tests.PhotoGalleryTests
 """
 
-from django.test import TestCase, Client
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
 from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from PIL import Image
 from io import BytesIO
+from . import trending
+from .cache import feed_cache
 from .models import PhotoGallery, PhotoLike, FavoriteLocation
 
 User = get_user_model()
 
+# Uploads go to a scratch directory, not the project's media/
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix='photo_gallery_tests_')
 
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+def create_photo(user, location='Pokhara', title=None):
+    """Upload a small JPEG as a public photo"""
+    image = Image.new('RGB', (10, 10), color='green')
+    image_io = BytesIO()
+    image.save(image_io, format='JPEG')
+    return PhotoGallery.objects.create(
+        user=user,
+        image=SimpleUploadedFile('test_image.jpg', image_io.getvalue(), content_type='image/jpeg'),
+        location=location,
+        title=title
+    )
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class PhotoGalleryModelTests(TestCase):
     """Test cases for PhotoGallery model"""
 
@@ -87,6 +119,7 @@ class PhotoGalleryModelTests(TestCase):
         self.assertTrue(photo.is_liked_by(self.user))
 
 
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class UserPhotoGalleryAPITests(APITestCase):
     """Test cases for user-specific photo gallery endpoint"""
 
@@ -246,6 +279,7 @@ class UserPhotoGalleryAPITests(APITestCase):
         self.assertIn('uploaded_at', photo)
 
 
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class PhotoUploadTests(APITestCase):
     """Test cases for photo upload"""
 
@@ -281,6 +315,30 @@ class PhotoUploadTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(PhotoGallery.objects.count(), 1)
 
+    def test_upload_photo_is_normalized(self):
+        """Test that uploads are stored re-encoded and size-capped"""
+        data = {
+            'image': self.create_test_image(size=(4000, 3000)),
+            'location': 'Kathmandu'
+        }
+        response = self.client.post('/api/photos/', data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        photo = PhotoGallery.objects.get()
+        self.assertTrue(photo.image.name.endswith('.jpg'))
+        self.assertEqual((photo.image.width, photo.image.height), (2560, 1920))
+
+    def test_upload_oversized_dimensions_rejected(self):
+        """Test that enormous images are refused"""
+        image_io = BytesIO()
+        Image.new('1', (12000, 100)).save(image_io, format='PNG')
+        data = {
+            'image': SimpleUploadedFile('wide.png', image_io.getvalue(), content_type='image/png'),
+            'location': 'Kathmandu'
+        }
+        response = self.client.post('/api/photos/', data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.json())
+
     def test_upload_photo_without_auth(self):
         """Test that upload requires authentication"""
         self.client.force_authenticate(user=None)
@@ -292,6 +350,7 @@ class PhotoUploadTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class PhotoDeleteTests(APITestCase):
     """Test cases for photo deletion"""
 
@@ -366,4 +425,355 @@ class FavoriteLocationTests(APITestCase):
         FavoriteLocation.objects.create(user=self.user, location='Kathmandu')
         response = self.client.get('/api/favorite-locations/check/?location=Kathmandu')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(response.json()['is_favorited'])
\ No newline at end of file
+        self.assertTrue(response.json()['is_favorited'])
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'photo_feeds': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+})
+class PhotoGalleryQueryBudgetTests(APITestCase):
+    """Gallery endpoints must use a constant number of queries per page"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.viewer = User.objects.create_user(
+            email='viewer@example.com',
+            password='testpass123'
+        )
+        self.fans = [
+            User.objects.create_user(email=f'fan{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+        self.add_photos(6)
+
+    def add_photos(self, count):
+        """Add photos across two locations, liked by some of the fans and the viewer"""
+        start = PhotoGallery.objects.count()
+        for i in range(start, start + count):
+            photo = create_photo(self.viewer, 'Kathmandu' if i % 2 else 'Pokhara', f'Photo {i}')
+            for fan in self.fans[:i % 4]:
+                PhotoLike.objects.create(photo=photo, user=fan)
+            if i % 3 == 0:
+                PhotoLike.objects.create(photo=photo, user=self.viewer)
+
+    def assert_budget(self, url, budget, authenticated=True):
+        """Check the query budget, and that it still holds with twice the photos"""
+        if authenticated:
+            self.client.force_authenticate(user=self.viewer)
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.add_photos(6)
+        with self.assertNumQueries(budget):
+            self.client.get(url)
+        return response
+
+    def test_own_photos_list(self):
+        response = self.assert_budget('/api/photos/', 3)
+        for photo in response.json()['data']:
+            stored = PhotoGallery.objects.get(pk=photo['id'])
+            self.assertEqual(photo['likes_count'], stored.likes_count)
+            self.assertEqual(photo['is_liked'], stored.is_liked_by(self.viewer))
+
+    def test_own_photos_grouped(self):
+        response = self.assert_budget('/api/photos/grouped/', 3)
+        photos = [p for group in response.json()['data'] for p in group['photos']]
+        self.assertEqual(len(photos), 6)
+        self.assertEqual(sum(p['is_liked'] for p in photos), 2)
+
+    def test_own_photos_by_location(self):
+        self.assert_budget('/api/photos/by_location/?location=Kathmandu', 3)
+
+    def test_own_photo_detail(self):
+        photo = PhotoGallery.objects.first()
+        response = self.assert_budget(f'/api/photos/{photo.id}/', 2)
+        self.assertEqual(response.json()['likes_count'], photo.likes_count)
+
+    def test_public_popular(self):
+        response = self.assert_budget('/api/photos/public/popular/', 2)
+        counts = [p['likes_count'] for p in response.json()['data']]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_public_popular_anonymous(self):
+        response = self.assert_budget('/api/photos/public/popular/', 1, authenticated=False)
+        self.assertFalse(any(p['is_liked'] for p in response.json()['data']))
+
+    def test_public_trending(self):
+        self.assert_budget('/api/photos/public/trending/?location=Pokhara', 2)
+
+    def test_public_by_location(self):
+        self.assert_budget('/api/photos/public/by_location/?location=Kathmandu', 2)
+
+    def test_public_grouped(self):
+        self.assert_budget('/api/photos/public/grouped/', 3)
+
+    def test_public_grouped_previews_newest_six(self):
+        """Each location shows its six newest photos and its full count"""
+        self.add_photos(10)
+        newest = list(PhotoGallery.objects.filter(location='Kathmandu').order_by('-uploaded_at', '-id')[:6])
+        response = self.assert_budget('/api/photos/public/grouped/', 2, authenticated=False)
+        groups = {g['location']: g for g in response.json()['data']}
+        self.assertEqual(list(groups), ['Kathmandu', 'Pokhara'])
+        self.assertEqual(groups['Kathmandu']['count'], 8)
+        self.assertEqual([p['id'] for p in groups['Kathmandu']['photos']], [p.id for p in newest])
+        self.assertEqual(response.json()['total_photos'], 16)
+
+    def test_user_photo_gallery(self):
+        self.assert_budget(f'/api/photo-gallery/{self.viewer.id}/', 5)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class LikeCountTests(APITestCase):
+    """Test cases for the denormalized like counter"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.fan = User.objects.create_user(
+            email='fan@example.com',
+            password='testpass123'
+        )
+        self.photo = create_photo(self.owner, 'Kathmandu')
+
+    def test_likes_update_counter(self):
+        """Adding and removing likes keeps like_count in step"""
+        like = PhotoLike.objects.create(photo=self.photo, user=self.fan)
+        PhotoLike.objects.create(photo=self.photo, user=self.owner)
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.like_count, 2)
+
+        like.delete()
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.like_count, 1)
+
+    def test_like_endpoint_toggles_counter(self):
+        """The like endpoint returns the stored count"""
+        self.client.force_authenticate(user=self.fan)
+        response = self.client.post(f'/api/photos/public/{self.photo.id}/like/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['is_liked'])
+        self.assertEqual(response.json()['likes_count'], 1)
+
+        response = self.client.post(f'/api/photos/public/{self.photo.id}/like/')
+        self.assertFalse(response.json()['is_liked'])
+        self.assertEqual(response.json()['likes_count'], 0)
+
+    def test_reconcile_repairs_drift(self):
+        """reconcile_like_counts resets drifted counters"""
+        PhotoLike.objects.create(photo=self.photo, user=self.fan)
+        PhotoGallery.objects.filter(pk=self.photo.pk).update(like_count=7)
+
+        out = StringIO()
+        call_command('reconcile_like_counts', '--dry-run', stdout=out)
+        self.assertIn('found 1', out.getvalue())
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.like_count, 7)
+
+        call_command('reconcile_like_counts', '--chunk-size', '1', stdout=StringIO())
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.like_count, 1)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class KeysetPaginationTests(APITestCase):
+    """Test cases for cursor pagination of the public feeds"""
+
+    def setUp(self):
+        cache.clear()
+        feed_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='feed@example.com',
+            password='testpass123'
+        )
+        for i in range(11):
+            create_photo(self.user, 'Pokhara' if i % 2 else 'Kathmandu', f'Photo {i}')
+        # Ties on like_count, so pages must break them by upload date and id
+        PhotoGallery.objects.filter(title__in=['Photo 3', 'Photo 4', 'Photo 7']).update(like_count=5)
+
+    def walk(self, url, **params):
+        """Follow the next cursors to the end of a feed"""
+        ids, cursor = [], None
+        while True:
+            response = self.client.get(url, {'limit': 4, **params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [p['id'] for p in response.json()['data']]
+            cursor = response.json()['next']
+            if cursor is None:
+                return ids
+
+    def test_popular_pages_cover_feed_in_order(self):
+        ids = self.walk('/api/photos/public/popular/')
+        expected = PhotoGallery.objects.order_by('-like_count', '-uploaded_at', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_trending_pages_cover_location(self):
+        ids = self.walk('/api/photos/public/trending/', location='Pokhara')
+        expected = PhotoGallery.objects.filter(location='Pokhara').order_by('-trending_score', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_count_is_optional(self):
+        response = self.client.get('/api/photos/public/by_location/', {'location': 'Kathmandu'})
+        self.assertNotIn('count', response.json())
+        response = self.client.get('/api/photos/public/by_location/', {'location': 'Kathmandu', 'count': 'true'})
+        self.assertEqual(response.json()['count'], 6)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/photos/public/trending/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_belongs_to_its_feed(self):
+        cursor = self.client.get('/api/photos/public/popular/', {'limit': 2}).json()['next']
+        response = self.client.get('/api/photos/public/trending/', {'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class TrendingScoreTests(APITestCase):
+    """Test cases for the stored trending score"""
+
+    def setUp(self):
+        feed_cache().clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='owner@example.com', password='testpass123')
+        self.fans = [
+            User.objects.create_user(email=f'fan{i}@example.com', password='testpass123')
+            for i in range(20)
+        ]
+        self.photos = [create_photo(self.owner, title=f'Photo {i}') for i in range(2)]
+
+    def expected_score(self, photo):
+        liked_at = photo.likes.values_list('created_at', flat=True)
+        return trending.score(photo.uploaded_at, liked_at)
+
+    def test_new_photo_scored_by_upload(self):
+        older, newer = self.photos
+        self.assertAlmostEqual(older.trending_score, self.expected_score(older), places=6)
+        self.assertGreater(newer.trending_score, older.trending_score)
+
+    def test_likes_update_score(self):
+        photo = self.photos[0]
+        likes = [PhotoLike.objects.create(photo=photo, user=fan) for fan in self.fans[:3]]
+        photo.refresh_from_db()
+        self.assertAlmostEqual(photo.trending_score, self.expected_score(photo), places=6)
+
+        likes[0].delete()
+        photo.refresh_from_db()
+        self.assertAlmostEqual(photo.trending_score, self.expected_score(photo), places=6)
+
+    def test_recent_likes_beat_old_totals(self):
+        old, new = self.photos
+        month_ago = timezone.now() - timedelta(days=30)
+        for fan in self.fans:
+            PhotoLike.objects.create(photo=old, user=fan)
+        for fan in self.fans[:2]:
+            PhotoLike.objects.create(photo=new, user=fan)
+        PhotoGallery.objects.filter(pk=old.pk).update(uploaded_at=month_ago)
+        PhotoLike.objects.filter(photo=old).update(created_at=month_ago)
+
+        out = StringIO()
+        call_command('refresh_trending_scores', '--dry-run', stdout=out)
+        self.assertIn('found 1', out.getvalue())
+        call_command('refresh_trending_scores', stdout=StringIO())
+
+        response = self.client.get('/api/photos/public/trending/')
+        self.assertEqual([p['id'] for p in response.json()['data']], [new.id, old.id])
+        response = self.client.get('/api/photos/public/popular/')
+        self.assertEqual([p['id'] for p in response.json()['data']], [old.id, new.id])
+
+    def test_cascades_skip_rescoring_deleted_photos(self):
+        photo, survivor = self.photos
+        for fan in self.fans[:3]:
+            PhotoLike.objects.create(photo=photo, user=fan)
+        PhotoLike.objects.create(photo=survivor, user=self.fans[0])
+
+        with mock.patch('photo_gallery.signals.recompute_trending_score') as recompute:
+            photo.delete()
+            recompute.assert_not_called()
+
+            # A fan's account going still rescores the photos they liked
+            self.fans[0].delete()
+            recompute.assert_called_once_with(survivor.pk)
+
+    def test_add_like_does_not_overflow(self):
+        photo = self.photos[0]
+        far = timezone.now() + timedelta(days=3650)
+        PhotoGallery.objects.filter(pk=photo.pk).update(trending_score=trending.add_like(far))
+        photo.refresh_from_db()
+        self.assertAlmostEqual(photo.trending_score, trending.score(photo.uploaded_at, [far]), places=6)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class FeedCacheTests(APITestCase):
+    """Test cases for the anonymous response cache of the public feeds"""
+
+    def setUp(self):
+        feed_cache().clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='owner@example.com', password='testpass123')
+        self.fan = User.objects.create_user(email='fan@example.com', password='testpass123')
+        self.photo = create_photo(self.owner)
+
+    def upload_photo(self):
+        create_photo(self.owner)
+
+    def get(self, url='/api/photos/public/popular/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_anonymous_hits_skip_the_database(self):
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['data'][0]['id'], self.photo.id)
+
+        # Separate entries per query string
+        self.assertEqual(self.get('/api/photos/public/by_location/?location=Pokhara')['X-Cache'], 'MISS')
+        self.assertEqual(self.get('/api/photos/public/by_location/?location=Illam')['X-Cache'], 'MISS')
+
+    def test_signed_in_users_are_not_cached(self):
+        self.client.force_authenticate(user=self.fan)
+        self.get()
+        response = self.get()
+        self.assertNotIn('X-Cache', response)
+
+    @mock.patch('photo_gallery.cache.close_old_connections')
+    @mock.patch('photo_gallery.cache._revalidations')
+    def test_change_serves_stale_and_revalidates_once(self, revalidations, close_old_connections):
+        self.get('/api/photos/public/grouped/')
+        with self.captureOnCommitCallbacks(execute=True):
+            PhotoLike.objects.create(photo=self.photo, user=self.fan)
+
+        # The old response while one revalidation runs
+        for _ in range(2):
+            response = self.get('/api/photos/public/grouped/')
+            self.assertEqual(response['X-Cache'], 'STALE')
+            self.assertEqual(response.json()['data'][0]['photos'][0]['likes_count'], 0)
+        revalidations.submit.assert_called_once()
+
+        function, *args = revalidations.submit.call_args[0]
+        function(*args)
+        response = self.get('/api/photos/public/grouped/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['data'][0]['photos'][0]['likes_count'], 1)
+
+    def hide_photo(self):
+        self.photo.is_public = False
+        self.photo.save()
+
+    @mock.patch('photo_gallery.cache._revalidations')
+    def test_upload_delete_and_visibility_bump_generation(self, revalidations):
+        with mock.patch('imaging.derivatives._jobs'):
+            for change in (self.upload_photo, self.hide_photo, self.photo.delete):
+                feed_cache().clear()
+                self.get()
+                with self.captureOnCommitCallbacks(execute=True):
+                    change()
+                self.assertEqual(self.get()['X-Cache'], 'STALE')
+        self.assertEqual(revalidations.submit.call_count, 3)
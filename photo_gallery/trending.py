@@ -0,0 +1,48 @@
+"""
+Trending score of photos: recent likes on recent photos rank highest.
+
+Every like is worth one point that halves every HALF_LIFE_HOURS, and the
+upload itself counts as one like, so a new photo starts near the top and
+sinks unless likes keep arriving. Like velocity wins over totals: a
+photo with 10 likes this morning outranks one with 500 likes last month.
+
+The decayed total at any moment is sum(2 ** -(now - t) / half life) over
+the likes' times t. Stored as
+
+    trending_score = ln(sum(e ** ((t - EPOCH) / TAU)))
+
+it differs from ln(decayed total) by the same amount for every photo, so
+ordering by the stored column is ordering by the current decayed total.
+Scores never need rewriting as time passes, and a new like is one
+UPDATE with log-sum-exp (add_like). refresh_trending_scores recomputes
+them from the likes, after a change of HALF_LIFE_HOURS or a bulk import.
+"""
+
+import math
+import os
+from datetime import datetime, timezone
+
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "12"))
+TAU = HALF_LIFE_HOURS * 3600 / math.log(2)   # seconds per e-fold of decay
+
+
+def moment(when):
+    """A time on the score scale: each unit is TAU seconds."""
+    return (when - EPOCH).total_seconds() / TAU
+
+
+def score(uploaded_at, liked_at=()):
+    """Trending score of a photo uploaded and liked at the given times."""
+    moments = [moment(uploaded_at)] + [moment(t) for t in liked_at]
+    top = max(moments)
+    return top + math.log(sum(math.exp(m - top) for m in moments))
+
+
+def add_like(liked_at):
+    """Expression for trending_score with one more like: ln(e^s + e^x) without overflow."""
+    x = Value(moment(liked_at))
+    return Greatest(F("trending_score"), x) + Ln(Value(1.0) + Exp(-Abs(F("trending_score") - x)))
@@ -2,15 +2,63 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Count, Q
+from django.db.models import Count, Max, Q
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from .models import PhotoGallery, PhotoLike, FavoriteLocation
+from .cache import cached_feed
+from .pagination import KeysetPagination, MOST_LIKED_FIRST, NEWEST_FIRST, TRENDING_FIRST
 from .serializers import PhotoGallerySerializer, PhotoLikeSerializer, FavoriteLocationSerializer
 
 User = get_user_model()
 
 
+def location_groups(queryset, per_location=None, order_by_newest=False):
+    """
+    Photos of the queryset grouped by location, built in the database: one
+    aggregate for the per-location counts and one query for the photos.
+    With per_location, each location contributes only its newest photos,
+    picked by an index seek per location ("id IN (SELECT id ... WHERE
+    location = %s ORDER BY uploaded_at DESC LIMIT n) OR ..."), so the cost
+    doesn't grow with the gallery. Locations come in name order, or newest
+    photo first with order_by_newest.
+    Returns [{'location', 'count', 'photos'}].
+    """
+    counts = queryset.order_by().values('location').annotate(count=Count('id'), newest=Max('uploaded_at'))
+    counts = list(counts.order_by('-newest' if order_by_newest else 'location'))
+    if not counts:
+        return []
+
+    photos = queryset.order_by('location', '-uploaded_at', '-id')
+    if per_location is not None:
+        newest = Q()
+        for row in counts:
+            ids = queryset.filter(location=row['location']).order_by('-uploaded_at', '-id').values('id')
+            newest |= Q(id__in=ids[:per_location])
+        photos = photos.filter(newest)
+
+    by_location = {}
+    for photo in photos:
+        by_location.setdefault(photo.location, []).append(photo)
+
+    names = dict(PhotoGallery.LOCATION_CHOICES)
+    return [
+        {'location': names.get(row['location'], row['location']), 'count': row['count'],
+         'photos': by_location.get(row['location'], [])}
+        for row in counts
+    ]
+
+
+def serialize_groups(groups, request):
+    """Serialize the photos of every group in one pass, so likes are looked up once."""
+    photos = [photo for group in groups for photo in group['photos']]
+    data = iter(PhotoGallerySerializer(photos, many=True, context={'request': request}).data)
+    return [
+        {'location': group['location'], 'count': group['count'], 'photos': [next(data) for _ in group['photos']]}
+        for group in groups
+    ]
+
+
 class PhotoGalleryViewSet(viewsets.ModelViewSet):
     """
     ViewSet for PhotoGallery model.
@@ -37,25 +85,12 @@ class PhotoGalleryViewSet(viewsets.ModelViewSet):
         GET /api/photos/grouped/
         Returns photos grouped by location.
         """
-        queryset = self.get_queryset()
-        if not queryset.exists():
+        groups = location_groups(self.get_queryset(), order_by_newest=True)
+        if not groups:
             return Response({'status':'success','message':'No photos found','data':[]})
 
-        # Group by location
-        grouped_data = {}
-        for photo in queryset:
-            location = photo.get_location_display()
-            if location not in grouped_data:
-                grouped_data[location] = {'location': location, 'photos': []}
-            grouped_data[location]['photos'].append(photo)
-
-        # Serialize
-        serialized_groups = []
-        for loc, group in grouped_data.items():
-            group['photos'] = PhotoGallerySerializer(group['photos'], many=True, context={'request': request}).data
-            serialized_groups.append(group)
-
-        return Response({'status':'success','count':queryset.count(),'data':serialized_groups})
+        serialized_groups = serialize_groups(groups, request)
+        return Response({'status':'success','count':sum(g['count'] for g in groups),'data':serialized_groups})
 
     @action(detail=False, methods=['get'])
     def by_location(self, request):
@@ -87,19 +122,9 @@ class PhotoGalleryViewSet(viewsets.ModelViewSet):
         Like/unlike a photo (toggle)
         """
         photo = self.get_object()
-        user = request.user
-        
-        try:
-            like = PhotoLike.objects.get(photo=photo, user=user)
-            like.delete()
-            # Refresh photo to get updated likes_count
-            photo.refresh_from_db()
-            return Response({'status': 'success', 'message': 'Photo unliked', 'is_liked': False, 'likes_count': photo.likes_count})
-        except PhotoLike.DoesNotExist:
-            PhotoLike.objects.create(photo=photo, user=user)
-            # Refresh photo to get updated likes_count
-            photo.refresh_from_db()
-            return Response({'status': 'success', 'message': 'Photo liked', 'is_liked': True, 'likes_count': photo.likes_count})
+        is_liked, likes_count = photo.toggle_like(request.user)
+        message = 'Photo liked' if is_liked else 'Photo unliked'
+        return Response({'status': 'success', 'message': message, 'is_liked': is_liked, 'likes_count': likes_count})
 
 
 class PublicPhotoViewSet(viewsets.ReadOnlyModelViewSet):
@@ -107,172 +132,83 @@ class PublicPhotoViewSet(viewsets.ReadOnlyModelViewSet):
     ViewSet for viewing public photos.
     Allows anyone to view photos from all users that are marked as public (is_public=True).
     Popular endpoint sorts by likes count.
+    The feeds' anonymous responses are cached (see cache.py).
     """
     serializer_class = PhotoGallerySerializer
     permission_classes = [AllowAny]  # Anyone can view
     
     def get_queryset(self):
         """Filter for public photos"""
-        return PhotoGallery.objects.filter(is_public=True).select_related('user').prefetch_related('likes')
+        return PhotoGallery.objects.filter(is_public=True).select_related('user')
+
+    def paginated(self, queryset, ordering, **extra):
+        """Serialize one keyset page of the queryset (see KeysetPagination)."""
+        paginator = KeysetPagination(ordering)
+        page = paginator.paginate_queryset(queryset, self.request, self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data, **extra)
 
     @action(detail=False, methods=['get'])
+    @cached_feed
     def by_location(self, request):
         """
         GET /api/photos/public/by_location/?location=Kathmandu
-        Returns all public photos filtered by a specific location.
+        Returns all public photos filtered by a specific location, newest first.
+        Paginated with cursor, limit and count query params.
         """
         location = request.query_params.get('location')
         if not location:
             return Response({'status':'error','message':'Location required'}, status=400)
 
         queryset = self.get_queryset().filter(location=location)
-        
-        # Pagination support
-        page = request.query_params.get('page', 1)
-        limit = request.query_params.get('limit', 12)
-        
-        try:
-            page = int(page)
-            limit = int(limit)
-        except ValueError:
-            page = 1
-            limit = 12
-        
-        total_count = queryset.count()
-        total_pages = (total_count + limit - 1) // limit
-        
-        start = (page - 1) * limit
-        end = start + limit
-        paginated_queryset = queryset[start:end]
-        
-        serializer = self.get_serializer(paginated_queryset, many=True)
-        return Response({
-            'status': 'success',
-            'count': total_count,
-            'page': page,
-            'limit': limit,
-            'pages': total_pages,
-            'location': location,
-            'data': serializer.data
-        })
+        return self.paginated(queryset, NEWEST_FIRST, location=location)
 
     @action(detail=False, methods=['get'])
+    @cached_feed
     def popular(self, request):
         """
         GET /api/photos/public/popular/
         Returns all public photos sorted by likes (most popular first).
-        Supports pagination with page and limit query params.
+        Paginated with cursor, limit and count query params.
         """
-        # Sort by likes count (descending), then by upload date
-        queryset = self.get_queryset().annotate(
-            like_count=Count('likes')
-        ).order_by('-like_count', '-uploaded_at')
-        
-        # Pagination support
-        page = request.query_params.get('page', 1)
-        limit = request.query_params.get('limit', 12)
-        
-        try:
-            page = int(page)
-            limit = int(limit)
-        except ValueError:
-            page = 1
-            limit = 12
-        
-        total_count = queryset.count()
-        total_pages = (total_count + limit - 1) // limit
-        
-        start = (page - 1) * limit
-        end = start + limit
-        paginated_queryset = queryset[start:end]
-        
-        serializer = self.get_serializer(paginated_queryset, many=True)
-        return Response({
-            'status': 'success',
-            'count': total_count,
-            'page': page,
-            'limit': limit,
-            'pages': total_pages,
-            'data': serializer.data
-        })
+        # Sort by likes count (descending), then by upload date: photo_public_popular_idx
+        return self.paginated(self.get_queryset(), MOST_LIKED_FIRST)
 
     @action(detail=False, methods=['get'])
+    @cached_feed
     def trending(self, request):
         """
         GET /api/photos/public/trending/
-        Returns public photos sorted by date (newest first).
-        Can be filtered by location using ?location=LocationName
+        Returns public photos sorted by trending score: recent likes on
+        recent photos first (see trending.py). Can be filtered by location using ?location=LocationName
+        Paginated with cursor, limit and count query params.
         """
-        queryset = self.get_queryset().order_by('-uploaded_at')
-        
+        queryset = self.get_queryset()
+
         # Filter by location if provided
         location = request.query_params.get('location')
         if location:
             queryset = queryset.filter(location=location)
-        
-        # Pagination support
-        page = request.query_params.get('page', 1)
-        limit = request.query_params.get('limit', 12)
-        
-        try:
-            page = int(page)
-            limit = int(limit)
-        except ValueError:
-            page = 1
-            limit = 12
-        
-        total_count = queryset.count()
-        total_pages = (total_count + limit - 1) // limit
-        
-        start = (page - 1) * limit
-        end = start + limit
-        paginated_queryset = queryset[start:end]
-        
-        serializer = self.get_serializer(paginated_queryset, many=True)
-        return Response({
-            'status': 'success',
-            'count': total_count,
-            'page': page,
-            'limit': limit,
-            'pages': total_pages,
-            'location': location or 'all',
-            'data': serializer.data
-        })
+
+        # Stored scores: photo_public_trending_idx / photo_public_loc_trending_idx
+        return self.paginated(queryset, TRENDING_FIRST, location=location or 'all')
 
     @action(detail=False, methods=['get'])
+    @cached_feed
     def grouped(self, request):
         """
         GET /api/photos/public/grouped/
         Returns public photos grouped by location.
         """
-        queryset = self.get_queryset()
-        if not queryset.exists():
+        # Limit to 6 photos per location for preview
+        groups = location_groups(self.get_queryset(), per_location=6)
+        if not groups:
             return Response({'status':'success','message':'No photos found','data':[]})
 
-        # Group by location
-        grouped_data = {}
-        for photo in queryset:
-            location = photo.get_location_display()
-            if location not in grouped_data:
-                grouped_data[location] = {'location': location, 'photos': [], 'count': 0}
-            grouped_data[location]['photos'].append(photo)
-            grouped_data[location]['count'] += 1
-
-        # Serialize - limit to 6 photos per location for preview
-        serialized_groups = []
-        for loc, group in sorted(grouped_data.items()):
-            photos_preview = group['photos'][:6]
-            group['photos'] = PhotoGallerySerializer(photos_preview, many=True, context={'request': request}).data
-            serialized_groups.append({
-                'location': group['location'],
-                'count': group['count'],
-                'photos': group['photos']
-            })
-
         return Response({
             'status': 'success',
-            'total_photos': queryset.count(),
-            'data': serialized_groups
+            'total_photos': sum(g['count'] for g in groups),
+            'data': serialize_groups(groups, request)
         })
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
@@ -283,19 +219,9 @@ class PublicPhotoViewSet(viewsets.ReadOnlyModelViewSet):
         Requires authentication.
         """
         photo = self.get_object()
-        user = request.user
-        
-        try:
-            like = PhotoLike.objects.get(photo=photo, user=user)
-            like.delete()
-            # Refresh photo to get updated likes_count
-            photo.refresh_from_db()
-            return Response({'status': 'success', 'message': 'Photo unliked', 'is_liked': False, 'likes_count': photo.likes_count})
-        except PhotoLike.DoesNotExist:
-            PhotoLike.objects.create(photo=photo, user=user)
-            # Refresh photo to get updated likes_count
-            photo.refresh_from_db()
-            return Response({'status': 'success', 'message': 'Photo liked', 'is_liked': True, 'likes_count': photo.likes_count})
+        is_liked, likes_count = photo.toggle_like(request.user)
+        message = 'Photo liked' if is_liked else 'Photo unliked'
+        return Response({'status': 'success', 'message': message, 'is_liked': is_liked, 'likes_count': likes_count})
 
 class FavoriteLocationViewSet(viewsets.ModelViewSet):
     """
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.test import RequestFactory
+from django.urls import reverse
+
+from backend.warmup import warm_step
+
+from .views import PublicPhotoViewSet
+
+
+def site_host():
+    """The first concrete ALLOWED_HOSTS entry: feeds are cached per host."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*" and not host.startswith("."):
+            return host
+    return "localhost"
+
+
+@warm_step("public photo pages")
+def render_public_photo_pages():
+    """
+    Render the first page of the public gallery feeds once, which also
+    fills their response cache (cache.py) for the site's host.
+    """
+    factory = RequestFactory()
+    for action in ("popular", "trending", "grouped"):
+        view = PublicPhotoViewSet.as_view({"get": action})
+        view(factory.get(reverse(f"public-photos-{action}"), HTTP_HOST=site_host())).render()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:59
+
+import imaging.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sherpa', '0002_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sherpa',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=imaging.storage.media_storage, upload_to='sherpa/photos/'),
+        ),
+    ]
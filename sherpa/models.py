@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from imaging.storage import media_storage
 
 User = settings.AUTH_USER_MODEL
 
@@ -19,9 +20,14 @@ class Sherpa(models.Model):
 
     photo = models.ImageField(
         upload_to="sherpa/photos/",
+        storage=media_storage,
         blank=True,
         null=True
     )
+    # Filled in by the imaging app after upload (see imaging/derivatives.py)
+    photo_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    photo_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    photo_renditions = models.JSONField(default=dict, blank=True, editable=False)
     nid_document = models.FileField(
         upload_to="sherpa/nid/",
         blank=True,
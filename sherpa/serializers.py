@@ -1,8 +1,11 @@
 # serializers.py
 from rest_framework import serializers
+from imaging.serializers import NormalizedImageField, SrcsetField
 from .models import Sherpa
 
 class SherpaRegisterSerializer(serializers.ModelSerializer):
+    photo = NormalizedImageField(required=False, allow_null=True)
+
     class Meta:
         model = Sherpa
         fields = [
@@ -24,6 +27,7 @@ class SherpaRegisterSerializer(serializers.ModelSerializer):
 class SherpaPublicSerializer(serializers.ModelSerializer):
     name = serializers.CharField(source="user.get_full_name", read_only=True)
     photo = serializers.SerializerMethodField()
+    photo_srcset = SrcsetField("photo")
     nid_document = serializers.SerializerMethodField()
 
     class Meta:
@@ -37,6 +41,9 @@ class SherpaPublicSerializer(serializers.ModelSerializer):
             "languages",
             "phone",          # Added phone
             "photo",
+            "photo_width",
+            "photo_height",
+            "photo_srcset",
             "nid_document",
             "is_verified",
             "is_available",   # Added availability for dashboard
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TravelkitConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'travelKit'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,35 @@
+import hashlib
+
+from django.core.cache import cache
+
+# Public travel kit responses are cached for CACHE_TTL seconds. Every key
+# carries a generation number that any catalogue change bumps, so edits
+# show up at once in this process and within CACHE_TTL everywhere else.
+CACHE_TTL = 300
+GENERATION_KEY = "travelkit:generation"
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def invalidate():
+    """Drop every cached travel kit response."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def location_key(location):
+    return hashlib.sha1(location.encode("utf-8")).hexdigest()[:16]
+
+
+def cached(name, build):
+    """Return the cached payload called name, building and storing it on a miss."""
+    key = f"travelkit:{_generation()}:{name}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, CACHE_TTL)
+    return payload
@@ -31,6 +31,10 @@ class TravelKitItem(models.Model):
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES) 
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='travelkit_items/', blank=True, null=True)
+    # Filled in by the imaging app after upload (see imaging/derivatives.py)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     price = models.DecimalField(max_digits=8, decimal_places=2,default=0.00)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,22 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate
+from .models import Location, TravelKit, TravelKitItem
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=TravelKitItem)
+@receiver(post_delete, sender=TravelKitItem)
+@receiver(post_save, sender=TravelKit)
+@receiver(post_delete, sender=TravelKit)
+def catalogue_changed(sender, **kwargs):
+    invalidate()
+
+
+@receiver(m2m_changed, sender=TravelKit.locations.through)
+@receiver(m2m_changed, sender=TravelKit.items.through)
+def kit_links_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate()
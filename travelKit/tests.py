@@ -1,3 +1,49 @@
-from django.test import TestCase
+"""
+Test cases for the travelKit app
+Run with: python manage.py test travelKit
+"""
 
-# Create your tests here.
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from .models import Location, TravelKit, TravelKitItem
+from .warmup import fill_travelkit_caches
+
+
+class TravelKitCacheTests(APITestCase):
+    """Test cases for cached public travel kit endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.location = Location.objects.create(name='Pokhara')
+        self.item = TravelKitItem.objects.create(name='Rain jacket', category='clothing')
+        self.kit = TravelKit.objects.create(name='Lakeside kit', description='For the lake')
+        self.kit.locations.add(self.location)
+        self.kit.items.add(self.item)
+
+    def test_repeat_requests_are_served_from_cache(self):
+        self.client.get('/travelkit/AllLocation/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/travelkit/AllLocation/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([l['name'] for l in response.data['data']], ['Pokhara'])
+
+    def test_changes_invalidate_cache(self):
+        self.client.get('/travelkit/AllLocation/')
+        Location.objects.create(name='Mustang')
+        response = self.client.get('/travelkit/AllLocation/')
+        self.assertEqual(len(response.data['data']), 2)
+
+    def test_kit_links_invalidate_cache(self):
+        url = '/travelkit/TravelKitItemsByLocation/?location=Pokhara'
+        self.assertEqual(len(self.client.get(url).data['data']), 1)
+        self.kit.items.add(TravelKitItem.objects.create(name='Headlamp', category='gear'))
+        self.assertEqual(len(self.client.get(url).data['data']), 2)
+
+    def test_warmup_fills_cache(self):
+        fill_travelkit_caches()
+        with self.assertNumQueries(0):
+            self.client.get('/travelkit/AllTravelKitInfo/')
+            self.client.get('/travelkit/TravelKitInfo/?location=Pokhara')
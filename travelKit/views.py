@@ -7,29 +7,36 @@ from rest_framework.decorators import permission_classes
 from django.utils import timezone
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+from .cache import cached, location_key
 # Create your views here.
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def getAllLocation(request):
     """Get all locations"""
-    locations = Location.objects.all().values()
-    return Response({ "message": "Success", "data": list(locations) })
+    return Response(cached("locations", lambda: {
+        "message": "Success",
+        "data": list(Location.objects.all().values())
+    }))
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def getAllTravelKitItems(request):
     """Get all travel kit items"""
-    travel_kits = TravelKitItem.objects.all().values()
-    return Response({ "message": "Success", "data": list(travel_kits) })
+    return Response(cached("items", lambda: {
+        "message": "Success",
+        "data": list(TravelKitItem.objects.all().values())
+    }))
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def getAllTravelKitInfo(request):
     """Get all travel kit info"""
-    travel_kits = TravelKit.objects.all().values()
-    return Response({ "message": "Success", "data": list(travel_kits) })
+    return Response(cached("kits", lambda: {
+        "message": "Success",
+        "data": list(TravelKit.objects.all().values())
+    }))
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -38,8 +45,10 @@ def getTravelKitInfo(request):
     location = request.GET.get('location')
     if not location:
         return Response({ "message": "Location is required" })
-    travel_kit = TravelKit.objects.filter(locations__name=location).values()
-    return Response({ "message": "Success", "data": list(travel_kit) })
+    return Response(cached(f"kits:{location_key(location)}", lambda: {
+        "message": "Success",
+        "data": list(TravelKit.objects.filter(locations__name=location).values())
+    }))
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -48,11 +57,15 @@ def getTravelKitItemsByLocation(request):
     location = request.GET.get('location')
     if not location:
         return Response({ "message": "Location is required" })
+    return Response(cached(f"kit-items:{location_key(location)}", lambda: _kit_items_payload(location)))
+
+
+def _kit_items_payload(location):
     travel_kit = TravelKit.objects.filter(locations__name=location).first()
     if not travel_kit:
-        return Response({ "message": "Travel kit not found" })
+        return { "message": "Travel kit not found" }
     travel_kit_items = travel_kit.items.values()
-    return Response({ "message": "Success", "data": list(travel_kit_items) })
+    return { "message": "Success", "data": list(travel_kit_items) }
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
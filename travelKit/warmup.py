@@ -0,0 +1,17 @@
+from django.test import RequestFactory
+
+from backend.warmup import warm_step
+
+from . import views
+from .models import Location
+
+
+@warm_step("travel kit caches")
+def fill_travelkit_caches():
+    """Render the public travel kit endpoints once so their caches are full."""
+    factory = RequestFactory()
+    for view in (views.getAllLocation, views.getAllTravelKitItems, views.getAllTravelKitInfo):
+        view(factory.get("/"))
+    for name in Location.objects.values_list("name", flat=True):
+        views.getTravelKitInfo(factory.get("/", {"location": name}))
+        views.getTravelKitItemsByLocation(factory.get("/", {"location": name}))